@@ -1,9 +1,11 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
 from alembic import context
+from dotenv import load_dotenv
 
 # Import your models here
 import models
@@ -17,6 +19,11 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Use the same database as the app unless alembic.ini sets sqlalchemy.url
+load_dotenv()
+if not config.get_main_option("sqlalchemy.url") and os.getenv("POSTGRESQL_URL"):
+    config.set_main_option("sqlalchemy.url", os.getenv("POSTGRESQL_URL").replace("%", "%%"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 target_metadata = models.Base.metadata
@@ -0,0 +1,229 @@
+"""baseline schema (tables previously created by create_all in main.py)
+
+Revision ID: 0001_baseline
+Revises: 
+Create Date: 2026-10-19 14:11:33.028132
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001_baseline'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('admin_settings',
+    sa.Column('AdminSettingsID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('AdminFeeValue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('AdminSettingsID')
+    )
+    op.create_table('couriers',
+    sa.Column('CourierID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('CourierName', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('CourierID')
+    )
+    op.create_table('otp',
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('otp_code', sa.String(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('email')
+    )
+    op.create_index(op.f('ix_otp_email'), 'otp', ['email'], unique=False)
+    op.create_table('products_templates',
+    sa.Column('ProductID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('ProductName', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('ProductID')
+    )
+    op.create_table('roles',
+    sa.Column('RoleID', sa.Integer(), nullable=False),
+    sa.Column('RoleName', sa.String(length=50), nullable=True),
+    sa.PrimaryKeyConstraint('RoleID')
+    )
+    op.create_table('users',
+    sa.Column('UserID', sa.String(length=36), nullable=False),
+    sa.Column('Username', sa.String(length=50), nullable=True),
+    sa.Column('Email', sa.String(length=100), nullable=True),
+    sa.Column('PhoneNumber', sa.BigInteger(), nullable=True),
+    sa.Column('Password', sa.String(length=100), nullable=True),
+    sa.Column('RoleID', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['RoleID'], ['roles.RoleID'], ),
+    sa.PrimaryKeyConstraint('UserID'),
+    sa.UniqueConstraint('Email')
+    )
+    op.create_table('centra_base_settings',
+    sa.Column('SettingsID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=True),
+    sa.Column('ProductID', sa.Integer(), nullable=True),
+    sa.Column('InitialPrice', sa.Float(), nullable=False),
+    sa.Column('Sellable', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['ProductID'], ['products_templates.ProductID'], ),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('SettingsID')
+    )
+    op.create_table('centra_finance',
+    sa.Column('FinanceID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=False),
+    sa.Column('AccountHolderName', sa.String(length=100), nullable=False),
+    sa.Column('BankCode', sa.String(length=20), nullable=False),
+    sa.Column('BankAccountNumber', sa.String(length=16), nullable=False),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('FinanceID')
+    )
+    op.create_table('centra_setting_details',
+    sa.Column('SettingDetailID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=True),
+    sa.Column('ProductID', sa.Integer(), nullable=True),
+    sa.Column('DiscountRate', sa.Integer(), nullable=True),
+    sa.Column('ExpDayLeft', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['ProductID'], ['products_templates.ProductID'], ),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('SettingDetailID')
+    )
+    op.create_table('locations',
+    sa.Column('user_id', sa.String(length=36), nullable=False),
+    sa.Column('location_address', sa.String(length=100), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=False),
+    sa.Column('longitude', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('sessions',
+    sa.Column('session_id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.String(length=36), nullable=True),
+    sa.Column('user_role', sa.Integer(), nullable=True),
+    sa.Column('user_email', sa.String(length=36), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.UserID'], ),
+    sa.ForeignKeyConstraint(['user_role'], ['roles.RoleID'], ),
+    sa.PrimaryKeyConstraint('session_id'),
+    sa.UniqueConstraint('session_id')
+    )
+    op.create_table('shipments',
+    sa.Column('ShipmentID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('CourierID', sa.Integer(), nullable=True),
+    sa.Column('UserID', sa.String(length=36), nullable=True),
+    sa.Column('ShipmentQuantity', sa.Integer(), nullable=True),
+    sa.Column('ShipmentDate', sa.DateTime(), nullable=True),
+    sa.Column('Check_in_Date', sa.DateTime(), nullable=True),
+    sa.Column('Check_in_Quantity', sa.Integer(), nullable=True),
+    sa.Column('Harbor_Reception_File', sa.Boolean(), nullable=True),
+    sa.Column('Rescalled_Weight', sa.Float(), nullable=True),
+    sa.Column('Rescalled_Date', sa.DateTime(), nullable=True),
+    sa.Column('Centra_Reception_File', sa.Boolean(), nullable=True),
+    sa.ForeignKeyConstraint(['CourierID'], ['couriers.CourierID'], ),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('ShipmentID')
+    )
+    op.create_table('transactions',
+    sa.Column('TransactionID', sa.String(), nullable=False),
+    sa.Column('CustomerID', sa.String(length=36), nullable=True),
+    sa.Column('TransactionStatus', sa.String(), nullable=True),
+    sa.Column('CreatedAt', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('UpdatedAt', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('ExpirationAt', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['CustomerID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('TransactionID')
+    )
+    op.create_table('trx_history',
+    sa.Column('TrxId', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=False),
+    sa.Column('BlockchainHash', sa.String(length=100), nullable=True),
+    sa.Column('CreatedAt', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('TrxId'),
+    sa.UniqueConstraint('BlockchainHash')
+    )
+    op.create_table('wet_leaves',
+    sa.Column('WetLeavesID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=True),
+    sa.Column('Weight', sa.Float(), nullable=True),
+    sa.Column('ReceivedTime', sa.DateTime(), nullable=True),
+    sa.Column('Expiration', sa.DateTime(), nullable=True),
+    sa.Column('Status', sa.String(length=50), nullable=True),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('WetLeavesID')
+    )
+    op.create_table('dry_leaves',
+    sa.Column('DryLeavesID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=True),
+    sa.Column('WetLeavesID', sa.Integer(), nullable=True),
+    sa.Column('Processed_Weight', sa.Float(), nullable=True),
+    sa.Column('Expiration', sa.DateTime(), nullable=True),
+    sa.Column('Status', sa.String(length=50), nullable=True),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.ForeignKeyConstraint(['WetLeavesID'], ['wet_leaves.WetLeavesID'], ),
+    sa.PrimaryKeyConstraint('DryLeavesID')
+    )
+    op.create_table('sub_transactions',
+    sa.Column('SubTransactionID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('TransactionID', sa.String(), nullable=True),
+    sa.Column('SubTransactionStatus', sa.String(), nullable=True),
+    sa.Column('CreatedAt', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('UpdatedAt', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('CentraID', sa.String(length=36), nullable=True),
+    sa.ForeignKeyConstraint(['CentraID'], ['users.UserID'], ),
+    sa.ForeignKeyConstraint(['TransactionID'], ['transactions.TransactionID'], ),
+    sa.PrimaryKeyConstraint('SubTransactionID')
+    )
+    op.create_table('flour',
+    sa.Column('FlourID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('DryLeavesID', sa.Integer(), nullable=True),
+    sa.Column('UserID', sa.String(length=36), nullable=True),
+    sa.Column('Flour_Weight', sa.Float(), nullable=True),
+    sa.Column('Expiration', sa.DateTime(), nullable=True),
+    sa.Column('Status', sa.String(length=50), nullable=True),
+    sa.ForeignKeyConstraint(['DryLeavesID'], ['dry_leaves.DryLeavesID'], ),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('FlourID')
+    )
+    op.create_table('market_shipments',
+    sa.Column('MarketShipmentID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('SubTransactionID', sa.Integer(), nullable=True),
+    sa.Column('ProductTypeID', sa.Integer(), nullable=True),
+    sa.Column('ProductID', sa.Integer(), nullable=True),
+    sa.Column('Price', sa.Float(), nullable=True),
+    sa.Column('InitialPrice', sa.Float(), nullable=True),
+    sa.Column('ShipmentStatus', sa.String(), nullable=True),
+    sa.Column('CreatedAt', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('UpdatedAt', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.CheckConstraint('"InitialPrice" >= "Price"', name='check_price_validity'),
+    sa.ForeignKeyConstraint(['ProductTypeID'], ['products_templates.ProductID'], ),
+    sa.ForeignKeyConstraint(['SubTransactionID'], ['sub_transactions.SubTransactionID'], ),
+    sa.PrimaryKeyConstraint('MarketShipmentID')
+    )
+    op.create_table('shipment_flour_association',
+    sa.Column('shipment_id', sa.Integer(), nullable=True),
+    sa.Column('flour_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['flour_id'], ['flour.FlourID'], ),
+    sa.ForeignKeyConstraint(['shipment_id'], ['shipments.ShipmentID'], )
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('shipment_flour_association')
+    op.drop_table('market_shipments')
+    op.drop_table('flour')
+    op.drop_table('sub_transactions')
+    op.drop_table('dry_leaves')
+    op.drop_table('wet_leaves')
+    op.drop_table('trx_history')
+    op.drop_table('transactions')
+    op.drop_table('shipments')
+    op.drop_table('sessions')
+    op.drop_table('locations')
+    op.drop_table('centra_setting_details')
+    op.drop_table('centra_finance')
+    op.drop_table('centra_base_settings')
+    op.drop_table('users')
+    op.drop_table('roles')
+    op.drop_table('products_templates')
+    op.drop_index(op.f('ix_otp_email'), table_name='otp')
+    op.drop_table('otp')
+    op.drop_table('couriers')
+    op.drop_table('admin_settings')
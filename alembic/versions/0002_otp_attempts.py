@@ -0,0 +1,26 @@
+"""add otp.attempts for the OTP attempt limit
+
+Revision ID: 0002_otp_attempts
+Revises: 0001_baseline
+Create Date: 2026-10-19 14:11:34.982039
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002_otp_attempts'
+down_revision: Union[str, None] = '0001_baseline'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('otp', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('otp', 'attempts')
@@ -0,0 +1,100 @@
+"""statistics rollup table and CreatedAt on dry leaves, flour and shipments
+
+Revision ID: 0003_statistics_rollup
+Revises: 0002_otp_attempts
+Create Date: 2026-10-19 14:16:02.804193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003_statistics_rollup'
+down_revision: Union[str, None] = '0002_otp_attempts'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+dry_leaves = sa.table("dry_leaves", sa.column("DryLeavesID"), sa.column("WetLeavesID"), sa.column("CreatedAt"))
+flour = sa.table("flour", sa.column("DryLeavesID"), sa.column("CreatedAt"))
+wet_leaves = sa.table("wet_leaves", sa.column("WetLeavesID"), sa.column("ReceivedTime"))
+shipments = sa.table("shipments", sa.column("ShipmentDate"), sa.column("Check_in_Date"), sa.column("CreatedAt"))
+
+# (table, metric, summed column, day column) of the per-centra rollups,
+# rows without a timestamp count on 1970-01-01
+ROLLUP_SOURCES = (
+    ("wet_leaves", "sum_wet_leaves", "Weight", "ReceivedTime"),
+    ("dry_leaves", "sum_dry_leaves", "Processed_Weight", "CreatedAt"),
+    ("flour", "sum_flour", "Flour_Weight", "CreatedAt"),
+    ("shipments", "sum_shipment_quantity", "ShipmentQuantity", "CreatedAt"),
+)
+
+
+def _day(column: str) -> str:
+    if op.get_bind().dialect.name == "sqlite":
+        return f"COALESCE(date({column}), '1970-01-01')"
+    return f"COALESCE(CAST({column} AS DATE), DATE '1970-01-01')"
+
+
+def backfill_rollups() -> None:
+    insert = 'INSERT INTO statistics_rollup ("UserID", "Metric", "ProductTypeID", "Day", "Total", "ItemCount") '
+    for table_name, metric, value_column, day_column in ROLLUP_SOURCES:
+        day = _day(f'"{day_column}"')
+        op.execute(
+            insert
+            + f"""SELECT "UserID", '{metric}', 0, {day}, COALESCE(SUM("{value_column}"), 0), COUNT(*) """
+            + f'FROM {table_name} WHERE "UserID" IS NOT NULL GROUP BY "UserID", {day}'
+        )
+    # market sales belong to the centra of their sub transaction
+    day = _day('m."CreatedAt"')
+    op.execute(
+        insert
+        + """SELECT s."CentraID", 'sum_market_sales', COALESCE(m."ProductTypeID", 0), """
+        + f'{day}, COALESCE(SUM(m."Price"), 0), COUNT(*) '
+        + 'FROM market_shipments m JOIN sub_transactions s ON s."SubTransactionID" = m."SubTransactionID" '
+        + """WHERE s."CentraID" IS NOT NULL AND (m."ShipmentStatus" IS NULL OR lower(m."ShipmentStatus") != 'cancelled') """
+        + f'GROUP BY s."CentraID", COALESCE(m."ProductTypeID", 0), {day}'
+    )
+
+
+def upgrade() -> None:
+    op.create_table('statistics_rollup',
+    sa.Column('UserID', sa.String(length=36), nullable=False),
+    sa.Column('Metric', sa.String(length=50), nullable=False),
+    sa.Column('ProductTypeID', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('Day', sa.Date(), nullable=False),
+    sa.Column('Total', sa.Float(), server_default='0', nullable=False),
+    sa.Column('ItemCount', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('UserID', 'Metric', 'ProductTypeID', 'Day')
+    )
+
+    # Existing rows get their date from the lineage instead of the migration time,
+    # so the server default is only added once they are backfilled
+    for table_name in ('dry_leaves', 'flour', 'shipments'):
+        op.add_column(table_name, sa.Column('CreatedAt', sa.DateTime(), nullable=True))
+    op.execute(dry_leaves.update().values(CreatedAt=(
+        sa.select(wet_leaves.c.ReceivedTime)
+        .where(wet_leaves.c.WetLeavesID == dry_leaves.c.WetLeavesID)
+        .scalar_subquery()
+    )))
+    op.execute(flour.update().values(CreatedAt=(
+        sa.select(dry_leaves.c.CreatedAt)
+        .where(dry_leaves.c.DryLeavesID == flour.c.DryLeavesID)
+        .scalar_subquery()
+    )))
+    op.execute(shipments.update().values(CreatedAt=sa.func.coalesce(shipments.c.ShipmentDate, shipments.c.Check_in_Date)))
+    for table_name in ('dry_leaves', 'flour', 'shipments'):
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.alter_column('CreatedAt', existing_type=sa.DateTime(), server_default=sa.func.now())
+
+    backfill_rollups()
+
+
+def downgrade() -> None:
+    op.drop_column('shipments', 'CreatedAt')
+    op.drop_column('flour', 'CreatedAt')
+    op.drop_column('dry_leaves', 'CreatedAt')
+    op.drop_table('statistics_rollup')
@@ -0,0 +1,36 @@
+"""indexes for the time-series statistics range scans and lineage joins
+
+Revision ID: 0004_timeseries_indexes
+Revises: 0003_statistics_rollup
+Create Date: 2026-10-19 14:17:48.923679
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004_timeseries_indexes'
+down_revision: Union[str, None] = '0003_statistics_rollup'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_dry_leaves_CreatedAt'), 'dry_leaves', ['CreatedAt'], unique=False)
+    op.create_index(op.f('ix_dry_leaves_WetLeavesID'), 'dry_leaves', ['WetLeavesID'], unique=False)
+    op.create_index(op.f('ix_flour_CreatedAt'), 'flour', ['CreatedAt'], unique=False)
+    op.create_index(op.f('ix_flour_DryLeavesID'), 'flour', ['DryLeavesID'], unique=False)
+    op.create_index(op.f('ix_shipments_CreatedAt'), 'shipments', ['CreatedAt'], unique=False)
+    op.create_index(op.f('ix_wet_leaves_ReceivedTime'), 'wet_leaves', ['ReceivedTime'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_wet_leaves_ReceivedTime'), table_name='wet_leaves')
+    op.drop_index(op.f('ix_shipments_CreatedAt'), table_name='shipments')
+    op.drop_index(op.f('ix_flour_DryLeavesID'), table_name='flour')
+    op.drop_index(op.f('ix_flour_CreatedAt'), table_name='flour')
+    op.drop_index(op.f('ix_dry_leaves_WetLeavesID'), table_name='dry_leaves')
+    op.drop_index(op.f('ix_dry_leaves_CreatedAt'), table_name='dry_leaves')
@@ -0,0 +1,44 @@
+"""yield_analytics table for the precomputed lineage yields
+
+Revision ID: 0005_yield_analytics
+Revises: 0004_timeseries_indexes
+Create Date: 2026-10-19 14:19:04.062282
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005_yield_analytics'
+down_revision: Union[str, None] = '0004_timeseries_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('yield_analytics',
+    sa.Column('YieldID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('PeriodType', sa.String(length=10), nullable=False),
+    sa.Column('Period', sa.Date(), nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=True),
+    sa.Column('Stage', sa.String(length=20), nullable=False),
+    sa.Column('LotCount', sa.Integer(), nullable=False),
+    sa.Column('InputWeight', sa.Float(), nullable=False),
+    sa.Column('OutputWeight', sa.Float(), nullable=False),
+    sa.Column('LossWeight', sa.Float(), nullable=False),
+    sa.Column('Yield', sa.Float(), nullable=True),
+    sa.Column('YieldP10', sa.Float(), nullable=True),
+    sa.Column('YieldP50', sa.Float(), nullable=True),
+    sa.Column('YieldP90', sa.Float(), nullable=True),
+    sa.Column('ComputedAt', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('YieldID')
+    )
+    op.create_index('ix_yield_analytics_lookup', 'yield_analytics', ['PeriodType', 'Period', 'UserID'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_yield_analytics_lookup', table_name='yield_analytics')
+    op.drop_table('yield_analytics')
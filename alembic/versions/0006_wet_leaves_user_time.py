@@ -0,0 +1,26 @@
+"""composite (UserID, ReceivedTime) index for per-centra intake lookups
+
+Revision ID: 0006_wet_leaves_user_time
+Revises: 0005_yield_analytics
+Create Date: 2026-10-19 14:19:52.490682
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006_wet_leaves_user_time'
+down_revision: Union[str, None] = '0005_yield_analytics'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_wet_leaves_UserID_ReceivedTime', 'wet_leaves', ['UserID', 'ReceivedTime'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_wet_leaves_UserID_ReceivedTime', table_name='wet_leaves')
@@ -0,0 +1,26 @@
+"""composite (UserID, CreatedAt) index for the admin blockchain ledger
+
+Revision ID: 0007_trx_history_user_time
+Revises: 0006_wet_leaves_user_time
+Create Date: 2026-10-19 14:26:41.023651
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007_trx_history_user_time'
+down_revision: Union[str, None] = '0006_wet_leaves_user_time'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_trx_history_UserID_CreatedAt', 'trx_history', ['UserID', 'CreatedAt'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trx_history_UserID_CreatedAt', table_name='trx_history')
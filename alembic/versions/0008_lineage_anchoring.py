@@ -0,0 +1,59 @@
+"""lineage events and Merkle anchor batches for traceability
+
+Revision ID: 0008_lineage_anchoring
+Revises: 0007_trx_history_user_time
+Create Date: 2026-10-19 14:28:40.492375
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008_lineage_anchoring'
+down_revision: Union[str, None] = '0007_trx_history_user_time'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('anchor_batches',
+    sa.Column('BatchID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=False),
+    sa.Column('WindowStart', sa.DateTime(), nullable=False),
+    sa.Column('WindowEnd', sa.DateTime(), nullable=False),
+    sa.Column('EventCount', sa.Integer(), nullable=False),
+    sa.Column('MerkleRoot', sa.String(length=64), nullable=False),
+    sa.Column('Tree', sa.Text(), nullable=False),
+    sa.Column('TrxId', sa.Integer(), nullable=True),
+    sa.Column('CreatedAt', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['TrxId'], ['trx_history.TrxId'], ),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('BatchID'),
+    sa.UniqueConstraint('UserID', 'WindowStart', name='uq_anchor_batches_UserID_WindowStart')
+    )
+    op.create_table('lineage_events',
+    sa.Column('EventID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('EventType', sa.String(length=32), nullable=False),
+    sa.Column('EntityID', sa.Integer(), nullable=False),
+    sa.Column('UserID', sa.String(length=36), nullable=False),
+    sa.Column('OccurredAt', sa.DateTime(), nullable=False),
+    sa.Column('Payload', sa.Text(), nullable=False),
+    sa.Column('LeafHash', sa.String(length=64), nullable=False),
+    sa.Column('BatchID', sa.Integer(), nullable=True),
+    sa.Column('LeafIndex', sa.Integer(), nullable=True),
+    sa.Column('Proof', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['BatchID'], ['anchor_batches.BatchID'], ),
+    sa.ForeignKeyConstraint(['UserID'], ['users.UserID'], ),
+    sa.PrimaryKeyConstraint('EventID'),
+    sa.UniqueConstraint('EventType', 'EntityID', name='uq_lineage_events_EventType_EntityID')
+    )
+    op.create_index('ix_lineage_events_BatchID_OccurredAt', 'lineage_events', ['BatchID', 'OccurredAt'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lineage_events_BatchID_OccurredAt', table_name='lineage_events')
+    op.drop_table('lineage_events')
+    op.drop_table('anchor_batches')
@@ -0,0 +1,37 @@
+"""audit table for reconciliation runs
+
+Revision ID: 0009_reconciliation_runs
+Revises: 0008_lineage_anchoring
+Create Date: 2026-10-19 14:31:51.279923
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009_reconciliation_runs'
+down_revision: Union[str, None] = '0008_lineage_anchoring'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reconciliation_runs',
+    sa.Column('RunID', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('Kind', sa.String(length=32), nullable=False),
+    sa.Column('Mode', sa.String(length=16), nullable=False),
+    sa.Column('TriggeredBy', sa.String(length=64), nullable=False),
+    sa.Column('StartedAt', sa.DateTime(), nullable=False),
+    sa.Column('FinishedAt', sa.DateTime(), nullable=True),
+    sa.Column('TransactionCount', sa.Integer(), nullable=False),
+    sa.Column('ProductCount', sa.Integer(), nullable=False),
+    sa.Column('Details', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('RunID')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reconciliation_runs')
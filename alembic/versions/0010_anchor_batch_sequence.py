@@ -0,0 +1,33 @@
+"""sequence number for anchor batches, so late events get their own batch
+
+Revision ID: 0010_anchor_batch_sequence
+Revises: 0009_reconciliation_runs
+Create Date: 2026-10-19 15:00:42.293472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010_anchor_batch_sequence'
+down_revision: Union[str, None] = '0009_reconciliation_runs'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('anchor_batches') as batch_op:
+        batch_op.add_column(sa.Column('Sequence', sa.Integer(), server_default='0', nullable=False))
+        batch_op.drop_constraint('uq_anchor_batches_UserID_WindowStart', type_='unique')
+        batch_op.create_unique_constraint('uq_anchor_batches_UserID_WindowStart_Sequence', ['UserID', 'WindowStart', 'Sequence'])
+
+
+def downgrade() -> None:
+    # fails while a window has more than one batch
+    with op.batch_alter_table('anchor_batches') as batch_op:
+        batch_op.drop_constraint('uq_anchor_batches_UserID_WindowStart_Sequence', type_='unique')
+        batch_op.create_unique_constraint('uq_anchor_batches_UserID_WindowStart', ['UserID', 'WindowStart'])
+        batch_op.drop_column('Sequence')
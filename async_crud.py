@@ -0,0 +1,78 @@
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+import crud
+
+# Async counterparts of the public marketplace reads in crud.py. They run the
+# same statements; pricing is resolved with two batched lookups per page
+# instead of two queries per product.
+
+async def _load_pricing(db: AsyncSession, rows):
+    """crud.load_marketplace_pricing on an AsyncSession"""
+    pairs = {(row.user_id, row.product_name) for row in rows}
+    if not pairs:
+        return {}, {}
+    return crud.fold_marketplace_pricing(
+        (await db.execute(crud.centra_base_prices_stmt(pairs))).all(),
+        (await db.execute(crud.centra_discounts_stmt(pairs))).all(),
+    )
+
+async def _price_marketplace_rows(db: AsyncSession, rows, weight_field: str):
+    base_prices, discounts = await _load_pricing(db, rows)
+    currentDate = datetime.now()
+    results = []
+
+    for row in rows:
+        key = (row.user_id, row.product_name)
+        price = base_prices.get(key, 0)
+        expdayleft = (row.expiration - currentDate).days
+        final_price = crud.calculate_marketplace_price(expdayleft, discounts.get(key, []), price)
+
+        results.append({
+            "id": row.id,
+            "product_name": row.product_name,
+            "stock": getattr(row, weight_field),
+            "centra_name": row.username,
+            "initial_price": price,
+            "price": final_price,
+            "expiry_time": expdayleft,
+            "status": row.status
+        })
+
+    return results
+
+async def get_marketplace_items(db: AsyncSession, skip: int = 0, limit: int = 15):
+    rows = (await db.execute(crud.marketplace_items_stmt(skip=skip, limit=limit))).all()
+    return await _price_marketplace_rows(db, rows, "stock")
+
+async def get_marketplace_items_by_centra(db: AsyncSession, centra_name: str, skip: int = 0, limit: int = 15):
+    rows = (await db.execute(crud.marketplace_items_stmt(skip=skip, limit=limit, centra_name=centra_name))).all()
+    return await _price_marketplace_rows(db, rows, "stock")
+
+async def search_products_by_query(db: AsyncSession, query: str, skip: int = 0, limit: int = 10, show_all: bool = False):
+    rows = (await db.execute(crud.search_products_stmt(query, skip=skip, limit=limit, show_all=show_all))).all()
+    return await _price_marketplace_rows(db, rows, "weight")
+
+async def get_product_details_by_product_id_and_product_name_and_username(db: AsyncSession, product_id: int, product_name: str, username: str):
+    product = (await db.execute(crud.product_details_stmt(product_id, product_name, username))).first()
+
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    base_prices, discounts = await _load_pricing(db, [product])
+    key = (product.user_id, product.product_name)
+    price = base_prices.get(key, 0)
+    expdayleft = (product.expiration - datetime.now()).days
+    final_price = crud.calculate_marketplace_price(expdayleft, discounts.get(key, []), price)
+
+    return {
+        "id": product.id,
+        "product_name": product.product_name,
+        "weight": product.weight,
+        "centra_name": product.username,
+        "initial_price": price,
+        "price": final_price,
+        "expiry_time": expdayleft,
+        "centra_id": product.centra_id,
+        "status": product.status
+    }
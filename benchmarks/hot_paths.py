@@ -0,0 +1,233 @@
+"""End-to-end benchmark of the hot API paths against a seeded database.
+
+Usage: python benchmarks/hot_paths.py [--database-url URL] [--scale 20000] [--seed 42]
+                                      [--requests 30] [--json results.json]
+
+Without --database-url a throwaway SQLite file is migrated to head and
+seeded with seeding/synthetic.py. A given database (local PostgreSQL) is
+migrated and seeded only if it has no wet leaves yet. The app runs
+in-process through TestClient, logged in as a seeded customer.
+
+Every endpoint is called once at a small and once at a large size (page
+size, target weight, centras, items). A check fails when the small call
+runs more SQL statements than its budget, or when the large call runs more
+than `per_unit` extra statements per extra unit of size, which is what an
+N+1 regression looks like. Latency percentiles and throughput come from
+--requests sequential calls at the small size. Exits non-zero on any failure.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name, method, path, small size, large size, statement budget at the small size, extra statements per unit of size
+CASES = [
+    ("marketplace_get", "GET", "/marketplace/get", 10, 50, 3, 0),
+    ("marketplace_search", "GET", "/marketplace/search_products", 10, 50, 3, 0),
+    ("algorithm_bulk_item", "GET", "/algorithm/bulkItem", 100, 500, 4, 0),
+    ("algorithm_bulk_selected_centra", "POST", "/algorithm/bulkSelectedCentra", 1, 5, 4, 0),
+    ("create_bulk_transaction", "POST", "/marketplace/create_bulk_transaction", 1, 5, 8, 0),
+    ("transactions_by_customer", "GET", "/marketplace/get_transactions_by_customer", 5, 20, 3, 0),
+    ("statistics_all", "GET", "/statistics/all", None, None, 1, 0),
+]
+
+
+class StatementCounter:
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, *args):
+        with self.lock:
+            self.count += 1
+
+    def reset(self):
+        with self.lock:
+            self.count = 0
+
+
+def prepare_database(database_url: str, scale: int, seed: int):
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import func, select
+
+    import models
+    from database import engine
+    from seeding.synthetic import SyntheticData
+
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.upgrade(config, "head")
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(models.WetLeaves.__table__)).scalar():
+            print("database already has data, not seeding")
+            return
+        started = time.perf_counter()
+        written = SyntheticData(connection, seed=seed, scale=scale).run()
+        print(f"seeded {sum(written.values())} rows in {time.perf_counter() - started:.1f} s")
+
+
+class Fixtures:
+    """Ids the requests need, read once from the seeded data"""
+
+    def __init__(self, db):
+        from sqlalchemy import func, select
+
+        import models
+        from seeding.synthetic import SEED_PASSWORD
+
+        transaction = models.Transaction
+        customer = db.execute(
+            select(models.User.Email)
+            .join(transaction, transaction.CustomerID == models.User.UserID)
+            .where(models.User.RoleID == 5)
+            .group_by(models.User.Email)
+            .order_by(func.count().desc(), models.User.Email)
+            .limit(1)
+        ).scalar()
+        self.login = {"Email": customer, "Password": SEED_PASSWORD}
+
+        flour = models.Flour
+        available = db.execute(
+            select(flour.FlourID, flour.UserID, flour.Flour_Weight)
+            .where(flour.Status == "Awaiting", flour.Expiration > func.now())
+            .order_by(flour.FlourID)
+        ).all()
+        self.flour_by_centra = {}
+        for row in available:
+            self.flour_by_centra.setdefault(row.UserID, []).append(row)
+        # centras with the most stock first
+        self.centras = sorted(self.flour_by_centra, key=lambda centra_id: (-len(self.flour_by_centra[centra_id]), centra_id))
+
+    def take_flour(self, count: int):
+        for centra_id in self.centras:
+            stock = self.flour_by_centra[centra_id]
+            if len(stock) >= count:
+                taken, self.flour_by_centra[centra_id] = stock[:count], stock[count:]
+                return taken
+        raise RuntimeError("seeded data has run out of available flour, use a larger --scale")
+
+
+def build_request(name: str, size, fixtures: Fixtures):
+    """(params, json body) for one call of a case at the given size"""
+    if name in ("marketplace_get", "transactions_by_customer"):
+        return {"limit": size}, None
+    if name == "marketplace_search":
+        return {"query": "Powder", "limit": size}, None
+    if name == "algorithm_bulk_item":
+        return {"item_type": "flour", "target_weight": size}, None
+    if name == "algorithm_bulk_selected_centra":
+        return None, {"item_type": "flour", "target_weight": 50, "users": fixtures.centras[:size]}
+    if name == "create_bulk_transaction":
+        items = [
+            {"CentraID": row.UserID, "ProductTypeID": 3, "ProductID": row.FlourID, "Price": 100000,
+             "InitialPrice": 100000, "Weight": row.Flour_Weight}
+            for row in fixtures.take_flour(size)
+        ]
+        return None, {"items": items}
+    return None, None
+
+
+def percentile(timings, fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_case(client, counter: StatementCounter, fixtures: Fixtures, case, requests: int) -> dict:
+    name, method, path, small, large, budget, per_unit = case
+    failures = []
+
+    def call(size):
+        params, body = build_request(name, size, fixtures)
+        counter.reset()
+        started = time.perf_counter()
+        response = client.request(method, path, params=params, json=body)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 300:
+            failures.append(f"HTTP {response.status_code} at size {size}: {response.text[:200]}")
+        return counter.count, elapsed
+
+    small_statements, _ = call(small)
+    large_statements, _ = call(large) if large is not None else (small_statements, 0)
+    if small_statements > budget:
+        failures.append(f"{small_statements} statements at size {small}, budget is {budget}")
+    if large is not None and large_statements - small_statements > per_unit * (large - small):
+        failures.append(f"statements grow with size: {small_statements} at {small}, {large_statements} at {large}")
+
+    timings = [call(small)[1] for _ in range(requests)]
+    return {
+        "name": name,
+        "path": path,
+        "statements": small_statements,
+        "statements_large": large_statements,
+        "budget": budget,
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "max_ms": round(max(timings), 2),
+        "requests_per_s": round(len(timings) / (sum(timings) / 1000), 1),
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", help="benchmark this database instead of a throwaway SQLite file")
+    parser.add_argument("--scale", type=int, default=20000, help="wet leaves lots to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=30, help="timed requests per endpoint")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='leafty-bench-'), 'bench.db')}"
+    # database.py reads the URL at import time
+    os.environ["POSTGRESQL_URL"] = database_url
+    sys.path.insert(0, ROOT)
+    prepare_database(database_url, args.scale, args.seed)
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    import main as app_module
+    from database import SessionLocal, engine, get_async_engine
+
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    if app_module.PUBLIC_MARKETPLACE_ASYNC_DB:
+        event.listen(get_async_engine().sync_engine, "before_cursor_execute", counter)
+
+    with SessionLocal() as db:
+        fixtures = Fixtures(db)
+    # the session cookie is Secure, so talk https to the test server
+    client = TestClient(app_module.app, base_url="https://testserver")
+    response = client.post("/login", json=fixtures.login)
+    if response.status_code != 200:
+        sys.exit(f"login as {fixtures.login['Email']} failed: {response.text}")
+
+    results = [run_case(client, counter, fixtures, case, args.requests) for case in CASES]
+
+    print(f"{'endpoint':<32} {'stmts':>5} {'large':>5} {'budget':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>7}")
+    for result in results:
+        print(f"{result['name']:<32} {result['statements']:>5} {result['statements_large']:>5} {result['budget']:>6} "
+              f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} {result['requests_per_s']:>7}")
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"database": engine.dialect.name, "scale": args.scale, "seed": args.seed, "results": results}, output, indent=2)
+
+    failed = [(result["name"], failure) for result in results for failure in result["failures"]]
+    for name, failure in failed:
+        print(f"FAIL {name}: {failure}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
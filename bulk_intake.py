@@ -0,0 +1,109 @@
+"""Batch intake of wet leaves, dry leaves and flour.
+
+A batch is validated against its owners and parent lots with one query per
+table, written with multi-row INSERT ... RETURNING and committed once.
+Core inserts skip the statistics rollup hook, so the matching deltas are
+applied in the same transaction.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Dict, List
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+import statistics_rollup
+
+load_dotenv()
+
+BULK_INTAKE_MAX_ROWS = int(os.getenv("BULK_INTAKE_MAX_ROWS", "5000"))
+BULK_INSERT_CHUNK_ROWS = int(os.getenv("BULK_INSERT_CHUNK_ROWS", "1000"))
+
+
+def parse_csv(content: bytes, schema) -> list:
+    """Validate every CSV row against the create schema, empty cells fall back to defaults"""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+    items = []
+    for line_number, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        values = {key.strip(): (value or "").strip() or None for key, value in row.items() if key}
+        if not any(values.values()):
+            continue
+        # empty cells only fall back to a default where the schema has one
+        values = {key: value for key, value in values.items()
+                  if value is not None or key not in schema.model_fields or schema.model_fields[key].is_required()}
+        try:
+            items.append(schema(**values))
+        except ValidationError as exc:
+            raise HTTPException(status_code=422, detail={"line": line_number, "errors": json.loads(exc.json(include_url=False))})
+    return items
+
+
+def _check_batch(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="No rows to create")
+    if len(items) > BULK_INTAKE_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_INTAKE_MAX_ROWS} rows can be created per request")
+
+
+def _check_users(db: Session, user_ids: set):
+    found = set(db.execute(select(models.User.UserID).where(models.User.UserID.in_(user_ids))).scalars())
+    missing = sorted(user_ids - found)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"User not found: {missing}")
+
+
+def _check_parents(db: Session, id_column, user_column, items: list, parent_key: str, label: str):
+    """Every referenced parent lot must exist and belong to the same user"""
+    parent_ids = {getattr(item, parent_key) for item in items}
+    owners: Dict[int, str] = dict(db.execute(select(id_column, user_column).where(id_column.in_(parent_ids))).all())
+    invalid = sorted({getattr(item, parent_key) for item in items if owners.get(getattr(item, parent_key)) != str(item.UserID)})
+    if invalid:
+        raise HTTPException(status_code=404, detail=f"{label} not found or do not belong to the user: {invalid}")
+
+
+def _insert(db: Session, model, id_column, rows: List[dict]) -> List[int]:
+    ids = []
+    # multi-row VALUES per chunk keeps each statement under the bind parameter limits
+    for start in range(0, len(rows), BULK_INSERT_CHUNK_ROWS):
+        chunk = rows[start:start + BULK_INSERT_CHUNK_ROWS]
+        ids.extend(db.execute(insert(model).values(chunk).returning(id_column)).scalars())
+    statistics_rollup.apply_deltas(db.connection(), statistics_rollup.row_deltas(model, rows))
+    db.commit()
+    return sorted(ids)
+
+
+def create_wet_leaves_bulk(db: Session, items: List[schemas.WetLeavesCreate]) -> dict:
+    _check_batch(items)
+    rows = [dict(item.dict(), UserID=str(item.UserID)) for item in items]
+    _check_users(db, {row["UserID"] for row in rows})
+    ids = _insert(db, models.WetLeaves, models.WetLeaves.WetLeavesID, rows)
+    return {"created": len(ids), "ids": ids}
+
+
+def create_dry_leaves_bulk(db: Session, items: List[schemas.DryLeavesCreate]) -> dict:
+    _check_batch(items)
+    _check_parents(db, models.WetLeaves.WetLeavesID, models.WetLeaves.UserID, items, "WetLeavesID", "Wet leaves")
+    created_at = datetime.now()
+    rows = [dict(item.dict(), UserID=str(item.UserID), CreatedAt=created_at) for item in items]
+    ids = _insert(db, models.DryLeaves, models.DryLeaves.DryLeavesID, rows)
+    return {"created": len(ids), "ids": ids}
+
+
+def create_flour_bulk(db: Session, items: List[schemas.FlourCreate]) -> dict:
+    _check_batch(items)
+    _check_parents(db, models.DryLeaves.DryLeavesID, models.DryLeaves.UserID, items, "DryLeavesID", "Dry leaves")
+    created_at = datetime.now()
+    rows = [dict(item.dict(), CreatedAt=created_at) for item in items]
+    ids = _insert(db, models.Flour, models.Flour.FlourID, rows)
+    return {"created": len(ids), "ids": ids}
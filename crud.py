@@ -1,35 +1,62 @@
 import bcrypt
+import math
 from sqlalchemy import cast, Date, and_, or_, text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta    
 from fastapi import HTTPException, Depends
 from sqlalchemy.sql import func
 from typing import List, Optional
 import models
+import pagination
 import schemas
+import statistics_rollup
 import uuid
 from sqlalchemy.orm import aliased, joinedload, selectinload
-from sqlalchemy import union_all, select, literal_column
+from sqlalchemy import union_all, select, literal_column, tuple_, update, insert
 
 #otp
-def create_otp(db: Session, otp: schemas.OTPCreate):
-    db_otp = models.OTP(
-        email=otp.email,
-        otp_code=otp.otp_code,
-        expires_at=datetime.now() + timedelta(minutes=2)
+def upsert_otp(db: Session, email: str, otp_hash: str, expires_at: datetime):
+    stmt = pg_insert(models.OTP).values(
+        email=email,
+        otp_code=otp_hash,
+        expires_at=expires_at,
+        attempts=0
+    ).on_conflict_do_update(
+        index_elements=[models.OTP.email],
+        set_={"otp_code": otp_hash, "expires_at": expires_at, "attempts": 0}
     )
-    db.add(db_otp)
+    db.execute(stmt)
     db.commit()
-    db.refresh(db_otp)
-    return db_otp
 
 def get_otp_by_email(db: Session, email: str):
     return db.query(models.OTP).filter(models.OTP.email == email).first()
 
-def delete_otp(db: Session, email: str):
-    db.query(models.OTP).filter(models.OTP.email == email).delete()
+def count_otp_attempt(db: Session, email: str, max_attempts: int, now: datetime) -> Optional[str]:
+    """Count one verification attempt in a single UPDATE, returns the stored hash, None if missing, expired or locked"""
+    otp_hash = db.execute(
+        update(models.OTP)
+        .where(models.OTP.email == email, models.OTP.attempts < max_attempts, models.OTP.expires_at > now)
+        .values(attempts=models.OTP.attempts + 1)
+        .returning(models.OTP.otp_code)
+    ).scalar_one_or_none()
     db.commit()
+    return otp_hash
+
+def delete_otp(db: Session, email: str, otp_hash: Optional[str] = None) -> bool:
+    """Delete the email's code, only if it is still otp_hash when given"""
+    query = db.query(models.OTP).filter(models.OTP.email == email)
+    if otp_hash is not None:
+        query = query.filter(models.OTP.otp_code == otp_hash)
+    deleted = query.delete(synchronize_session=False)
+    db.commit()
+    return deleted > 0
+
+def purge_expired_otps(db: Session):
+    purged = db.query(models.OTP).filter(models.OTP.expires_at < datetime.now()).delete(synchronize_session=False)
+    db.commit()
+    return purged
 
 #sessions
 def create_session(db: Session, session_id:str, user_id: str):
@@ -41,7 +68,7 @@ def create_session(db: Session, session_id:str, user_id: str):
     user_role = user.RoleID
     user_email = user.Email
 
-    db_session = models.SessionData(session_id=session_id, user_id = user_id, user_role = user_role, user_email = user_email)
+    db_session = models.SessionData(session_id=str(session_id), user_id = user_id, user_role = user_role, user_email = user_email)
     db.add(db_session)
     db.commit()
 
@@ -87,20 +114,31 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_user_details_by_email(db: Session, Email: str):
     return db.query(models.User).filter(models.User.Email == Email).first()
 
-def get_user_by_role(db: Session, RoleID: int):
-    return db.query(models.User).filter(models.User.RoleID == RoleID).all()
+def get_user_by_role(db: Session, RoleID: int, limit: Optional[int] = None, cursor: Optional[str] = None):
+    query = db.query(models.User).filter(models.User.RoleID == RoleID)
+    return pagination.paginate(query, (models.User.UserID,), cursor, limit)
 
-def get_users(db: Session):
-    users = db.query(models.User).all()
-    return users
+def get_users(db: Session, limit: Optional[int] = None, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.User), (models.User.UserID,), cursor, limit)
 
 def get_user_count(db: Session):
     count = db.query(models.User).count()
     print(f"Total user count in database: {count}")
     return count
 
+def normalize_user_id(user_id) -> Optional[str]:
+    """Canonical UUID string as stored in UserID columns, or None if it is not a UUID"""
+    try:
+        return str(uuid.UUID(str(user_id)))
+    except ValueError:
+        return None
+
 def get_user_by_id(db: Session, user_id: str):
-    return db.query(models.User).filter(cast(models.User.UserID, UUID) == user_id).first()
+    # compare against the stored string so the primary key index is used
+    user_id = normalize_user_id(user_id)
+    if user_id is None:
+        return None
+    return db.query(models.User).filter(models.User.UserID == user_id).first()
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.Email == email).first()
@@ -228,8 +266,8 @@ def create_wet_leaves(db: Session, wet_leaves: schemas.WetLeavesCreate):
     db.refresh(db_wet_leaves)
     return db_wet_leaves
     
-def get_wet_leaves(db: Session):
-    results = (
+def get_wet_leaves(db: Session, limit: Optional[int] = None, cursor: Optional[str] = None):
+    query = (
         db.query(
             models.WetLeaves.WetLeavesID,
             models.WetLeaves.Weight,
@@ -238,34 +276,39 @@ def get_wet_leaves(db: Session):
             models.User.Username  # Include Username from User table
         )
         .join(models.User, models.WetLeaves.UserID == models.User.UserID)
-        .all()
     )
+    results = pagination.paginate(query, (models.WetLeaves.WetLeavesID,), cursor, limit)
 
     # Convert results into dictionaries
-    return [dict(row._mapping) for row in results]
+    return pagination.Page([dict(row._mapping) for row in results], results.next_cursor)
     # return db.query(models.WetLeaves).limit(limit).all()
 
 def get_wet_leaves_by_id(db: Session, wet_leaves_id: int):
     return db.query(models.WetLeaves).filter(models.WetLeaves.WetLeavesID == wet_leaves_id).first()
 
 def get_wet_leaves_by_user_id(db: Session, user_id: str):
-    return db.query(models.WetLeaves).filter(cast(models.WetLeaves.UserID, UUID) == user_id).all()
+    user_id = normalize_user_id(user_id)
+    if user_id is None:
+        return []
+    return db.query(models.WetLeaves).filter(models.WetLeaves.UserID == user_id).all()
 
 
 def sum_weight_wet_leaves_by_user_today(db: Session, user_id: str):
-    today = datetime.now().date()
-    result = db.query(func.sum(models.WetLeaves.Weight)).filter(
-        and_(
-            cast(models.WetLeaves.UserID, UUID) == user_id,
-            cast(models.WetLeaves.ReceivedTime, Date) == today
-        )
+    # point lookup on the daily counter kept by statistics_rollup
+    user_id = normalize_user_id(user_id)
+    if user_id is None:
+        return 0
+    result = db.query(models.StatisticsRollup.Total).filter(
+        models.StatisticsRollup.UserID == user_id,
+        models.StatisticsRollup.Metric == "sum_wet_leaves",
+        models.StatisticsRollup.ProductTypeID == 0,
+        models.StatisticsRollup.Day == datetime.now().date(),
     ).scalar()
-    return result or 0
+    return round(result, 6) if result else 0
 
 def sum_total_wet_leaves(db: Session):
-    wet_leaves_entries = db.query(models.WetLeaves).all()
-    sum_wet_leaves = int(sum(entry.Weight for entry in wet_leaves_entries))
-    return sum_wet_leaves
+    total = db.query(func.sum(models.WetLeaves.Weight)).scalar()
+    return int(total or 0)
 
 
 def sum_get_wet_leaves_by_user_id(db: Session, user_id: str):
@@ -335,8 +378,8 @@ def create_dry_leaves(db: Session, dry_leaves: schemas.DryLeavesCreate):
     db.refresh(db_dry_leaves)
     return db_dry_leaves
 
-def get_dry_leaves(db: Session):
-    results = (
+def get_dry_leaves(db: Session, limit: Optional[int] = None, cursor: Optional[str] = None):
+    query = (
         db.query(
             models.DryLeaves.DryLeavesID,
             models.DryLeaves.WetLeavesID,
@@ -346,11 +389,11 @@ def get_dry_leaves(db: Session):
             models.User.Username  # Include Username from User table
         )
         .join(models.User, models.DryLeaves.UserID == models.User.UserID)
-        .all()
     )
+    results = pagination.paginate(query, (models.DryLeaves.DryLeavesID,), cursor, limit)
 
     # Convert results into dictionaries
-    return [dict(row._mapping) for row in results]
+    return pagination.Page([dict(row._mapping) for row in results], results.next_cursor)
 
 
 def get_dry_leaves_by_id(db: Session, dry_leaves_id: int):
@@ -429,8 +472,8 @@ def create_flour(db: Session, flour: schemas.FlourCreate):
     db.refresh(db_flour)
     return db_flour
     
-def get_flour(db: Session):
-    results = (
+def get_flour(db: Session, limit: Optional[int] = None, cursor: Optional[str] = None):
+    query = (
         db.query(
             models.Flour.FlourID,
             models.Flour.Flour_Weight,
@@ -439,11 +482,11 @@ def get_flour(db: Session):
             models.User.Username  # Include Username from User table
         )
         .join(models.User, models.Flour.UserID == models.User.UserID)
-        .all()
     )
+    results = pagination.paginate(query, (models.Flour.FlourID,), cursor, limit)
 
     # Convert results into dictionaries
-    return [dict(row._mapping) for row in results]
+    return pagination.Page([dict(row._mapping) for row in results], results.next_cursor)
 
 def get_flour_by_id(db: Session, flour_id: int):
     return db.query(models.Flour).filter(models.Flour.FlourID == flour_id).first()
@@ -508,7 +551,7 @@ def update_flour_status(db: Session, flour_id: int, status_update: schemas.Flour
 def create_shipment(db: Session, shipment: schemas.ShipmentCreate):
     db_shipment = models.Shipment(
         CourierID=shipment.CourierID,
-        UserID=shipment.UserID,
+        UserID=str(shipment.UserID),
         ShipmentQuantity=shipment.ShipmentQuantity,
         # ShipmentDate=shipment.ShipmentDate,
         # Check_in_Date=shipment.Check_in_Date,
@@ -518,23 +561,42 @@ def create_shipment(db: Session, shipment: schemas.ShipmentCreate):
         # Rescalled_Date=shipment.Rescalled_Date,
         # Centra_Reception_File=shipment.Centra_Reception_File,
     )
-    db.add(db_shipment)
-    db.commit()
-    db.refresh(db_shipment)
+    # one IN query for all of the centra's bags, locked so they cannot be reserved meanwhile
+    flour_ids = list(dict.fromkeys(shipment.FlourIDs))
+    statuses = dict(
+        db.query(models.Flour.FlourID, models.Flour.Status)
+        .filter(models.Flour.FlourID.in_(flour_ids), models.Flour.UserID == str(shipment.UserID))
+        .with_for_update()
+        .all()
+    ) if flour_ids else {}
+    missing_ids = [flour_id for flour_id in flour_ids if flour_id not in statuses]
+    if missing_ids:
+        db.rollback()
+        raise HTTPException(status_code=404, detail=f"Flour not found or does not belong to the user: {missing_ids}")
+    unavailable_ids = [flour_id for flour_id in flour_ids if statuses[flour_id] != "Awaiting"]
+    if unavailable_ids:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Flour is not available for shipment: {unavailable_ids}")
 
-    for flour_id in shipment.FlourIDs:
-        flour = db.query(models.Flour).filter(models.Flour.FlourID == flour_id).first()
-        if flour:
-            db_shipment.flours.append(flour)
+    db.add(db_shipment)
+    db.flush()
+    if flour_ids:
+        db.execute(
+            models.shipment_flour_association.insert(),
+            [{"shipment_id": db_shipment.ShipmentID, "flour_id": flour_id} for flour_id in flour_ids],
+        )
+        # shipped bags leave the marketplace and cannot be shipped again
+        db.query(models.Flour).filter(models.Flour.FlourID.in_(flour_ids)).update(
+            {models.Flour.Status: "Shipped"}, synchronize_session=False
+        )
     db.commit()
-    db.refresh(db_shipment)
 
     # Include FlourIDs in the response
     shipment_data = schemas.Shipment(
         ShipmentID=db_shipment.ShipmentID,
         CourierID=db_shipment.CourierID,
         UserID=db_shipment.UserID,
-        FlourIDs=[flour.FlourID for flour in db_shipment.flours],
+        FlourIDs=flour_ids,
         ShipmentQuantity=db_shipment.ShipmentQuantity,
         # ShipmentDate=db_shipment.ShipmentDate,
         # Check_in_Date=db_shipment.Check_in_Date,
@@ -547,76 +609,65 @@ def create_shipment(db: Session, shipment: schemas.ShipmentCreate):
 
     return shipment_data
 
-def get_shipment(db: Session, limit: int = 100):
-    shipments = db.query(models.Shipment).limit(limit).all()
+def _shipment_read_models(db: Session, *criteria, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """One page of shipments with courier, username and flour aggregates in two queries"""
+    query = (
+        db.query(models.Shipment, models.Courier.CourierName, models.User.Username)
+        .outerjoin(models.Courier, models.Courier.CourierID == models.Shipment.CourierID)
+        .outerjoin(models.User, models.User.UserID == models.Shipment.UserID)
+        .filter(*criteria)
+    )
+    rows = pagination.paginate(query, (models.Shipment.ShipmentID,), cursor, limit)
+    if not rows:
+        return rows
+
+    flours_by_shipment = {shipment.ShipmentID: [] for shipment, _, _ in rows}
+    association = models.shipment_flour_association
+    flour_rows = (
+        db.query(association.c.shipment_id, models.Flour.FlourID, models.Flour.Flour_Weight)
+        .join(models.Flour, models.Flour.FlourID == association.c.flour_id)
+        .filter(association.c.shipment_id.in_(flours_by_shipment.keys()))
+        .all()
+    )
+    for shipment_id, flour_id, flour_weight in flour_rows:
+        flours_by_shipment[shipment_id].append((flour_id, flour_weight))
+
     shipment_data = []
-    for shipment in shipments:
-        shipment_dict = {
+    for shipment, courier_name, username in rows:
+        flours = flours_by_shipment[shipment.ShipmentID]
+        shipment_data.append({
             "ShipmentID": shipment.ShipmentID,
             "CourierID": shipment.CourierID,
             "UserID": shipment.UserID,
-            "FlourIDs": [flour.FlourID for flour in shipment.flours],  # Ensure FlourIDs are included
+            "FlourIDs": [flour_id for flour_id, _ in flours],
             "ShipmentQuantity": shipment.ShipmentQuantity,
             "ShipmentDate": shipment.ShipmentDate,
             "Check_in_Date": shipment.Check_in_Date,
             "Check_in_Quantity": shipment.Check_in_Quantity,
-            "Rescalled_Weight" : shipment.Rescalled_Weight,
-            "Rescalled_Date" : shipment.Rescalled_Date,
+            "Rescalled_Weight": shipment.Rescalled_Weight,
+            "Rescalled_Date": shipment.Rescalled_Date,
             "Harbor_Reception_File": shipment.Harbor_Reception_File,
             "Centra_Reception_File": shipment.Centra_Reception_File,
-        }
-        shipment_data.append(shipment_dict)
-    return shipment_data
+            "FlourWeightSum": sum(flour_weight or 0 for _, flour_weight in flours),
+            "CourierName": courier_name,
+            "UserName": username,
+        })
+    return pagination.Page(shipment_data, rows.next_cursor)
+
+def get_shipment(db: Session, limit: int = 100, cursor: Optional[str] = None):
+    return _shipment_read_models(db, cursor=cursor, limit=limit)
 
 def get_shipment_by_id(db: Session, shipment_id: int):
-    shipment = db.query(models.Shipment).filter(models.Shipment.ShipmentID == shipment_id).first()
-    if not shipment:
+    shipments = _shipment_read_models(db, models.Shipment.ShipmentID == shipment_id)
+    if not shipments:
         raise HTTPException(status_code=404, detail="Shipment not found")
-    
-    flour_weight_sum = sum(flour.Flour_Weight for flour in shipment.flours)
-    courier = db.query(models.Courier).filter(models.Courier.CourierID == shipment.CourierID).first()
-    user = db.query(models.User).filter(models.User.UserID == shipment.UserID).first()
-    
-    return {
-        "ShipmentID": shipment.ShipmentID,
-        "CourierID": shipment.CourierID,
-        "UserID": shipment.UserID,
-        "FlourIDs": [flour.FlourID for flour in shipment.flours],
-        "ShipmentQuantity": shipment.ShipmentQuantity,
-        "ShipmentDate": shipment.ShipmentDate,
-        "Check_in_Date": shipment.Check_in_Date,
-        "Check_in_Quantity": shipment.Check_in_Quantity,
-        "Rescalled_Weight": shipment.Rescalled_Weight,
-        "Rescalled_Date": shipment.Rescalled_Date,
-        "Harbor_Reception_File": shipment.Harbor_Reception_File,
-        "Centra_Reception_File": shipment.Centra_Reception_File,
-        "FlourWeightSum": flour_weight_sum,
-        "CourierName": courier.CourierName if courier else None,
-        "UserName": user.Username if user else None
-    }
+    return shipments[0]
 
 def get_all_shipment_ids(db: Session):
     return db.query(models.Shipment).all()
 
-def get_shipment_by_user_id(db: Session, user_id: str):
-    shipments = db.query(models.Shipment).filter(models.Shipment.UserID == user_id).all()
-    shipment_data = []
-    for shipment in shipments:
-        shipment_dict = {
-            "ShipmentID": shipment.ShipmentID,
-            "CourierID": shipment.CourierID,
-            "UserID": shipment.UserID,
-            "FlourIDs": [flour.FlourID for flour in shipment.flours],
-            "ShipmentQuantity": shipment.ShipmentQuantity,
-            "ShipmentDate": shipment.ShipmentDate,
-            "Check_in_Date": shipment.Check_in_Date,
-            "Check_in_Quantity": shipment.Check_in_Quantity,
-            "Rescalled_Weight" : shipment.Rescalled_Weight,
-            "Rescalled_Date" : shipment.Rescalled_Date
-            
-        }
-        shipment_data.append(shipment_dict)
-    return shipment_data
+def get_shipment_by_user_id(db: Session, user_id: str, limit: Optional[int] = None, cursor: Optional[str] = None):
+    return _shipment_read_models(db, models.Shipment.UserID == user_id, cursor=cursor, limit=limit)
 
 def sum_total_shipment_quantity(db: Session):
     total = db.query(func.sum(models.Shipment.ShipmentQuantity)).scalar()
@@ -802,8 +853,8 @@ def create_location(db: Session, location: schemas.LocationCreate):
     db.refresh(db_location)
     return db_location
     
-def get_location(db: Session, limit: int = 100):
-    return db.query(models.Location).limit(limit).all()
+def get_location(db: Session, limit: int = 100, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.Location), (models.Location.user_id,), cursor, limit)
 
 def get_location_by_user_id(db: Session, user_id: int):
     return db.query(models.Location).filter(models.Location.user_id == user_id).first()
@@ -859,8 +910,8 @@ def create_product(db: Session, product: schemas.ProductsCreate):
     db.refresh(db_product)
     return db_product
 
-def get_products(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.Products).offset(skip).limit(limit).all()
+def get_products(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.Products), (models.Products.ProductID,), cursor, limit, skip)
 
 def get_product_by_id(db: Session, product_id: int):
     return db.query(models.Products).filter(models.Products.ProductID == product_id).first()
@@ -890,8 +941,8 @@ def create_centra_setting_detail(db: Session, centra_setting_detail: schemas.Cen
     db.refresh(db_centra_setting_detail)
     return db_centra_setting_detail
 
-def get_centra_setting_details(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.CentraSettingDetail).offset(skip).limit(limit).all()
+def get_centra_setting_details(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.CentraSettingDetail), (models.CentraSettingDetail.SettingDetailID,), cursor, limit, skip)
 
 def get_centra_setting_detail_by_id(db: Session, setting_detail_id: int):
     return db.query(models.CentraSettingDetail).filter(models.CentraSettingDetail.SettingDetailID == setting_detail_id).first()
@@ -961,8 +1012,8 @@ def create_centra_base_settings(db: Session, centra_base_settings: schemas.Centr
     db.refresh(db_centra_base_settings)
     return db_centra_base_settings
 
-def get_centra_base_settings(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.CentraBaseSettings).offset(skip).limit(limit).all()
+def get_centra_base_settings(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.CentraBaseSettings), (models.CentraBaseSettings.SettingsID,), cursor, limit, skip)
 
 def update_centra_base_settings(db: Session, settings_id: int, centra_base_settings_update: schemas.CentraBaseSettingsBase):
     centra_base_settings = db.query(models.CentraBaseSettings).filter(models.CentraBaseSettings.SettingsID == settings_id).first()
@@ -1081,15 +1132,13 @@ def create_market_shipment(db: Session, market_shipment: schemas.MarketShipmentC
 def get_market_shipments(db: Session, skip: int = 0, limit: int = 10):
     return db.query(models.MarketShipment).offset(skip).limit(limit).all()
 
-def get_market_shipments_with_centra(db: Session, skip: int = 0, limit: int = 10):
+def get_market_shipments_with_centra(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
     """Get market shipments with CentraID from SubTransaction join"""
-    results = (
+    query = (
         db.query(models.MarketShipment, models.SubTransaction.CentraID)
         .join(models.SubTransaction, models.MarketShipment.SubTransactionID == models.SubTransaction.SubTransactionID)
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+    results = pagination.paginate(query, (models.MarketShipment.MarketShipmentID,), cursor, limit, skip)
     
     # Convert results to include CentraID in MarketShipment objects
     market_shipments = []
@@ -1106,7 +1155,7 @@ def get_market_shipments_with_centra(db: Session, skip: int = 0, limit: int = 10
         }
         market_shipments.append(shipment_dict)
     
-    return market_shipments
+    return pagination.Page(market_shipments, results.next_cursor)
 
 def get_market_shipment_by_id(db: Session, market_shipment_id: int):
     return db.query(models.MarketShipment).filter(models.MarketShipment.MarketShipmentID == market_shipment_id).first()
@@ -1122,8 +1171,8 @@ def create_subtransaction(db: Session, subtransaction: schemas.SubTransactionCre
     db.refresh(db_subtransaction)
     return db_subtransaction
 
-def get_subtransactions(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.SubTransaction).offset(skip).limit(limit).all()
+def get_subtransactions(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.SubTransaction), (models.SubTransaction.SubTransactionID,), cursor, limit, skip)
 
 def get_subtransaction_by_id(db: Session, subtransaction_id: int):
     return db.query(models.SubTransaction).filter(models.SubTransaction.SubTransactionID == subtransaction_id).first()
@@ -1262,6 +1311,21 @@ def create_single_transaction_by_customer(db: Session, market_shipment: schemas.
         raise e
 
 
+# ProductTypeID -> (ORM model, id column) of the products a bulk transaction can reserve
+BULK_TRANSACTION_PRODUCT_MODELS = {
+    1: (models.WetLeaves, models.WetLeaves.WetLeavesID),
+    2: (models.DryLeaves, models.DryLeaves.DryLeavesID),
+    3: (models.Flour, models.Flour.FlourID),
+}
+# rows per multi-row INSERT, keeps each statement under the bind parameter limits
+BULK_TRANSACTION_INSERT_CHUNK_ROWS = 1000
+
+def _insert_chunks(db: Session, stmt, rows: list) -> list:
+    results = []
+    for start in range(0, len(rows), BULK_TRANSACTION_INSERT_CHUNK_ROWS):
+        results.extend(db.execute(stmt.values(rows[start:start + BULK_TRANSACTION_INSERT_CHUNK_ROWS])).all())
+    return results
+
 def create_bulk_transaction_by_customer(db: Session, bulk_transaction: schemas.BulkTransactionCreate, session_data: schemas.SessionData):
     """Create a bulk transaction with multiple items, with row-level locking and proper error handling"""
     customer_id_str = str(session_data.UserID)
@@ -1296,106 +1360,99 @@ def create_bulk_transaction_by_customer(db: Session, bulk_transaction: schemas.B
             if centra_id not in centra_groups:
                 centra_groups[centra_id] = []
             centra_groups[centra_id].append(item)
-        
+
+        # Validate every Centra user in one query
+        centra_ids = set(db.execute(
+            select(models.User.UserID).filter(models.User.UserID.in_(centra_groups.keys()), models.User.RoleID == 1)
+        ).scalars())
+
+        # Lock every requested product with one query per product type, in id order so concurrent
+        # bulk transactions cannot deadlock each other
+        product_ids = {}
+        for item in bulk_transaction.items:
+            if item.ProductTypeID in BULK_TRANSACTION_PRODUCT_MODELS:
+                product_ids.setdefault(item.ProductTypeID, set()).add(item.ProductID)
+        locked_products = {}
+        for product_type_id, ids in product_ids.items():
+            model, id_column = BULK_TRANSACTION_PRODUCT_MODELS[product_type_id]
+            for product in db.query(model).filter(id_column.in_(ids)).order_by(id_column).with_for_update(nowait=False):
+                locked_products[(product_type_id, getattr(product, id_column.key))] = product
+
         # Process each centra group
+        reserved = []
+        sub_transaction_centras = []
         for centra_id, items in centra_groups.items():
-            # Validate Centra user
-            centra_user = db.query(models.User).filter(models.User.UserID == centra_id).first()
-            if not centra_user or centra_user.RoleID != 1:
+            if centra_id not in centra_ids:
                 failed_items.extend([{
                     "item": item.dict(),
                     "error": f"CentraID {centra_id} must reference a user with the 'Centra' role."
                 } for item in items])
                 continue
-            
-            # Create sub-transaction for this centra
-            db_sub_transaction = models.SubTransaction(
-                TransactionID=transaction_id,
-                CentraID=centra_id,
-                SubTransactionStatus="pending"
-            )
-            db.add(db_sub_transaction)
-            db.flush()
-            
-            # Process each item for this centra
+
+            # One sub-transaction per centra, inserted together below
+            sub_transaction_centras.append(centra_id)
+
+            # Validate each item for this centra
             for item in items:
-                try:
-                    # Lock the specific product row to prevent concurrent modifications
-                    product_table = None
-                    product_query = None
-                    
-                    if item.ProductTypeID == 1:  # Wet Leaves
-                        product_table = models.WetLeaves
-                        product_query = db.query(models.WetLeaves).filter(
-                            models.WetLeaves.WetLeavesID == item.ProductID
-                        ).with_for_update(nowait=False)
-                    elif item.ProductTypeID == 2:  # Dry Leaves
-                        product_table = models.DryLeaves
-                        product_query = db.query(models.DryLeaves).filter(
-                            models.DryLeaves.DryLeavesID == item.ProductID
-                        ).with_for_update(nowait=False)
-                    elif item.ProductTypeID == 3:  # Flour
-                        product_table = models.Flour
-                        product_query = db.query(models.Flour).filter(
-                            models.Flour.FlourID == item.ProductID
-                        ).with_for_update(nowait=False)
-                    else:
-                        failed_items.append({
-                            "item": item.dict(),
-                            "error": "Invalid ProductTypeID"
-                        })
-                        continue
-
-                    # Lock and validate the product exists and is available
-                    locked_product = product_query.first()
-                    if not locked_product:
-                        failed_items.append({
-                            "item": item.dict(),
-                            "error": "Product not found"
-                        })
-                        continue
-                    
-                    # Check if product is available (not already processed or sold)
-                    if hasattr(locked_product, 'Status') and locked_product.Status in ['Processed', 'Sold', 'Expired']:
-                        failed_items.append({
-                            "item": item.dict(),
-                            "error": f"Product is not available. Current status: {locked_product.Status}"
-                        })
-                        continue
-
-                    # Check product ownership belongs to the centra
-                    if locked_product.UserID != centra_id:
-                        failed_items.append({
-                            "item": item.dict(),
-                            "error": "Product does not belong to the specified centra"
-                        })
-                        continue
-
-                    # Create MarketShipment for this item
-                    db_market_shipment = models.MarketShipment(
-                        SubTransactionID=db_sub_transaction.SubTransactionID,
-                        ProductTypeID=item.ProductTypeID,
-                        ProductID=item.ProductID,
-                        Price=item.Price,
-                        InitialPrice=item.InitialPrice,
-                        ShipmentStatus="awaiting"
-                    )
-                    db.add(db_market_shipment)
-                    db.flush()
-
-                    # Update product status to "Reserved"
-                    locked_product.Status = "Reserved"
-                    db.flush()
-                    
-                    successful_items.append(item)
-                    
-                except Exception as item_error:
+                if item.ProductTypeID not in BULK_TRANSACTION_PRODUCT_MODELS:
                     failed_items.append({
                         "item": item.dict(),
-                        "error": str(item_error)
+                        "error": "Invalid ProductTypeID"
                     })
                     continue
-        
+
+                locked_product = locked_products.get((item.ProductTypeID, item.ProductID))
+                if not locked_product:
+                    failed_items.append({
+                        "item": item.dict(),
+                        "error": "Product not found"
+                    })
+                    continue
+
+                # Check if product is available (not already processed or sold)
+                if locked_product.Status in ['Processed', 'Sold', 'Expired']:
+                    failed_items.append({
+                        "item": item.dict(),
+                        "error": f"Product is not available. Current status: {locked_product.Status}"
+                    })
+                    continue
+
+                # Check product ownership belongs to the centra
+                if locked_product.UserID != centra_id:
+                    failed_items.append({
+                        "item": item.dict(),
+                        "error": "Product does not belong to the specified centra"
+                    })
+                    continue
+
+                reserved.append((centra_id, item))
+                # Update product status to "Reserved"
+                locked_product.Status = "Reserved"
+                successful_items.append(item)
+
+        # Product statuses go out in one executemany UPDATE, sub-transactions and market
+        # shipments in multi-row INSERTs
+        db.flush()
+        sub_transaction_ids = dict(_insert_chunks(
+            db,
+            insert(models.SubTransaction).returning(models.SubTransaction.CentraID, models.SubTransaction.SubTransactionID),
+            [{"TransactionID": transaction_id, "CentraID": centra_id, "SubTransactionStatus": "pending"}
+             for centra_id in sub_transaction_centras]
+        )) if sub_transaction_centras else {}
+        market_rows = [{
+            "SubTransactionID": sub_transaction_ids[centra_id],
+            "ProductTypeID": item.ProductTypeID,
+            "ProductID": item.ProductID,
+            "Price": item.Price,
+            "InitialPrice": item.InitialPrice,
+            "ShipmentStatus": "awaiting"
+        } for centra_id, item in reserved]
+        if market_rows:
+            _insert_chunks(db, insert(models.MarketShipment).returning(models.MarketShipment.MarketShipmentID), market_rows)
+            # Core inserts skip the statistics rollup hook
+            statistics_rollup.apply_deltas(db.connection(), statistics_rollup.market_row_deltas(
+                market_rows, {sub_id: centra_id for centra_id, sub_id in sub_transaction_ids.items()}))
+
         # If no items were successful, rollback the entire transaction
         if not successful_items:
             db.rollback()
@@ -1427,14 +1484,12 @@ def create_bulk_transaction_by_customer(db: Session, bulk_transaction: schemas.B
 
 
 # Market Shipment CRUD functions
-def get_market_shipments(db: Session, skip: int = 0, limit: int = 10):
-    results = (
+def get_market_shipments(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    query = (
         db.query(models.MarketShipment, models.SubTransaction.CentraID)
         .join(models.SubTransaction, models.MarketShipment.SubTransactionID == models.SubTransaction.SubTransactionID)
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+    results = pagination.paginate(query, (models.MarketShipment.MarketShipmentID,), cursor, limit, skip)
     
     # Convert results to include CentraID in MarketShipment objects
     market_shipments = []
@@ -1451,7 +1506,7 @@ def get_market_shipments(db: Session, skip: int = 0, limit: int = 10):
         }
         market_shipments.append(shipment_dict)
     
-    return market_shipments
+    return pagination.Page(market_shipments, results.next_cursor)
 
 def get_market_shipment_by_id(db: Session, market_shipment_id: int):
     result = (
@@ -1474,7 +1529,7 @@ def get_market_shipment_by_id(db: Session, market_shipment_id: int):
         }
     return None
 
-def get_market_shipments_by_centra_id(db: Session, centra_id: str, skip: int = 0, limit: int = 10, status: str = None):
+def get_market_shipments_by_centra_id(db: Session, centra_id: str, skip: int = 0, limit: int = 10, status: str = None, cursor: Optional[str] = None):
     query = (
         db.query(models.MarketShipment, models.SubTransaction.CentraID)
         .join(models.SubTransaction, models.MarketShipment.SubTransactionID == models.SubTransaction.SubTransactionID)
@@ -1485,7 +1540,7 @@ def get_market_shipments_by_centra_id(db: Session, centra_id: str, skip: int = 0
     if status:
         query = query.filter(models.MarketShipment.ShipmentStatus == status)
     
-    results = query.offset(skip).limit(limit).all()
+    results = pagination.paginate(query, (models.MarketShipment.MarketShipmentID,), cursor, limit, skip)
     
     # Convert results to include CentraID in MarketShipment objects
     market_shipments = []
@@ -1502,7 +1557,7 @@ def get_market_shipments_by_centra_id(db: Session, centra_id: str, skip: int = 0
         }
         market_shipments.append(shipment_dict)
     
-    return market_shipments
+    return pagination.Page(market_shipments, results.next_cursor)
 
 def update_market_shipment(db: Session, market_shipment_id: int, market_shipment_update: schemas.MarketShipmentUpdate):
     db_market_shipment = db.query(models.MarketShipment).filter(models.MarketShipment.MarketShipmentID == market_shipment_id).first()
@@ -1548,102 +1603,91 @@ def update_market_shipment_status(db: Session, market_shipment_id: int, status:
         raise e
 
 # --- Get All Transactions ---
-def get_transactions(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.Transaction).offset(skip).limit(limit).all()
+def get_transactions(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.Transaction), (models.Transaction.TransactionID,), cursor, limit, skip)
 
-def get_transactions_by_customer(db: Session, skip: int = 0, limit: int = 10, session_data: schemas.SessionData = None):
+def get_transactions_by_customer(db: Session, skip: int = 0, limit: int = 10, session_data: schemas.SessionData = None, cursor: Optional[str] = None):
     CustomerID = str(session_data.UserID)
 
-    # First, get all transactions for this customer
-    main_transactions = (
-        db.query(models.Transaction)
-        .filter(models.Transaction.CustomerID == CustomerID)
-        .order_by(models.Transaction.CreatedAt.desc())
-        .limit(limit)
-        .offset(skip)
-        .all()
+    # First, get one page of this customer's transactions, newest first
+    main_transactions = pagination.paginate(
+        db.query(models.Transaction).filter(models.Transaction.CustomerID == CustomerID),
+        (models.Transaction.CreatedAt, models.Transaction.TransactionID),
+        cursor, limit, skip, descending=True,
     )
     
     if not main_transactions:
         return []
 
-    result = []
-    
-    for main_transaction in main_transactions:
-        # Get all sub-transactions and their related data for this transaction
-        sub_transactions_data = (
-            db.query(
-                models.SubTransaction.SubTransactionID,
-                models.SubTransaction.SubTransactionStatus,
-                models.SubTransaction.CentraID,
-                models.User.Username.label("CentraUsername"),
-                models.MarketShipment.ProductID,
-                models.MarketShipment.InitialPrice,
-                models.MarketShipment.Price,
-                models.MarketShipment.ShipmentStatus,
-                models.Products.ProductName
-            )
-            .join(models.MarketShipment, models.SubTransaction.SubTransactionID == models.MarketShipment.SubTransactionID)
-            .join(models.Products, models.MarketShipment.ProductTypeID == models.Products.ProductID)
-            .join(models.User, models.SubTransaction.CentraID == models.User.UserID)
-            .filter(models.SubTransaction.TransactionID == main_transaction.TransactionID)
-            .all()
+    transaction_ids = [main_transaction.TransactionID for main_transaction in main_transactions]
+
+    # Then every sub-transaction and market shipment of the page in one query
+    shipment_rows = (
+        db.query(
+            models.SubTransaction.TransactionID,
+            models.SubTransaction.SubTransactionID,
+            models.SubTransaction.SubTransactionStatus,
+            models.SubTransaction.CentraID,
+            models.User.Username.label("CentraUsername"),
+            models.MarketShipment.ProductID,
+            models.MarketShipment.InitialPrice,
+            models.MarketShipment.Price,
+            models.MarketShipment.ShipmentStatus,
+            models.Products.ProductName
         )
+        .join(models.MarketShipment, models.SubTransaction.SubTransactionID == models.MarketShipment.SubTransactionID)
+        .join(models.Products, models.MarketShipment.ProductTypeID == models.Products.ProductID)
+        .join(models.User, models.SubTransaction.CentraID == models.User.UserID)
+        .filter(models.SubTransaction.TransactionID.in_(transaction_ids))
+        .all()
+    )
 
-        # Group the data by sub-transaction
-        sub_transactions_dict = {}
-        
-        for row in sub_transactions_data:
-            sub_tx_id = row.SubTransactionID
-            
-            # Get product weight based on product type
-            product_weight = None
-            if row.ProductName == "Wet Leaves":
-                weight_result = db.query(models.WetLeaves.Weight).filter(models.WetLeaves.WetLeavesID == row.ProductID).first()
-                product_weight = weight_result.Weight if weight_result else None
-            elif row.ProductName == "Dry Leaves":
-                weight_result = db.query(models.DryLeaves.Processed_Weight).filter(models.DryLeaves.DryLeavesID == row.ProductID).first()
-                product_weight = weight_result.Processed_Weight if weight_result else None
-            elif row.ProductName == "Powder":
-                weight_result = db.query(models.Flour.Flour_Weight).filter(models.Flour.FlourID == row.ProductID).first()
-                product_weight = weight_result.Flour_Weight if weight_result else None
-
-            # Create market shipment data
-            market_shipment = {
-                "ProductID": row.ProductID,
-                "InitialPrice": row.InitialPrice,
-                "Price": row.Price,
-                "Weight": product_weight,
-                "ShipmentStatus": row.ShipmentStatus,
-                "ProductName": row.ProductName
+    # Product weights of every product type on the page in one UNION ALL
+    weight_selects = []
+    for product_name, (model, id_column, weight_column) in MARKETPLACE_PRODUCT_SOURCES.items():
+        product_ids = {row.ProductID for row in shipment_rows if row.ProductName == product_name}
+        if product_ids:
+            weight_selects.append(
+                select(literal_column(f"'{product_name}'").label("product_name"), id_column.label("id"), weight_column.label("weight"))
+                .where(id_column.in_(product_ids))
+            )
+    weights = {}
+    if weight_selects:
+        for row in db.execute(union_all(*weight_selects)).all():
+            weights[(row.product_name, row.id)] = row.weight
+
+    # Group the data by transaction, then by sub-transaction
+    sub_transactions_by_transaction = {transaction_id: {} for transaction_id in transaction_ids}
+    for row in shipment_rows:
+        sub_transactions_dict = sub_transactions_by_transaction[row.TransactionID]
+        if row.SubTransactionID not in sub_transactions_dict:
+            sub_transactions_dict[row.SubTransactionID] = {
+                "SubTransactionID": row.SubTransactionID,
+                "CentraUsername": row.CentraUsername,
+                "SubTransactionStatus": row.SubTransactionStatus,
+                "market_shipments": []
             }
+        sub_transactions_dict[row.SubTransactionID]["market_shipments"].append({
+            "ProductID": row.ProductID,
+            "InitialPrice": row.InitialPrice,
+            "Price": row.Price,
+            "Weight": weights.get((row.ProductName, row.ProductID)),
+            "ShipmentStatus": row.ShipmentStatus,
+            "ProductName": row.ProductName
+        })
 
-            # If this sub-transaction doesn't exist in our dict, create it
-            if sub_tx_id not in sub_transactions_dict:
-                sub_transactions_dict[sub_tx_id] = {
-                    "SubTransactionID": sub_tx_id,
-                    "CentraUsername": row.CentraUsername,
-                    "SubTransactionStatus": row.SubTransactionStatus,
-                    "market_shipments": []
-                }
-            
-            # Add the market shipment to this sub-transaction
-            sub_transactions_dict[sub_tx_id]["market_shipments"].append(market_shipment)
-
-        # Convert dictionary to list
-        sub_transactions_list = list(sub_transactions_dict.values())
-
-        transaction_data = {
+    result = [
+        {
             "TransactionID": main_transaction.TransactionID,
             "TransactionStatus": main_transaction.TransactionStatus,
             "CreatedAt": main_transaction.CreatedAt.isoformat(),
             "ExpirationAt": main_transaction.ExpirationAt.isoformat() if main_transaction.ExpirationAt else None,
-            "sub_transactions": sub_transactions_list
+            "sub_transactions": list(sub_transactions_by_transaction[main_transaction.TransactionID].values())
         }
-        
-        result.append(transaction_data)
+        for main_transaction in main_transactions
+    ]
 
-    return result
+    return pagination.Page(result, main_transactions.next_cursor)
 
 # --- Get Transaction by ID (basic) ---
 def get_transaction_by_id(db: Session, transaction_id: UUID):
@@ -1780,8 +1824,8 @@ def create_centra_finance(db: Session, centra_finance: schemas.CentraFinanceCrea
     db.refresh(db_centra_finance)
     return db_centra_finance
 
-def get_centra_finances(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(models.CentraFinance).offset(skip).limit(limit).all()
+def get_centra_finances(db: Session, skip: int = 0, limit: int = 10, cursor: Optional[str] = None):
+    return pagination.paginate(db.query(models.CentraFinance), (models.CentraFinance.FinanceID,), cursor, limit, skip)
 
 def get_centra_finance_by_id(db: Session, finance_id: int):
     return db.query(models.CentraFinance).filter(models.CentraFinance.FinanceID == finance_id).first()
@@ -1808,44 +1852,31 @@ def delete_centra_finance(db: Session, finance_id: int):
         return True
     return False
 
-def get_random_items(db: Session, item_type: str, limit: int = 100):
-    chosen_item = ''
-    # Fetch data based on item type - only items with "Awaiting" status, not expired, and not locked
-    if item_type.lower() == 'flour':
-        items = db.query(models.Flour).filter(
-            models.Flour.Status == "Awaiting",
-            models.Flour.Expiration > func.now()
-        ).order_by(func.random()).limit(limit).all()
-        chosen_item = "Powder"
-    elif item_type.lower() == 'dry_leaves':
-        items = db.query(models.DryLeaves).filter(
-            models.DryLeaves.Status == "Awaiting",
-            models.DryLeaves.Expiration > func.now()
-        ).order_by(func.random()).limit(limit).all()
-        chosen_item = "Dry Leaves"
-    else:
-        raise ValueError("Invalid item type. Choose 'flour' or 'dry_leaves'.")
-
+def _group_priced_items(db: Session, items, item_type: str, chosen_item: str):
+    """Priced {id, weight, initial_price, price, discounted} dicts grouped by centra UserID"""
     # Initialize the dictionary to group items by user ID (centra ID)
     grouped_data = {}
 
     currentDate = datetime.now()
     
+    # Users and pricing for every centra in one go instead of three queries per item
+    known_users = set(db.execute(
+        select(models.User.UserID).filter(models.User.UserID.in_({item.UserID for item in items}))
+    ).scalars())
+    base_prices, discounts = load_marketplace_pricing(db, ((item.UserID, chosen_item) for item in items))
+
     # Iterate through each item to populate grouped_data
     for item in items:
         user_id = item.UserID  # Assuming each item has a 'UserID' attribute
-        user = get_user_by_id(db, user_id)
-                    
-        expdayleft = (item.Expiration - currentDate).days
-                    
-        centra_base_settings = get_centra_base_settings_by_user_id_and_items(db, user_id, "Dry Leaves" if item_type=="dry_leaves" else "Powder")
-        discount_conditions = get_centra_setting_detail_by_user_id_and_item(db, user_id, chosen_item)
-        
-        if not user:
+        if user_id not in known_users:
             continue
 
-        username = user.Username
-        price = centra_base_settings[0].InitialPrice
+        expdayleft = (item.Expiration - currentDate).days
+        if (user_id, chosen_item) not in base_prices:
+            # never sell an item without a base price
+            raise HTTPException(status_code=404, detail=f"Centra base settings not found for {chosen_item}")
+        price = base_prices[(user_id, chosen_item)]
+        discount_conditions = discounts.get((user_id, chosen_item), [])
         def calculate_discounted_price(expiry_left, data, initial_price):
             # Filter discounts where expiry_left <= expiry
             applicable_discounts = [item for item in data if expiry_left <= item.ExpDayLeft]
@@ -1879,6 +1910,26 @@ def get_random_items(db: Session, item_type: str, limit: int = 100):
 
     return grouped_data
 
+def get_random_items(db: Session, item_type: str, limit: int = 100):
+    chosen_item = ''
+    # Fetch data based on item type - only items with "Awaiting" status, not expired, and not locked
+    if item_type.lower() == 'flour':
+        items = db.query(models.Flour).filter(
+            models.Flour.Status == "Awaiting",
+            models.Flour.Expiration > func.now()
+        ).order_by(func.random()).limit(limit).all()
+        chosen_item = "Powder"
+    elif item_type.lower() == 'dry_leaves':
+        items = db.query(models.DryLeaves).filter(
+            models.DryLeaves.Status == "Awaiting",
+            models.DryLeaves.Expiration > func.now()
+        ).order_by(func.random()).limit(limit).all()
+        chosen_item = "Dry Leaves"
+    else:
+        raise ValueError("Invalid item type. Choose 'flour' or 'dry_leaves'.")
+
+    return _group_priced_items(db, items, item_type, chosen_item)
+
 def get_items(db: Session, item_type: str, limit: int = 100):
     # Fetch data based on item type
     if item_type.lower() == 'flour':
@@ -1927,20 +1978,8 @@ def get_items_by_selected_centra(db: Session, item_type: str, users: List[UUID])
     else:
         raise ValueError("Invalid item type. Choose 'flour' or 'dry_leaves'.")
 
-    grouped_data = {}
-
-    for item in items:
-        user_id = item.UserID
-        
-        item_data = {"id": item.DryLeavesID if item_type == 'dry_leaves' else item.FlourID,
-                     "weight": item.Processed_Weight if item_type == 'dry_leaves' else item.Flour_Weight}
-        
-        if user_id not in grouped_data:
-            grouped_data[user_id] = [item_data]
-        else:
-            grouped_data[user_id].append(item_data)
-
-    return grouped_data
+    # priced like the random selection, the response model carries prices
+    return _group_priced_items(db, items, item_type, "Powder" if item_type.lower() == 'flour' else "Dry Leaves")
 
 def get_random_centras(db: Session, numOfCentra: int):
     return db.query(models.User).filter(models.User.RoleID == 1).order_by(func.random()).limit(numOfCentra).all()
@@ -2015,162 +2054,113 @@ def get_all_items(db: Session, item_type: str):
 
     return grouped_data
 
+# weights are compared in steps of 0.01 kg, item weights round up so a choice never exceeds the target
+KNAPSACK_WEIGHT_UNITS = 100
+
+def _add_weight(reachable: int, weight: int, mask: int) -> int:
+    return (reachable | (reachable << weight)) & mask if weight > 0 else reachable
+
+def knapsack_choices(target_weight, item_weights: dict):
+    """Items (grouped by centra) with the largest total weight that stays within target_weight.
+
+    Subset sum over a bitset of reachable totals, one shift per item. Only
+    every sqrt(n)-th bitset is kept, the walk back recomputes one block of
+    them at a time, so memory grows with sqrt(items) x target instead of
+    items x target.
+    """
+    items = [(centra_id, item) for centra_id, weights in item_weights.items() for item in weights]
+    units = [math.ceil(round(item.get("weight", 0) * KNAPSACK_WEIGHT_UNITS, 6)) for _, item in items]
+    limit = math.floor(round(target_weight * KNAPSACK_WEIGHT_UNITS, 6))
+    if limit <= 0 or not items:
+        return 0, {}
+
+    mask = (1 << (limit + 1)) - 1
+    block = max(1, math.isqrt(len(units)))
+    checkpoints = []
+    reachable = 1
+    for index, weight in enumerate(units):
+        if index % block == 0:
+            checkpoints.append(reachable)
+        reachable = _add_weight(reachable, weight, mask)
+
+    # walk back from the best total, an item was taken when the total was not reachable without it
+    total = reachable.bit_length() - 1
+    chosen = []
+    for block_index in range(len(checkpoints) - 1, -1, -1):
+        start = block_index * block
+        end = min(start + block, len(units))
+        history = [checkpoints[block_index]]
+        for weight in units[start:end - 1]:
+            history.append(_add_weight(history[-1], weight, mask))
+        for offset in range(len(history) - 1, -1, -1):
+            if not (history[offset] >> total) & 1:
+                chosen.append(start + offset)
+                total -= units[start + offset]
+
+    choices = {}
+    for index in reversed(chosen):
+        centra_id, item = items[index]
+        choices.setdefault(centra_id, []).append(item)
+    return sum(items[index][1].get("weight", 0) for index in chosen), choices
+
 def bulk_algorithm_by_random_items(db: Session, item_type: str, target_weight: int):
     all_data = get_random_items(db, item_type, round(target_weight / 25))
-    
-    memo: dict[tuple[int, int], int] = {}
-    next: dict[tuple[int, int], tuple[int, int, bool]] = {}
-
-    def dp(weight: int, idx: int, items: list[tuple[int, str, int, int]]) -> int:
-        if memo.get((weight, idx), -1) != -1:
-            return memo.get((weight, idx))
-        if weight <= 0 or idx >= len(items):
-            return 0
-
-        # Decision to include the current item
-        if weight - items[idx][0] >= 0:
-            next[(weight, idx)] = (weight - items[idx][0], idx + 1, True)
-            memo[(weight, idx)] = dp(weight - items[idx][0], idx + 1, items=items) + items[idx][0]
-
-        # Decision to skip the current item
-        skip_value = dp(weight, idx + 1, items=items)
-        if memo.get((weight, idx), 0) < skip_value:
-            next[(weight, idx)] = (weight, idx + 1, False)
-            memo[(weight, idx)] = skip_value
-
-        return memo.get((weight, idx), 0)
-
-    def knapsack(target_weight: int, item_weights: dict[str, list[dict[str, int]]]):
-        items: list[tuple[int, str, int, int, bool, int]] = []  # Keep str for centra_id (UUID string)
-        memo.clear()
-        next.clear()
-
-        for centra_id, weights in item_weights.items():
-            items += [
-                (
-                    item.get("weight", 0),
-                    centra_id,
-                    item.get("id", 0),
-                    item.get("price", 0),
-                    item.get("discounted", False),
-                    item.get("initial_price", 0),  # Add `initial_price`
-                )
-                for item in weights
-            ]
-
-        max_value = dp(target_weight, 0, items)
-
-        choices: dict[str, list[dict[str, int]]] = {}  # Keep str keys for UUID strings
-        current = (target_weight, 0)
-
-        while current in next:
-            weight, centra_id, item_id, price, discounted, initial_price = items[current[1]]
-            if next[current][2]:
-                if centra_id not in choices:
-                    choices[centra_id] = []
-                choices[centra_id].append({
-                    "id": item_id,
-                    "weight": weight,
-                    "price": price,
-                    "discounted": discounted,
-                    "initial_price": initial_price,  # Include `initial_price`
-                })
-            current = next[current][:2]
-
-        return max_value, choices
-
-    max_value, choices = knapsack(target_weight, all_data)
-    
-    return max_value, choices
+    return knapsack_choices(target_weight, all_data)
 
 
 def bulk_algorithm_by_selected_centra(db: Session, item_type: str, target_weight: int, users: List[UUID]):
     all_data = get_items_by_selected_centra(db, item_type, users)
-    
-    memo: dict[tuple[int, int], int] = {}
-    next_choice: dict[tuple[int, int], tuple[int, int, bool]] = {}
-
-    def dp(weight: int, idx: int, items: list[tuple[int, str, int]]) -> int:
-        if (weight, idx) in memo:
-            return memo[(weight, idx)]
-        if weight <= 0 or idx >= len(items):
-            return 0
-
-        include_value = 0
-        if weight - items[idx][0] >= 0:
-            include_value = dp(weight - items[idx][0], idx + 1, items) + items[idx][0]
-            next_choice[(weight, idx)] = (weight - items[idx][0], idx + 1, True)
-        
-        skip_value = dp(weight, idx + 1, items)
-        if skip_value > include_value:
-            next_choice[(weight, idx)] = (weight, idx + 1, False)
-
-        memo[(weight, idx)] = max(include_value, skip_value)
-        return memo[(weight, idx)]
-
-    def knapsack(target_weight: int, item_weights: dict[str, list[dict[str, int]]]):
-        items: list[tuple[int, str, int]] = []
-        memo.clear()
-        next_choice.clear()
-        
-        for centra_id, weights in item_weights.items():
-            items += [(item["weight"], centra_id, item["id"]) for item in weights]
-
-        max_value = dp(target_weight, 0, items)
-        
-        choices: dict[str, list[dict[str, int]]] = {}
-        current = (target_weight, 0)
-
-        while next_choice.get(current):
-            weight, centra_id, item_id = items[current[1]]
-            if next_choice[current][2]:
-                if centra_id not in choices:
-                    choices[centra_id] = []
-                choices[centra_id].append({"id": item_id, "weight": weight})
-            current = next_choice[current][:2]
-        
-        return max_value, choices
-    
-    max_value, choices = knapsack(target_weight, all_data)
-    
-    return max_value, choices
-
-def get_marketplace_items(db: Session, skip: int = 0, limit: int = 15):
-    # Queries for individual products - only include available products
-    wet = db.query(
-        models.WetLeaves.WetLeavesID.label("id"),
-        models.WetLeaves.UserID.label("user_id"),
-        models.WetLeaves.Expiration.label("expiration"),
-        models.WetLeaves.Weight.label("stock"),
-        models.WetLeaves.Status.label("status"),
-        literal_column("'Wet Leaves'").label("product_name")
-    ).filter(models.WetLeaves.Status == "Awaiting")
-
-    dry = db.query(
-        models.DryLeaves.DryLeavesID.label("id"),
-        models.DryLeaves.UserID.label("user_id"),
-        models.DryLeaves.Expiration.label("expiration"),
-        models.DryLeaves.Processed_Weight.label("stock"),
-        models.DryLeaves.Status.label("status"),
-        literal_column("'Dry Leaves'").label("product_name")
-    ).filter(models.DryLeaves.Status == "Awaiting")
-
-    flour = db.query(
-        models.Flour.FlourID.label("id"),
-        models.Flour.UserID.label("user_id"),
-        models.Flour.Expiration.label("expiration"),
-        models.Flour.Flour_Weight.label("stock"),
-        models.Flour.Status.label("status"),
-        literal_column("'Powder'").label("product_name")
-    ).filter(models.Flour.Status == "Awaiting")
+    return knapsack_choices(target_weight, all_data)
+
+# marketplace listings
+# (ORM model, id column, weight column) for each sellable product name
+MARKETPLACE_PRODUCT_SOURCES = {
+    "Wet Leaves": (models.WetLeaves, models.WetLeaves.WetLeavesID, models.WetLeaves.Weight),
+    "Dry Leaves": (models.DryLeaves, models.DryLeaves.DryLeavesID, models.DryLeaves.Processed_Weight),
+    "Powder": (models.Flour, models.Flour.FlourID, models.Flour.Flour_Weight),
+}
+
+def calculate_marketplace_price(expiry_left, discount_conditions, initial_price):
+    """Apply the discount of the tightest ExpDayLeft bracket the product falls into"""
+    applicable = [item for item in discount_conditions if expiry_left <= item.ExpDayLeft]
+    if not applicable:
+        return initial_price
+    best = min(applicable, key=lambda x: x.ExpDayLeft).DiscountRate
+    return round(initial_price - (initial_price * best / 100))
+
+def _marketplace_product_select(product_name: str, weight_label: str, with_user: bool = False):
+    model, id_column, weight_column = MARKETPLACE_PRODUCT_SOURCES[product_name]
+    columns = [
+        id_column.label("id"),
+        model.UserID.label("user_id"),
+        model.Expiration.label("expiration"),
+        weight_column.label(weight_label),
+        model.Status.label("status"),
+        literal_column(f"'{product_name}'").label("product_name"),
+    ]
+    if with_user:
+        columns += [models.User.Username.label("username"), models.User.UserID.label("centra_id")]
+        return select(*columns).join(models.User, model.UserID == models.User.UserID), model
+    return select(*columns), model
+
+def marketplace_items_stmt(skip: int = 0, limit: int = 15, centra_name: Optional[str] = None):
+    """Random page of available, unexpired products, optionally from a single centra"""
+    product_queries = []
+    for product_name in MARKETPLACE_PRODUCT_SOURCES:
+        product_query, model = _marketplace_product_select(product_name, "stock")
+        product_query = product_query.filter(model.Status == "Awaiting")
+        if centra_name is not None:
+            product_query = product_query.join(models.User, model.UserID == models.User.UserID).filter(
+                models.User.Username == centra_name
+            )
+        product_queries.append(product_query)
 
     # Combine queries with UNION ALL
-    union_query = union_all(wet, dry, flour).alias("products")
+    union_query = union_all(*product_queries).alias("products")
 
     # Create an alias for the User table
     user_alias = aliased(models.User)
 
-    # Create the full select statement with join to get username
     stmt = select(
         union_query.c.id,
         union_query.c.user_id,
@@ -2182,35 +2172,96 @@ def get_marketplace_items(db: Session, skip: int = 0, limit: int = 15):
     ).join(user_alias, union_query.c.user_id == user_alias.UserID
     ).filter(
         union_query.c.expiration > func.now()  # Filter out expired products
-    ).order_by(func.random()).offset(skip).limit(limit)
+    )
+    if centra_name is not None:
+        stmt = stmt.filter(user_alias.Username == centra_name)
+    return stmt.order_by(func.random()).offset(skip).limit(limit)
 
-    # Execute the query
-    rows = db.execute(stmt).fetchall()
-    
+def product_details_stmt(product_id: int, product_name: str, username: str):
+    if product_name not in MARKETPLACE_PRODUCT_SOURCES:
+        raise HTTPException(status_code=400, detail="Invalid product type")
+    product_query, model = _marketplace_product_select(product_name, "weight", with_user=True)
+    _, id_column, _ = MARKETPLACE_PRODUCT_SOURCES[product_name]
+    return product_query.filter(id_column == product_id, models.User.Username == username).limit(1)
+
+def search_products_stmt(query: str, skip: int = 0, limit: int = 10, show_all: bool = False):
+    search_pattern = f"%{query}%"
+    product_queries = []
+    for product_name in MARKETPLACE_PRODUCT_SOURCES:
+        product_query, model = _marketplace_product_select(product_name, "weight", with_user=True)
+        filters = [
+            or_(
+                literal_column(f"'{product_name}'").ilike(search_pattern),
+                models.User.Username.ilike(search_pattern)
+            )
+        ]
+        # Only filter by status/expiration if show_all is False
+        if not show_all:
+            filters += [model.Status == "Awaiting", model.Expiration > func.now()]
+        product_queries.append(product_query.filter(*filters))
+
+    combined_query = union_all(*product_queries).subquery()
+    return select(combined_query).offset(skip).limit(limit)
+
+def centra_base_prices_stmt(pairs):
+    """Initial prices for a set of (centra UserID, ProductName) pairs in one query"""
+    return (
+        select(models.CentraBaseSettings.UserID, models.Products.ProductName, models.CentraBaseSettings.InitialPrice)
+        .join(models.Products, models.CentraBaseSettings.ProductID == models.Products.ProductID)
+        .filter(tuple_(models.CentraBaseSettings.UserID, models.Products.ProductName).in_(list(pairs)))
+        .order_by(models.CentraBaseSettings.SettingsID)
+    )
+
+def centra_discounts_stmt(pairs):
+    """Discount brackets for a set of (centra UserID, ProductName) pairs in one query"""
+    return (
+        select(
+            models.CentraSettingDetail.UserID,
+            models.Products.ProductName,
+            models.CentraSettingDetail.ExpDayLeft,
+            models.CentraSettingDetail.DiscountRate
+        )
+        .join(models.Products, models.CentraSettingDetail.ProductID == models.Products.ProductID)
+        .filter(tuple_(models.CentraSettingDetail.UserID, models.Products.ProductName).in_(list(pairs)))
+    )
+
+def fold_marketplace_pricing(base_price_rows, discount_rows):
+    """Rows of the two pricing statements as base price and discount brackets per (centra UserID, ProductName)"""
+    base_prices = {}
+    for row in base_price_rows:
+        base_prices.setdefault((row.UserID, row.ProductName), row.InitialPrice)
+
+    discounts = {}
+    for row in discount_rows:
+        discounts.setdefault((row.UserID, row.ProductName), []).append(row)
+
+    return base_prices, discounts
+
+def load_marketplace_pricing(db: Session, pairs):
+    """Base price and discount brackets per (centra UserID, ProductName), two queries for any number of pairs"""
+    pairs = set(pairs)
+    if not pairs:
+        return {}, {}
+    return fold_marketplace_pricing(
+        db.execute(centra_base_prices_stmt(pairs)).all(),
+        db.execute(centra_discounts_stmt(pairs)).all(),
+    )
+
+def _price_marketplace_rows(db: Session, rows, weight_field: str):
+    base_prices, discounts = load_marketplace_pricing(db, ((row.user_id, row.product_name) for row in rows))
     currentDate = datetime.now()
     results = []
 
     for row in rows:
-        source = row.product_name
-        centra_base_settings = get_centra_base_settings_by_user_id_and_items(db, row.user_id, source)
-        discount_conditions = get_centra_setting_detail_by_user_id_and_item(db, row.user_id, source)
-
-        price = centra_base_settings[0].InitialPrice if centra_base_settings else 0
+        key = (row.user_id, row.product_name)
+        price = base_prices.get(key, 0)
         expdayleft = (row.expiration - currentDate).days
-
-        def calculate_discounted_price(expiry_left, data, initial_price):
-            applicable = [item for item in data if expiry_left <= item.ExpDayLeft]
-            if not applicable:
-                return initial_price
-            best = min(applicable, key=lambda x: x.ExpDayLeft).DiscountRate
-            return round(initial_price - (initial_price * best / 100))
-
-        final_price = calculate_discounted_price(expdayleft, discount_conditions, price)
+        final_price = calculate_marketplace_price(expdayleft, discounts.get(key, []), price)
 
         results.append({
             "id": row.id,
             "product_name": row.product_name,
-            "stock": row.stock,
+            "stock": getattr(row, weight_field),
             "centra_name": row.username,
             "initial_price": price,
             "price": final_price,
@@ -2220,64 +2271,12 @@ def get_marketplace_items(db: Session, skip: int = 0, limit: int = 15):
 
     return results
 
-def get_product_details_by_product_id_and_product_name_and_username(db: Session, product_id: int, product_name: str, username: str):
-    if product_name == 'Wet Leaves':
-        product = (
-            db.query(
-                models.WetLeaves.WetLeavesID.label("id"),
-                models.WetLeaves.UserID.label("user_id"),
-                models.WetLeaves.Expiration.label("expiration"),
-                models.WetLeaves.Weight.label("weight"),
-                models.WetLeaves.Status.label("status"),
-                literal_column("'Wet Leaves'").label("product_name"),
-                models.User.Username.label("username"),
-                models.User.UserID.label("centra_id"))
-            .join(models.User, models.WetLeaves.UserID == models.User.UserID)
-            .filter(
-                models.WetLeaves.WetLeavesID == product_id,
-                models.User.Username == username
-            )
-            .first()
-        )
-
-    elif product_name == 'Dry Leaves':
-        product = (
-            db.query( models.DryLeaves.DryLeavesID.label("id"),
-                models.DryLeaves.UserID.label("user_id"),
-                models.DryLeaves.Expiration.label("expiration"),
-                models.DryLeaves.Processed_Weight.label("weight"),
-                models.DryLeaves.Status.label("status"),
-                literal_column("'Dry Leaves'").label("product_name"),
-                models.User.Username.label("username"),
-                models.User.UserID.label("centra_id"))
-            .join(models.User, models.DryLeaves.UserID == models.User.UserID)
-            .filter(
-                models.DryLeaves.DryLeavesID == product_id,
-                models.User.Username == username
-            )
-            .first()
-        )
+def get_marketplace_items(db: Session, skip: int = 0, limit: int = 15):
+    rows = db.execute(marketplace_items_stmt(skip=skip, limit=limit)).fetchall()
+    return _price_marketplace_rows(db, rows, "stock")
 
-    elif product_name == 'Powder':
-        product = (
-            db.query(
-                models.Flour.FlourID.label("id"),
-                models.Flour.UserID.label("user_id"),
-                models.Flour.Expiration.label("expiration"),
-                models.Flour.Flour_Weight.label("weight"),
-                models.Flour.Status.label("status"),
-                literal_column("'Powder'").label("product_name"),
-                models.User.Username.label("username"),
-                models.User.UserID.label("centra_id"))
-            .join(models.User, models.Flour.UserID == models.User.UserID)
-            .filter(
-                models.Flour.FlourID == product_id,
-                models.User.Username == username
-            )
-            .first()
-        )
-    else:
-        raise HTTPException(status_code=400, detail="Invalid product type")
+def get_product_details_by_product_id_and_product_name_and_username(db: Session, product_id: int, product_name: str, username: str):
+    product = db.execute(product_details_stmt(product_id, product_name, username)).first()
 
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
@@ -2290,15 +2289,7 @@ def get_product_details_by_product_id_and_product_name_and_username(db: Session,
 
     price = centra_base_settings[0].InitialPrice if centra_base_settings else 0
     expdayleft = (product.expiration - currentDate).days
-
-    def calculate_discounted_price(expiry_left, data, initial_price):
-        applicable = [item for item in data if expiry_left <= item.ExpDayLeft]
-        if not applicable:
-            return initial_price
-        best = min(applicable, key=lambda x: x.ExpDayLeft).DiscountRate
-        return round(initial_price - (initial_price * best / 100))
-
-    final_price = calculate_discounted_price(expdayleft, discount_conditions, price)
+    final_price = calculate_marketplace_price(expdayleft, discount_conditions, price)
 
     return {
         "id": product.id,
@@ -2312,6 +2303,7 @@ def get_product_details_by_product_id_and_product_name_and_username(db: Session,
         "status": product.status
     }
     
+
 def create_new_transaction(db: Session, market_shipment: schemas.MarketShipmentCreate):
     centra_id_str = str(market_shipment.CentraID)
     customer_id_str = str(market_shipment.CustomerID)
@@ -2434,6 +2426,38 @@ def create_blockchain_trx(db: Session, user_id: str, trx_id: str):
     db.refresh(db_trx)
     return db_trx
 
+def create_blockchain_trx_batch(db: Session, user_id: str, blockchain_hashes: List[str]):
+    """Register many hashes in one statement, hashes that already exist are reported as duplicates"""
+    hashes = list(dict.fromkeys(h.strip() for h in blockchain_hashes if h and h.strip()))
+    too_long = [h for h in hashes if len(h) > models.BlockchainTrx.BlockchainHash.type.length]
+    if too_long:
+        raise HTTPException(status_code=400, detail=f"Blockchain hash too long: {too_long}")
+    if not hashes:
+        return {"created": [], "duplicates": []}
+
+    insert_fn = sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert
+    stmt = (
+        insert_fn(models.BlockchainTrx)
+        .values([{"UserID": user_id, "BlockchainHash": h} for h in hashes])
+        .on_conflict_do_nothing(index_elements=[models.BlockchainTrx.BlockchainHash])
+        .returning(models.BlockchainTrx.TrxId, models.BlockchainTrx.BlockchainHash, models.BlockchainTrx.CreatedAt)
+    )
+    rows = db.execute(stmt).all()
+    db.commit()
+
+    created = {row.BlockchainHash: row for row in rows}
+    return {
+        "created": [
+            {
+                "trx_id": created[h].TrxId,
+                "blockchain_hash": h,
+                "created_at": created[h].CreatedAt.isoformat() if created[h].CreatedAt else None,
+            }
+            for h in hashes if h in created
+        ],
+        "duplicates": [h for h in hashes if h not in created],
+    }
+
 def get_blockchain_trx_by_user_id(db: Session, user_id: str):
     return db.query(models.BlockchainTrx).filter(models.BlockchainTrx.UserID == user_id).all()
 
@@ -2448,6 +2472,53 @@ def get_blockchain_trx_by_hash(db: Session, blockchain_hash: str):
 def get_all_blockchain_trx(db: Session):
     return db.query(models.BlockchainTrx).all()
 
+def blockchain_ledger_query(db: Session, user_id: Optional[str] = None, role_id: Optional[int] = None,
+                            date_from: Optional[datetime] = None, date_to: Optional[datetime] = None):
+    """Ledger rows joined with their user in one query"""
+    query = (
+        db.query(
+            models.BlockchainTrx.TrxId,
+            models.BlockchainTrx.UserID,
+            models.BlockchainTrx.BlockchainHash,
+            models.BlockchainTrx.CreatedAt,
+            models.User.Username,
+            models.User.Email,
+            models.User.RoleID,
+        )
+        .outerjoin(models.User, models.User.UserID == models.BlockchainTrx.UserID)
+    )
+    if user_id is not None:
+        if normalize_user_id(user_id) is None:
+            raise HTTPException(status_code=400, detail="user_id must be a UUID")
+        query = query.filter(models.BlockchainTrx.UserID == normalize_user_id(user_id))
+    if role_id is not None:
+        query = query.filter(models.User.RoleID == role_id)
+    if date_from is not None:
+        query = query.filter(models.BlockchainTrx.CreatedAt >= date_from)
+    if date_to is not None:
+        query = query.filter(models.BlockchainTrx.CreatedAt < date_to)
+    return query
+
+def get_blockchain_ledger(db: Session, limit: int = 100, cursor: Optional[str] = None, **filters):
+    """One page of the ledger, newest first"""
+    rows = pagination.paginate(
+        blockchain_ledger_query(db, **filters),
+        (models.BlockchainTrx.CreatedAt, models.BlockchainTrx.TrxId),
+        cursor, limit, descending=True,
+    )
+    return pagination.Page([
+        {
+            "user_id": row.UserID,
+            "trx_id": row.TrxId,
+            "blockchain_hash": row.BlockchainHash,
+            "created_at": row.CreatedAt.isoformat() if row.CreatedAt else None,
+            "username": row.Username,
+            "user_email": row.Email,
+            "user_role_id": row.RoleID,
+        }
+        for row in rows
+    ], rows.next_cursor)
+
 # Product status management with row-level locking
 def update_product_status_with_lock(db: Session, product_type_id: int, product_id: int, new_status: str):
     """Update product status with row-level locking to prevent concurrent modifications"""
@@ -2664,222 +2735,10 @@ def get_product_lock_status(db: Session, product_type_id: int, product_id: int):
         raise e
     
 def search_products_by_query(db: Session, query: str, skip: int = 0, limit: int = 10, show_all: bool = False):
-    from datetime import datetime
-
-    search_pattern = f"%{query}%"
-
-    # Only filter by status/expiration if show_all is False
-    wetleaves_filters = [
-        or_(
-            literal_column("'Wet Leaves'").ilike(search_pattern),
-            models.User.Username.ilike(search_pattern)
-        )
-    ]
-    dryleaves_filters = [
-        or_(
-            literal_column("'Dry Leaves'").ilike(search_pattern),
-            models.User.Username.ilike(search_pattern)
-        )
-    ]
-    powder_filters = [
-        or_(
-            literal_column("'Powder'").ilike(search_pattern),
-            models.User.Username.ilike(search_pattern)
-        )
-    ]
-
-    if not show_all:
-        wetleaves_filters += [
-            models.WetLeaves.Status == "Awaiting",
-            models.WetLeaves.Expiration > func.now()
-        ]
-        dryleaves_filters += [
-            models.DryLeaves.Status == "Awaiting",
-            models.DryLeaves.Expiration > func.now()
-        ]
-        powder_filters += [
-            models.Flour.Status == "Awaiting",
-            models.Flour.Expiration > func.now()
-        ]
-
-    wetleaves_query = (
-        db.query(
-            models.WetLeaves.WetLeavesID.label("id"),
-            models.WetLeaves.UserID.label("user_id"),
-            models.WetLeaves.Expiration.label("expiration"),
-            models.WetLeaves.Weight.label("weight"),
-            models.WetLeaves.Status.label("status"),
-            literal_column("'Wet Leaves'").label("product_name"),
-            models.User.Username.label("username"),
-            models.User.UserID.label("centra_id")
-        )
-        .join(models.User, models.WetLeaves.UserID == models.User.UserID)
-        .filter(*wetleaves_filters)
-    )
-
-    dryleaves_query = (
-        db.query(
-            models.DryLeaves.DryLeavesID.label("id"),
-            models.DryLeaves.UserID.label("user_id"),
-            models.DryLeaves.Expiration.label("expiration"),
-            models.DryLeaves.Processed_Weight.label("weight"),
-            models.DryLeaves.Status.label("status"),
-            literal_column("'Dry Leaves'").label("product_name"),
-            models.User.Username.label("username"),
-            models.User.UserID.label("centra_id")
-        )
-        .join(models.User, models.DryLeaves.UserID == models.User.UserID)
-        .filter(*dryleaves_filters)
-    )
-
-    powder_query = (
-        db.query(
-            models.Flour.FlourID.label("id"),
-            models.Flour.UserID.label("user_id"),
-            models.Flour.Expiration.label("expiration"),
-            models.Flour.Flour_Weight.label("weight"),
-            models.Flour.Status.label("status"),
-            literal_column("'Powder'").label("product_name"),
-            models.User.Username.label("username"),
-            models.User.UserID.label("centra_id")
-        )
-        .join(models.User, models.Flour.UserID == models.User.UserID)
-        .filter(*powder_filters)
-    )
-
-    combined_query = wetleaves_query.union_all(dryleaves_query).union_all(powder_query)
-    paged_query = combined_query.offset(skip).limit(limit)
-    rows = paged_query.all()
-
-    currentDate = datetime.now()
-    results = []
-
-    for row in rows:
-        source = row.product_name
-        centra_base_settings = get_centra_base_settings_by_user_id_and_items(db, row.user_id, source)
-        discount_conditions = get_centra_setting_detail_by_user_id_and_item(db, row.user_id, source)
-
-        price = centra_base_settings[0].InitialPrice if centra_base_settings else 0
-        expdayleft = (row.expiration - currentDate).days
-
-        def calculate_discounted_price(expiry_left, data, initial_price):
-            applicable = [item for item in data if expiry_left <= item.ExpDayLeft]
-            if not applicable:
-                return initial_price
-            best = min(applicable, key=lambda x: x.ExpDayLeft).DiscountRate
-            return round(initial_price - (initial_price * best / 100))
-
-        final_price = calculate_discounted_price(expdayleft, discount_conditions, price)
-
-        results.append({
-            "id": row.id,
-            "product_name": row.product_name,
-            "stock": row.weight,
-            "centra_name": row.username,
-            "initial_price": price,
-            "price": final_price,
-            "expiry_time": expdayleft,
-            "status": row.status
-        })
-
-    return results
+    rows = db.execute(search_products_stmt(query, skip=skip, limit=limit, show_all=show_all)).fetchall()
+    return _price_marketplace_rows(db, rows, "weight")
 
 def get_marketplace_items_by_centra(db: Session, centra_name: str, skip: int = 0, limit: int = 15):
     """Get marketplace items filtered by specific centra name"""
-    
-    # Queries for individual products - only include available products from specific centra
-    wet = db.query(
-        models.WetLeaves.WetLeavesID.label("id"),
-        models.WetLeaves.UserID.label("user_id"),
-        models.WetLeaves.Expiration.label("expiration"),
-        models.WetLeaves.Weight.label("stock"),
-        models.WetLeaves.Status.label("status"),
-        literal_column("'Wet Leaves'").label("product_name")
-    ).join(models.User, models.WetLeaves.UserID == models.User.UserID
-    ).filter(
-        models.WetLeaves.Status == "Awaiting",
-        models.User.Username == centra_name
-    )
-
-    dry = db.query(
-        models.DryLeaves.DryLeavesID.label("id"),
-        models.DryLeaves.UserID.label("user_id"),
-        models.DryLeaves.Expiration.label("expiration"),
-        models.DryLeaves.Processed_Weight.label("stock"),
-        models.DryLeaves.Status.label("status"),
-        literal_column("'Dry Leaves'").label("product_name")
-    ).join(models.User, models.DryLeaves.UserID == models.User.UserID
-    ).filter(
-        models.DryLeaves.Status == "Awaiting",
-        models.User.Username == centra_name
-    )
-
-    flour = db.query(
-        models.Flour.FlourID.label("id"),
-        models.Flour.UserID.label("user_id"),
-        models.Flour.Expiration.label("expiration"),
-        models.Flour.Flour_Weight.label("stock"),
-        models.Flour.Status.label("status"),
-        literal_column("'Powder'").label("product_name")
-    ).join(models.User, models.Flour.UserID == models.User.UserID
-    ).filter(
-        models.Flour.Status == "Awaiting",
-        models.User.Username == centra_name
-    )
-
-    # Combine queries with UNION ALL
-    union_query = union_all(wet, dry, flour).alias("products")
-
-    # Create an alias for the User table
-    user_alias = aliased(models.User)
-
-    # Create the full select statement with join to get username
-    stmt = select(
-        union_query.c.id,
-        union_query.c.user_id,
-        user_alias.Username.label("username"),
-        union_query.c.expiration,
-        union_query.c.product_name,
-        union_query.c.stock,
-        union_query.c.status
-    ).join(user_alias, union_query.c.user_id == user_alias.UserID
-    ).filter(
-        union_query.c.expiration > func.now(),  # Filter out expired products
-        user_alias.Username == centra_name  # Filter by centra name
-    ).order_by(func.random()).offset(skip).limit(limit)
-
-    # Execute the query
-    rows = db.execute(stmt).fetchall()
-    
-    currentDate = datetime.now()
-    results = []
-
-    for row in rows:
-        source = row.product_name
-        centra_base_settings = get_centra_base_settings_by_user_id_and_items(db, row.user_id, source)
-        discount_conditions = get_centra_setting_detail_by_user_id_and_item(db, row.user_id, source)
-
-        price = centra_base_settings[0].InitialPrice if centra_base_settings else 0
-        expdayleft = (row.expiration - currentDate).days
-
-        def calculate_discounted_price(expiry_left, data, initial_price):
-            applicable = [item for item in data if expiry_left <= item.ExpDayLeft]
-            if not applicable:
-                return initial_price
-            best = min(applicable, key=lambda x: x.ExpDayLeft).DiscountRate
-            return round(initial_price - (initial_price * best / 100))
-
-        final_price = calculate_discounted_price(expdayleft, discount_conditions, price)
-
-        results.append({
-            "id": row.id,
-            "product_name": row.product_name,
-            "stock": row.stock,
-            "centra_name": row.username,
-            "initial_price": price,
-            "price": final_price,
-            "expiry_time": expdayleft,
-            "status": row.status
-        })
-
-    return results
\ No newline at end of file
+    rows = db.execute(marketplace_items_stmt(skip=skip, limit=limit, centra_name=centra_name)).fetchall()
+    return _price_marketplace_rows(db, rows, "stock")
\ No newline at end of file
@@ -1,20 +1,192 @@
 import os
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+import metrics
+import query_metrics
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("POSTGRESQL_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+# Engine settings, all overridable from the environment / .env
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)  # seconds, Supabase/PgBouncer drop idle connections
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 0)  # 0 disables the timeout
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "leafty-api")
+# PgBouncer in transaction mode does its own pooling and cannot keep
+# session state, so we open/close a connection per checkout and disable
+# server-side prepared statements
+DB_PGBOUNCER_TRANSACTION_MODE = _env_bool("DB_PGBOUNCER_TRANSACTION_MODE", False)
+DB_PREPARED_STATEMENT_CACHE_SIZE = _env_int("DB_PREPARED_STATEMENT_CACHE_SIZE", 100)
+
+class _TimedCheckout:
+    """Pool mixin recording how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            query_metrics.record_pool_wait(time.perf_counter() - started)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+# Without pooling the wait is the time to open a new connection
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
+def engine_options(database_url) -> dict:
+    """Build create_engine keyword arguments for the configured pooling profile"""
+    url = make_url(database_url)
+    options = {}
+
+    # SQLite (local benchmarks) keeps SQLAlchemy's own pool defaults
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    if DB_PGBOUNCER_TRANSACTION_MODE:
+        options["poolclass"] = TimedNullPool
+    else:
+        options.update(
+            poolclass=TimedAsyncQueuePool if url.get_driver_name() == "asyncpg" else TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+
+    if url.get_driver_name() == "asyncpg":
+        server_settings = {"application_name": DB_APPLICATION_NAME}
+        if DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER_TRANSACTION_MODE:
+            server_settings["statement_timeout"] = str(DB_STATEMENT_TIMEOUT_MS)
+        options["connect_args"] = {
+            "server_settings": server_settings,
+            "prepared_statement_cache_size": 0 if DB_PGBOUNCER_TRANSACTION_MODE else DB_PREPARED_STATEMENT_CACHE_SIZE,
+        }
+        if DB_PGBOUNCER_TRANSACTION_MODE:
+            options["connect_args"]["statement_cache_size"] = 0
+    else:
+        connect_args = {"application_name": DB_APPLICATION_NAME}
+        # PgBouncer rejects the "options" startup parameter, set the timeout on the role there instead
+        if DB_STATEMENT_TIMEOUT_MS and not DB_PGBOUNCER_TRANSACTION_MODE:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        options["connect_args"] = connect_args
+
+    return options
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+query_metrics.instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Pool metrics
+pool_events = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+
+def _count(name):
+    def listener(*args):
+        pool_events[name] += 1
+    return listener
+
+event.listen(engine, "connect", _count("connects"))
+event.listen(engine, "checkout", _count("checkouts"))
+event.listen(engine, "checkin", _count("checkins"))
+event.listen(engine, "invalidate", _count("invalidations"))
+
+def get_pool_status() -> dict:
+    pool = engine.pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "pgbouncer_transaction_mode": DB_PGBOUNCER_TRANSACTION_MODE,
+        **pool_events,
+    }
+    if hasattr(pool, "checkedout"):
+        status.update(
+            pool_size=pool.size(),
+            max_overflow=DB_MAX_OVERFLOW,
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return status
+
+def _pool_gauges():
+    status = get_pool_status()
+    return [((name,), status[name]) for name in ("checked_out", "checked_in", "overflow", "pool_size") if name in status]
+
+metrics.REGISTRY.callback_gauge("leafty_db_pool_connections", "Connection pool state.", ("state",), _pool_gauges)
+
+# Async engine for read-heavy routers (SQLAlchemy asyncio + asyncpg), created on first use
+_async_engine = None
+_AsyncSessionLocal = None
+
+def async_database_url(database_url: str):
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        query = dict(url.query)
+        # asyncpg takes "ssl" where libpq takes "sslmode"
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        async_url = async_database_url(SQLALCHEMY_DATABASE_URL)
+        _async_engine = create_async_engine(async_url, **engine_options(async_url))
+        query_metrics.instrument_engine(_async_engine.sync_engine)
+        _AsyncSessionLocal = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+def get_request_db(request: Request) -> Session:
+    """Return the session bound to this request, creating it on first use"""
+    db = getattr(request.state, "db", None)
+    if db is None:
+        db = SessionLocal()
+        request.state.db = db
+    return db
+
+def close_request_db(request: Request):
+    db = getattr(request.state, "db", None)
+    if db is not None:
+        request.state.db = None
+        db.close()
+
+def get_db(request: Request):
+    # The session lives on request.state so every dependency in the request shares it;
+    # db_session_middleware closes it once the response has been produced
+    yield get_request_db(request)
\ No newline at end of file
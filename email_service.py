@@ -9,6 +9,7 @@ import base64
 from typing import Optional
 import logging
 from datetime import datetime
+import metrics
 
 # Load and encode the LeaftyLogo.png
 def get_encoded_logo():
@@ -94,20 +95,20 @@ class EmailService:
             )
             msg.attach(attachment)
 
-            # Create SMTP session
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable security
-            
             # Validate credentials before login
             if not self.email_address or not self.email_password:
                 raise ValueError("Email credentials are not properly configured")
-                
-            server.login(self.email_address, self.email_password)
-            
-            # Send email
+
+            # Create SMTP session
             text = msg.as_string()
-            server.sendmail(self.email_address, to_email, text)
-            server.quit()
+            with metrics.track_outbound("smtp", "send_email"):
+                server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+                server.starttls()  # Enable security
+                server.login(self.email_address, self.email_password)
+
+                # Send email
+                server.sendmail(self.email_address, to_email, text)
+                server.quit()
             
             logging.info(f"Receipt email sent successfully to {to_email}")
             return True
@@ -169,20 +170,20 @@ class EmailService:
                 except Exception as e:
                     logging.error(f"Failed to embed PNG logo: {str(e)}")
 
-            # Create SMTP session
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable security
-            
             # Validate credentials before login
             if not self.email_address or not self.email_password:
                 raise ValueError("Email credentials are not properly configured")
-                
-            server.login(self.email_address, self.email_password)
-            
-            # Send email
+
+            # Create SMTP session
             text = msg.as_string()
-            server.sendmail(self.email_address, to_email, text)
-            server.quit()
+            with metrics.track_outbound("smtp", "send_email"):
+                server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+                server.starttls()  # Enable security
+                server.login(self.email_address, self.email_password)
+
+                # Send email
+                server.sendmail(self.email_address, to_email, text)
+                server.quit()
             
             logging.info(f"Email sent successfully to {to_email}")
             return True
@@ -0,0 +1,118 @@
+"""Streaming CSV / NDJSON exports of inventory, users and blockchain transactions.
+
+Rows are read through a server-side cursor in batches of EXPORT_BATCH_ROWS
+and written out batch by batch, so memory stays flat whatever the table size.
+Exports open their own session, the request session is closed by the
+middleware before a streaming body has been sent.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import select
+
+import crud
+import models
+from database import SessionLocal
+
+load_dotenv()
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _username():
+    return models.User.Username.label("Username")
+
+
+# dataset -> (columns, joined user column, status column, date column, order column)
+def _datasets():
+    wet, dry, flour, trx, user = models.WetLeaves, models.DryLeaves, models.Flour, models.BlockchainTrx, models.User
+    return {
+        "wet_leaves": ([wet.WetLeavesID, wet.UserID, _username(), wet.Weight, wet.ReceivedTime, wet.Expiration, wet.Status],
+                       wet.UserID, wet.Status, wet.ReceivedTime, wet.WetLeavesID),
+        "dry_leaves": ([dry.DryLeavesID, dry.UserID, _username(), dry.WetLeavesID, dry.Processed_Weight, dry.Expiration,
+                        dry.Status, dry.CreatedAt],
+                       dry.UserID, dry.Status, dry.CreatedAt, dry.DryLeavesID),
+        "flour": ([flour.FlourID, flour.UserID, _username(), flour.DryLeavesID, flour.Flour_Weight, flour.Expiration,
+                   flour.Status, flour.CreatedAt],
+                  flour.UserID, flour.Status, flour.CreatedAt, flour.FlourID),
+        "users": ([user.UserID, user.Username, user.Email, user.PhoneNumber, user.RoleID],
+                  user.UserID, None, None, user.UserID),
+        "blockchain_trx": ([trx.TrxId, trx.UserID, _username(), trx.BlockchainHash, trx.CreatedAt],
+                           trx.UserID, None, trx.CreatedAt, trx.TrxId),
+    }
+
+
+EXPORT_DATASETS = tuple(_datasets())
+
+
+def export_query(dataset: str, centra: Optional[str] = None, status: Optional[str] = None,
+                 date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Validated select for one dataset, date_to is inclusive"""
+    datasets = _datasets()
+    if dataset not in datasets:
+        raise HTTPException(status_code=404, detail=f"dataset must be one of {', '.join(EXPORT_DATASETS)}")
+    columns, user_column, status_column, date_column, order_column = datasets[dataset]
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+
+    stmt = select(*columns)
+    if dataset != "users":
+        stmt = stmt.outerjoin(models.User, models.User.UserID == user_column)
+    if centra is not None:
+        user_id = crud.normalize_user_id(centra)
+        if user_id is None:
+            raise HTTPException(status_code=400, detail="centra must be a user id")
+        stmt = stmt.where(user_column == user_id)
+    if status is not None:
+        if status_column is None:
+            raise HTTPException(status_code=400, detail=f"{dataset} cannot be filtered by status")
+        stmt = stmt.where(status_column == status)
+    if date_from is not None or date_to is not None:
+        if date_column is None:
+            raise HTTPException(status_code=400, detail=f"{dataset} cannot be filtered by date")
+        if date_from is not None:
+            stmt = stmt.where(date_column >= datetime.combine(date_from, time.min))
+        if date_to is not None:
+            stmt = stmt.where(date_column < datetime.combine(date_to, time.min) + timedelta(days=1))
+    return stmt.order_by(order_column)
+
+
+def media_type(export_format: str) -> str:
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    return EXPORT_FORMATS[export_format]
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_serialize(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def stream_export(stmt, export_format: str) -> Iterator[str]:
+    """Yield the export body batch by batch from a server-side cursor"""
+    with SessionLocal() as db:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        keys = list(result.keys())
+        if export_format == "csv":
+            yield _csv_chunk([keys])
+        for rows in result.partitions():
+            if export_format == "csv":
+                yield _csv_chunk(rows)
+            else:
+                yield "".join(json.dumps({key: _serialize(value) for key, value in zip(keys, row)}) + "\n" for row in rows)
@@ -1,15 +1,25 @@
+import time
+
+_startup_started = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException, Depends, Request, Response, status, Query
 from fastapi.middleware.cors import CORSMiddleware
-import models
-from database import SessionLocal, engine, get_db
+from database import close_request_db, get_db
+import metrics
+import profiling
+import query_metrics
+import statistics_rollup  # registers the flush hook that keeps statistics_rollup current
+import response_cache  # registers the session hooks that invalidate cached marketplace reads
 from fastapi_sessions.frontends.implementations import SessionCookie, CookieParameters
-import sys
-from routes import auth, biteship, blockchain, bulk_algorithm, items, marketplace, statistics, xendit, admin_settings, centra_finance, centra_setting, courier, wet_leaves, dry_leaves, flour, location, market_shipment, products, roles, shipment, subTransaction, transaction, users
-from routes.public import pub_marketplace
+import importlib
+import logging
+import os
 
-sys.setrecursionlimit(10000)
+# Tables are managed by Alembic (`alembic upgrade head`), not created on startup
 
-models.Base.metadata.create_all(bind=engine)
+# STARTUP_PROFILE=true logs how long each router takes to import and mount
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+startup_timings = []
 
 app = FastAPI()
 
@@ -48,40 +58,109 @@ app.add_middleware(
 
 @app.middleware("http")
 async def db_session_middleware(request: Request, call_next):
-    response = Response("Internal server error", status_code=500)
+    # get_db opens the session lazily, so requests that never touch the database skip the pool
     try:
-        request.state.db = SessionLocal()
         response = await call_next(request)
     finally:
-        request.state.db.close()
+        close_request_db(request)
+    return response
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    queries = query_metrics.RequestQueries()
+    token = query_metrics.current_request.set(queries)
+    if metrics.threadpool_saturated():
+        metrics.THREADPOOL_SATURATED.inc()
+    metrics.HTTP_IN_FLIGHT.inc()
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        duration = time.perf_counter() - started
+        metrics.HTTP_IN_FLIGHT.dec()
+        query_metrics.current_request.reset(token)
+        # labelled by router tag and route template so the series stay bounded, unmatched paths share one label
+        route = request.scope.get("route")
+        tags = getattr(route, "tags", None)
+        tag = tags[0] if tags else "untagged"
+        route_path = getattr(route, "path", "unmatched")
+        metrics.HTTP_REQUEST_DURATION.observe(duration, tag, request.method, route_path)
+        metrics.HTTP_RESPONSES.inc(tag, f"{status_code // 100}xx")
+        query_metrics.finish_request(tag, request.method, route_path, status_code, duration, queries)
+    if query_metrics.QUERY_DEBUG_HEADERS:
+        response.headers.update(queries.headers())
+    return response
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    # off unless PROFILE_SAMPLE_RATE or PROFILE_TOKEN is set, see profiling.py
+    profile = profiling.start(request)
+    if profile is None:
+        return await call_next(request)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        profiling.finish(profile, status_code)
+    if profile.trigger == "header":
+        response.headers["X-Profile-Id"] = profile.id
     return response
 
 @app.get("/")
 def root():
     return
 
-app.include_router(auth.router, tags=["Auth"])
-app.include_router(users.router, tags=["Users"])
-app.include_router(items.router, tags=["Items"])
-app.include_router(xendit.router, tags=["Xendit"])
-app.include_router(admin_settings.router, tags=["Admin Settings"])
-app.include_router(biteship.router, tags=["Biteship"])
-app.include_router(blockchain.router, tags=["Blockchain"])
-app.include_router(centra_finance.router, tags=["Centra Finance"])
-app.include_router(centra_setting.router, tags=["Centra Settings"])
-app.include_router(courier.router, tags=["Courier"])
-app.include_router(wet_leaves.router, tags=["Wet Leaves"])
-app.include_router(dry_leaves.router, tags=["Dry Leaves"])
-app.include_router(flour.router, tags=["Flour"])
-app.include_router(location.router, tags=["Location"])
-app.include_router(market_shipment.router, tags=["MarketShipment"])
-app.include_router(products.router, tags=["Products"])
-app.include_router(roles.router, tags=["Roles"])
-app.include_router(shipment.router, tags=["Shipment"])
-app.include_router(subTransaction.router, tags=["SubTransaction"])
-app.include_router(transaction.router, tags=["Transaction"])
-app.include_router(statistics.router, tags=["Statistics"])
-app.include_router(marketplace.router, tags=["Marketplace"], dependencies=[Depends(cookie)])
-app.include_router(pub_marketplace.router, tags=["Marketplace"])
-app.include_router(bulk_algorithm.router, tags=["Bulk Algorithm"])
+PUBLIC_MARKETPLACE_ASYNC_DB = os.getenv("PUBLIC_MARKETPLACE_ASYNC_DB", "false").lower() in ("1", "true", "yes")
+
+ROUTERS = [
+    ("routes.auth", ["Auth"]),
+    ("routes.users", ["Users"]),
+    ("routes.items", ["Items"]),
+    ("routes.xendit", ["Xendit"]),
+    ("routes.admin_settings", ["Admin Settings"]),
+    ("routes.biteship", ["Biteship"]),
+    ("routes.blockchain", ["Blockchain"]),
+    ("routes.centra_finance", ["Centra Finance"]),
+    ("routes.centra_setting", ["Centra Settings"]),
+    ("routes.courier", ["Courier"]),
+    ("routes.wet_leaves", ["Wet Leaves"]),
+    ("routes.dry_leaves", ["Dry Leaves"]),
+    ("routes.flour", ["Flour"]),
+    ("routes.location", ["Location"]),
+    ("routes.market_shipment", ["MarketShipment"]),
+    ("routes.products", ["Products"]),
+    ("routes.roles", ["Roles"]),
+    ("routes.shipment", ["Shipment"]),
+    ("routes.subTransaction", ["SubTransaction"]),
+    ("routes.transaction", ["Transaction"]),
+    ("routes.statistics", ["Statistics"]),
+    ("routes.exports", ["Exports"]),
+    ("routes.traceability", ["Traceability"]),
+    ("routes.reconciliation", ["Reconciliation"]),
+    ("routes.marketplace", ["Marketplace"], [Depends(cookie)]),
+    # The public catalogue can be served from the async engine instead of the threadpool
+    ("routes.public.pub_marketplace_async" if PUBLIC_MARKETPLACE_ASYNC_DB else "routes.public.pub_marketplace", ["Marketplace"]),
+    ("routes.bulk_algorithm", ["Bulk Algorithm"]),
+    ("routes.monitoring", ["Monitoring"]),
+    ("routes.profiling", ["Profiling"]),
+]
+
+def include_router(module_name: str, tags: list, dependencies: list = None):
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    imported = time.perf_counter()
+    app.include_router(module.router, tags=tags, dependencies=dependencies or [])
+    if STARTUP_PROFILE:
+        # Shared modules (models, crud, ...) are charged to the first router that imports them
+        startup_timings.append((module_name, (imported - started) * 1000, (time.perf_counter() - imported) * 1000))
+
+for entry in ROUTERS:
+    include_router(*entry)
 
+if STARTUP_PROFILE:
+    for module_name, import_ms, include_ms in sorted(startup_timings, key=lambda t: t[1] + t[2], reverse=True):
+        logging.warning(f"startup {module_name}: import {import_ms:.1f} ms, include {include_ms:.1f} ms")
+    logging.warning(f"startup total: {(time.perf_counter() - _startup_started) * 1000:.1f} ms")
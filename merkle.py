@@ -0,0 +1,56 @@
+"""SHA-256 Merkle trees with inclusion proofs.
+
+Leaves and inner nodes are hashed with different prefixes so a leaf can
+never be passed off as an inner node. An odd node at the end of a level is
+carried up unchanged instead of being paired with itself, so two different
+leaf lists cannot produce the same root.
+"""
+import hashlib
+from typing import List, Sequence
+
+LEFT = "L"
+RIGHT = "R"
+
+
+def hash_leaf(data: bytes) -> str:
+    return hashlib.sha256(b"\x00" + data).hexdigest()
+
+
+def hash_node(left: str, right: str) -> str:
+    return hashlib.sha256(b"\x01" + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def build_tree(leaves: Sequence[str]) -> List[List[str]]:
+    """All levels of the tree, leaves first and the root level last"""
+    if not leaves:
+        raise ValueError("a Merkle tree needs at least one leaf")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [hash_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+
+def root_of(levels: List[List[str]]) -> str:
+    return levels[-1][0]
+
+
+def proof_for(levels: List[List[str]], index: int) -> List[List[str]]:
+    """Sibling hashes from leaf to root as [side, hash] pairs, side is where the sibling sits"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append([LEFT if sibling < index else RIGHT, level[sibling]])
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf: str, proof: Sequence[Sequence[str]], root: str) -> bool:
+    node = leaf
+    for side, sibling in proof:
+        node = hash_node(sibling, node) if side == LEFT else hash_node(node, sibling)
+    return node == root
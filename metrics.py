@@ -0,0 +1,233 @@
+"""Process metrics in the Prometheus text exposition format.
+
+Counters, gauges and histograms are sharded per thread: a thread only ever
+writes to its own shard, so recording takes no lock, and a scrape sums the
+shards. Histogram buckets are fixed when the metric is declared, an
+observation is one bisect and two additions. Callback gauges are read at
+scrape time.
+
+The HTTP middleware in main.py records request latency, in-flight requests
+and threadpool saturation. Outbound calls are timed with track_outbound.
+GET /metrics (routes/monitoring.py) serves REGISTRY.exposition().
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, help_text: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        shard = self.registry.shard()
+        key = (self, labelvalues)
+        shard[key] = shard.get(key, 0) + amount
+
+    def samples(self, totals: dict) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}"
+                for labelvalues, value in sorted(totals.items())]
+
+    def merge(self, total, value):
+        return (total or 0) + value
+
+
+class Gauge(Counter):
+    """A sharded gauge only moves by inc/dec, its value is the sum of every shard"""
+    kind = "gauge"
+
+    def dec(self, *labelvalues, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help_text, labelnames, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues):
+        shard = self.registry.shard()
+        key = (self, labelvalues)
+        counts = shard.get(key)
+        if counts is None:
+            # one slot per bucket, +Inf, then the sum
+            counts = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def merge(self, total, counts):
+        if total is None:
+            return list(counts)
+        return [a + b for a, b in zip(total, counts)]
+
+    def samples(self, totals: dict) -> List[str]:
+        lines = []
+        for labelvalues, counts in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labelvalues)} {_number(counts[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labelvalues)} {cumulative}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """Read at scrape time, callback returns (labelvalues, value) pairs"""
+    kind = "gauge"
+
+    def __init__(self, registry, name, help_text, labelnames, callback: Callable[[], Iterable[Tuple[tuple, float]]]):
+        super().__init__(registry, name, help_text, labelnames)
+        self.callback = callback
+
+    def samples(self, totals: dict) -> List[str]:
+        try:
+            values = list(self.callback())
+        except Exception:
+            return []
+        return [f"{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}" for labelvalues, value in values]
+
+
+class Registry:
+    def __init__(self):
+        # only taken when a metric is declared or a thread writes for the first time
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._metrics: List[_Metric] = []
+
+    def shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _declare(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"metric {metric.name} is already registered")
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._declare(Counter(self, name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._declare(Gauge(self, name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._declare(Histogram(self, name, help_text, labelnames, buckets))
+
+    def callback_gauge(self, name: str, help_text: str, labelnames: Sequence[str],
+                       callback: Callable[[], Iterable[Tuple[tuple, float]]]) -> CallbackGauge:
+        return self._declare(CallbackGauge(self, name, help_text, labelnames, callback))
+
+    def exposition(self) -> str:
+        with self._lock:
+            shards = list(self._shards)
+            declared = list(self._metrics)
+        totals = {metric: {} for metric in declared}
+        for shard in shards:
+            # dict.copy is atomic, the owning thread may keep writing meanwhile
+            for (metric, labelvalues), value in shard.copy().items():
+                per_metric = totals[metric]
+                per_metric[labelvalues] = metric.merge(per_metric.get(labelvalues), value)
+        lines = []
+        for metric in declared:
+            lines.extend(metric.header())
+            lines.extend(metric.samples(totals[metric]))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "leafty_http_request_duration_seconds", "HTTP request latency by router tag and route.", ("tag", "method", "route"))
+HTTP_RESPONSES = REGISTRY.counter(
+    "leafty_http_responses_total", "HTTP responses by router tag and status class.", ("tag", "status"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("leafty_http_requests_in_flight", "HTTP requests being served.")
+THREADPOOL_SATURATED = REGISTRY.counter(
+    "leafty_threadpool_saturated_requests_total", "Requests that arrived while every threadpool worker was busy.")
+OUTBOUND_DURATION = REGISTRY.histogram(
+    "leafty_outbound_request_duration_seconds", "Latency of calls to external services.", ("service", "operation", "outcome"))
+
+
+def _threadpool_limiter():
+    from anyio import to_thread
+
+    # only works on the event loop, the scrape handler is async for this reason
+    return to_thread.current_default_thread_limiter()
+
+
+def threadpool_saturated() -> bool:
+    limiter = _threadpool_limiter()
+    return limiter.borrowed_tokens >= limiter.total_tokens
+
+
+def _threadpool_stats():
+    statistics = _threadpool_limiter().statistics()
+    return [
+        (("busy",), statistics.borrowed_tokens),
+        (("total",), statistics.total_tokens),
+        (("waiting",), statistics.tasks_waiting),
+    ]
+
+
+REGISTRY.callback_gauge("leafty_threadpool_workers", "Threadpool workers busy, in total and tasks waiting for one.",
+                        ("state",), _threadpool_stats)
+
+
+class OutboundCall:
+    def __init__(self):
+        self.status: Optional[int] = None
+
+
+@contextmanager
+def track_outbound(service: str, operation: str):
+    """Time a call to an external service, set `call.status` to label it with the status class"""
+    call = OutboundCall()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield call
+        outcome = f"{call.status // 100}xx" if call.status else "ok"
+    finally:
+        OUTBOUND_DURATION.observe(time.perf_counter() - started, service, operation, outcome)
@@ -1,5 +1,5 @@
 from datetime import datetime, timedelta
-from sqlalchemy import Boolean, CheckConstraint, Column, Integer, String, Text, ForeignKey, Float, DateTime, Enum, BigInteger, Table, func
+from sqlalchemy import Boolean, CheckConstraint, Column, Date, Integer, String, Text, ForeignKey, Float, DateTime, Enum, BigInteger, Index, Table, UniqueConstraint, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -26,6 +26,7 @@ class OTP(Base):
     email = Column(String, primary_key=True, index=True)
     otp_code = Column(String, nullable=False)
     expires_at = Column(DateTime, nullable=False, default=func.now())
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
 
 class RoleModel(Base):
     __tablename__ = "roles"
@@ -69,29 +70,36 @@ class WetLeaves(Base):
     WetLeavesID = Column(Integer, primary_key=True, autoincrement=True)
     UserID = Column(String(36), ForeignKey("users.UserID"))
     Weight = Column(Float)
-    ReceivedTime = Column(DateTime)
+    ReceivedTime = Column(DateTime, index=True)
     Expiration = Column(DateTime)
     Status = Column(String(50), default="Awaiting")
 
+    __table_args__ = (
+        # per-centra intake lookups
+        Index("ix_wet_leaves_UserID_ReceivedTime", "UserID", "ReceivedTime"),
+    )
+
 class DryLeaves(Base):
     __tablename__ = "dry_leaves"
 
     DryLeavesID = Column(Integer, primary_key=True, autoincrement=True)
     UserID = Column(String(36), ForeignKey("users.UserID"))
-    WetLeavesID = Column(Integer, ForeignKey("wet_leaves.WetLeavesID"))
+    WetLeavesID = Column(Integer, ForeignKey("wet_leaves.WetLeavesID"), index=True)
     Processed_Weight = Column(Float)
     Expiration = Column(DateTime, nullable=True)
     Status = Column(String(50), default="Awaiting")
+    CreatedAt = Column(DateTime, nullable=True, default=datetime.now, server_default=func.now(), index=True)
 
 class Flour(Base):
     __tablename__ = "flour"
 
     FlourID = Column(Integer, primary_key=True, autoincrement=True)
-    DryLeavesID = Column(Integer, ForeignKey("dry_leaves.DryLeavesID"))
+    DryLeavesID = Column(Integer, ForeignKey("dry_leaves.DryLeavesID"), index=True)
     UserID = Column(String(36), ForeignKey("users.UserID"))
     Flour_Weight = Column(Float)
     Expiration = Column(DateTime, nullable=True)
     Status = Column(String(50), default="Awaiting")
+    CreatedAt = Column(DateTime, nullable=True, default=datetime.now, server_default=func.now(), index=True)
 
 class Shipment(Base):
     __tablename__ = "shipments"
@@ -107,6 +115,7 @@ class Shipment(Base):
     Rescalled_Weight = Column(Float, nullable=True)
     Rescalled_Date = Column(DateTime, nullable=True)
     Centra_Reception_File = Column(Boolean,nullable=True)
+    CreatedAt = Column(DateTime, nullable=True, default=datetime.now, server_default=func.now(), index=True)
     
     flours = relationship("Flour", secondary=shipment_flour_association, backref="shipments")
    
@@ -239,4 +248,103 @@ class BlockchainTrx(Base):
     CreatedAt = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="trx")
+
+    __table_args__ = (
+        # admin ledger filtered by user and ordered by time
+        Index("ix_trx_history_UserID_CreatedAt", "UserID", "CreatedAt"),
+    )
     
+
+
+# Daily totals per centra, metric and product type, kept up to date by statistics_rollup
+class StatisticsRollup(Base):
+    __tablename__ = "statistics_rollup"
+
+    UserID = Column(String(36), primary_key=True)
+    Metric = Column(String(50), primary_key=True)
+    ProductTypeID = Column(Integer, primary_key=True, default=0, server_default="0")
+    Day = Column(Date, primary_key=True)
+    Total = Column(Float, nullable=False, default=0, server_default="0")
+    ItemCount = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+# Precomputed conversion yields per centra (NULL = all centras), stage and period
+class YieldAnalytics(Base):
+    __tablename__ = "yield_analytics"
+
+    YieldID = Column(Integer, primary_key=True, autoincrement=True)
+    PeriodType = Column(String(10), nullable=False)
+    Period = Column(Date, nullable=False)
+    UserID = Column(String(36), nullable=True)
+    Stage = Column(String(20), nullable=False)
+    LotCount = Column(Integer, nullable=False)
+    InputWeight = Column(Float, nullable=False)
+    OutputWeight = Column(Float, nullable=False)
+    LossWeight = Column(Float, nullable=False)
+    Yield = Column(Float, nullable=True)
+    YieldP10 = Column(Float, nullable=True)
+    YieldP50 = Column(Float, nullable=True)
+    YieldP90 = Column(Float, nullable=True)
+    ComputedAt = Column(DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_yield_analytics_lookup", "PeriodType", "Period", "UserID"),
+    )
+
+
+# Time window of one centra's lineage events, anchored by recording the Merkle root in trx_history
+class AnchorBatch(Base):
+    __tablename__ = "anchor_batches"
+
+    BatchID = Column(Integer, primary_key=True, autoincrement=True)
+    UserID = Column(String(36), ForeignKey("users.UserID"), nullable=False)
+    WindowStart = Column(DateTime, nullable=False)
+    WindowEnd = Column(DateTime, nullable=False)
+    # 0 for a window's first batch, events that arrive after it was anchored get the next one
+    Sequence = Column(Integer, nullable=False, default=0, server_default="0")
+    EventCount = Column(Integer, nullable=False)
+    MerkleRoot = Column(String(64), nullable=False)
+    Tree = Column(Text, nullable=False)  # JSON list of levels, leaves first
+    TrxId = Column(Integer, ForeignKey("trx_history.TrxId"), nullable=True)
+    CreatedAt = Column(DateTime, nullable=False, default=datetime.now, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("UserID", "WindowStart", "Sequence", name="uq_anchor_batches_UserID_WindowStart_Sequence"),
+    )
+
+
+# One inventory lineage step (intake, drying, flour, shipment, sale) and its inclusion proof
+class LineageEvent(Base):
+    __tablename__ = "lineage_events"
+
+    EventID = Column(Integer, primary_key=True, autoincrement=True)
+    EventType = Column(String(32), nullable=False)
+    EntityID = Column(Integer, nullable=False)
+    UserID = Column(String(36), ForeignKey("users.UserID"), nullable=False)
+    OccurredAt = Column(DateTime, nullable=False)
+    Payload = Column(Text, nullable=False)  # canonical JSON the leaf hash was computed from
+    LeafHash = Column(String(64), nullable=False)
+    BatchID = Column(Integer, ForeignKey("anchor_batches.BatchID"), nullable=True)
+    LeafIndex = Column(Integer, nullable=True)
+    Proof = Column(Text, nullable=True)  # JSON list of [side, sibling hash]
+
+    __table_args__ = (
+        UniqueConstraint("EventType", "EntityID", name="uq_lineage_events_EventType_EntityID"),
+        # pending events of a window, and the events of a batch
+        Index("ix_lineage_events_BatchID_OccurredAt", "BatchID", "OccurredAt"),
+    )
+
+
+# One orphaned-reservation (or other) reconciliation run, dry or applied
+class ReconciliationRun(Base):
+    __tablename__ = "reconciliation_runs"
+
+    RunID = Column(Integer, primary_key=True, autoincrement=True)
+    Kind = Column(String(32), nullable=False)
+    Mode = Column(String(16), nullable=False)
+    TriggeredBy = Column(String(64), nullable=False)
+    StartedAt = Column(DateTime, nullable=False)
+    FinishedAt = Column(DateTime, nullable=True)
+    TransactionCount = Column(Integer, nullable=False, default=0)
+    ProductCount = Column(Integer, nullable=False, default=0)
+    Details = Column(Text, nullable=True)  # JSON summary of the run
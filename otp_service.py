@@ -0,0 +1,149 @@
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+
+import crud
+
+load_dotenv()
+
+OTP_TTL_MINUTES = int(os.getenv("OTP_TTL_MINUTES", "2"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+OTP_PURGE_INTERVAL_SECONDS = int(os.getenv("OTP_PURGE_INTERVAL_SECONDS", "60"))
+
+# "postgres" keeps codes in the otp table so every worker sees them,
+# "memory" is only safe for a single-process deployment
+OTP_STORE = os.getenv("OTP_STORE", "postgres").lower()
+
+_secret = os.getenv("OTP_SECRET_KEY")
+if not _secret:
+    logging.warning("OTP_SECRET_KEY is not set, using a random per-process key")
+    _secret = secrets.token_hex(32)
+OTP_SECRET_KEY = _secret.encode("utf-8")
+
+# verification results
+OTP_VALID = "valid"
+OTP_INVALID = "invalid"
+OTP_EXPIRED = "expired"
+OTP_LOCKED = "locked"
+
+
+def generate_code(digits: int = 6) -> str:
+    return str(secrets.randbelow(10 ** digits)).zfill(digits)
+
+
+def hash_code(email: str, otp_code: str) -> str:
+    """HMAC-SHA256 of the code bound to the email it was issued for"""
+    message = f"{email.strip().lower()}:{otp_code.strip()}".encode("utf-8")
+    return hmac.new(OTP_SECRET_KEY, message, hashlib.sha256).hexdigest()
+
+
+def _check(record_hash: str, expires_at: datetime, attempts: int, email: str, otp_code: str, now: datetime) -> str:
+    if attempts >= OTP_MAX_ATTEMPTS:
+        return OTP_LOCKED
+    if expires_at < now:
+        return OTP_EXPIRED
+    if not hmac.compare_digest(record_hash, hash_code(email, otp_code)):
+        return OTP_INVALID
+    return OTP_VALID
+
+
+class InMemoryOTPStore:
+    def __init__(self):
+        self._records: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def save(self, db: Optional[Session], email: str, otp_hash: str, expires_at: datetime):
+        with self._lock:
+            self._records[email] = [otp_hash, expires_at, 0]
+
+    def verify(self, db: Optional[Session], email: str, otp_code: str) -> str:
+        now = datetime.now()
+        with self._lock:
+            record = self._records.get(email)
+            if record is None:
+                return OTP_INVALID
+            result = _check(record[0], record[1], record[2], email, otp_code, now)
+            if result == OTP_VALID or result == OTP_EXPIRED:
+                del self._records[email]
+            elif result == OTP_INVALID:
+                record[2] += 1
+            return result
+
+    def purge_expired(self, db: Optional[Session]) -> int:
+        now = datetime.now()
+        with self._lock:
+            expired = [email for email, record in self._records.items() if record[1] < now]
+            for email in expired:
+                del self._records[email]
+        return len(expired)
+
+
+class PostgresOTPStore:
+    def save(self, db: Session, email: str, otp_hash: str, expires_at: datetime):
+        crud.upsert_otp(db, email, otp_hash, expires_at)
+
+    def verify(self, db: Session, email: str, otp_code: str) -> str:
+        # the attempt is counted before comparing, so concurrent guesses cannot exceed the limit
+        now = datetime.now()
+        otp_hash = crud.count_otp_attempt(db, email, OTP_MAX_ATTEMPTS, now)
+        if otp_hash is None:
+            db_otp = crud.get_otp_by_email(db, email)
+            if not db_otp:
+                return OTP_INVALID
+            if (db_otp.attempts or 0) >= OTP_MAX_ATTEMPTS:
+                return OTP_LOCKED
+            if db_otp.expires_at <= now:
+                crud.delete_otp(db, email, db_otp.otp_code)
+                return OTP_EXPIRED
+            # replaced by a new code in the meantime
+            return OTP_INVALID
+        if not hmac.compare_digest(otp_hash, hash_code(email, otp_code)):
+            return OTP_INVALID
+        # deleting is the single use, a concurrent verification of the same code loses here
+        return OTP_VALID if crud.delete_otp(db, email, otp_hash) else OTP_INVALID
+
+    def purge_expired(self, db: Session) -> int:
+        return crud.purge_expired_otps(db)
+
+
+store = InMemoryOTPStore() if OTP_STORE == "memory" else PostgresOTPStore()
+
+_last_purge = 0.0
+_purge_lock = threading.Lock()
+
+
+def _maybe_purge(db: Session):
+    """Batch-delete expired codes at most once per purge interval"""
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < OTP_PURGE_INTERVAL_SECONDS or not _purge_lock.acquire(blocking=False):
+        return
+    try:
+        _last_purge = now
+        purged = store.purge_expired(db)
+        if purged:
+            logging.info(f"Purged {purged} expired OTP codes")
+    finally:
+        _purge_lock.release()
+
+
+def issue_otp(db: Session, email: str) -> str:
+    """Create (or replace) the OTP for an email and return the plain code"""
+    _maybe_purge(db)
+    otp_code = generate_code()
+    expires_at = datetime.now() + timedelta(minutes=OTP_TTL_MINUTES)
+    store.save(db, email, hash_code(email, otp_code), expires_at)
+    return otp_code
+
+
+def verify_otp(db: Session, email: str, otp_code: str) -> str:
+    return store.verify(db, email, otp_code)
@@ -0,0 +1,83 @@
+"""Keyset pagination for list endpoints.
+
+A page is ordered by a unique key (the primary key, optionally preceded by
+a sort column) and the next page starts right after the last key of the
+previous one, so deep pages cost the same as the first. The key travels as
+an opaque cursor: in the `cursor` query parameter and the X-Next-Cursor
+response header.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(list):
+    """A list of rows that also knows the cursor of the following page"""
+
+    def __init__(self, rows=(), next_cursor: Optional[str] = None):
+        super().__init__(rows)
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(values: Sequence) -> str:
+    payload = [value.isoformat() if isinstance(value, (datetime, date)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [_from_json(value, column) for value, column in zip(values, columns)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _from_json(value, column):
+    python_type = column.type.python_type
+    if value is not None and python_type in (datetime, date):
+        return python_type.fromisoformat(value)
+    return value
+
+
+def _key_values(row, columns) -> list:
+    # ORM objects and labelled rows expose the key by name, (entity, extra...) rows on their first element
+    target = row if hasattr(row, columns[0].key) else row[0]
+    return [getattr(target, column.key) for column in columns]
+
+
+def paginate(query, columns: Sequence, cursor: Optional[str] = None, limit: Optional[int] = None,
+             skip: int = 0, descending: bool = False) -> Page:
+    """Order `query` by `columns` (ending in a unique column) and return one page.
+
+    Without a limit every row is returned, `skip` is only honoured when no
+    cursor is given so existing offset clients keep working.
+    """
+    if cursor is not None:
+        values = decode_cursor(cursor, columns)
+        key, bound = (columns[0], values[0]) if len(columns) == 1 else (tuple_(*columns), tuple_(*values))
+        query = query.filter(key < bound if descending else key > bound)
+    query = query.order_by(*(column.desc() if descending else column for column in columns))
+    if cursor is None and skip:
+        query = query.offset(skip)
+    if limit is None:
+        return Page(query.all())
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return Page(rows)
+    rows = rows[:limit]
+    return Page(rows, encode_cursor(_key_values(rows[-1], columns)))
+
+
+def set_next_cursor(response: Response, page):
+    next_cursor = getattr(page, "next_cursor", None)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
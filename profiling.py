@@ -0,0 +1,235 @@
+"""Opt-in sampling profiler for production requests.
+
+A request is profiled when PROFILE_SAMPLE_RATE picks it (optionally only
+under PROFILE_PATHS prefixes), or when it carries an X-Profile-Token header
+equal to PROFILE_TOKEN. While at least one request is being profiled a
+sampler thread reads sys._current_frames() every PROFILE_INTERVAL_MS. A
+sample belongs to the request when a thread is running the request's
+endpoint frame: a threadpool worker for sync endpoints, the event loop for
+async ones while the coroutine runs. Samples with no such frame are counted
+as "<waiting>" (awaiting I/O, the threadpool or dependencies), so the
+profile adds up to wall-clock time. CPU time is read from the sampled
+thread's CPU clock between samples, on the shared event loop it is only
+approximate.
+
+Finished profiles are kept in a bounded in-memory store and served as
+folded stacks by the admin endpoints in routes/profiling.py. With no sample
+rate and no token configured nothing is started and a request costs two
+comparisons.
+"""
+import hmac
+import inspect
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import Request
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_PATHS = tuple(path.strip() for path in os.getenv("PROFILE_PATHS", "").split(",") if path.strip())
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_ACTIVE = int(os.getenv("PROFILE_MAX_ACTIVE", "4"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "50"))
+PROFILE_MAX_STACKS = 500
+PROFILE_HEADER = "x-profile-token"
+
+WAITING = "<waiting>"
+OTHER = "<other>"
+
+
+def _frame_name(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+def _thread_cpu_seconds(thread_id: int) -> Optional[float]:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread_id))
+    except (AttributeError, OSError):
+        return None
+
+
+class Profile:
+    def __init__(self, request: Request, trigger: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.scope = request.scope
+        self.method = request.method
+        self.path = request.url.path
+        self.trigger = trigger
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.endpoint_code = None
+        # the endpoint's frame once a sample has found it, so concurrent calls of the same endpoint stay apart
+        self.frame = None
+        self.thread_id: Optional[int] = None
+        self.last_cpu: Optional[float] = None
+        self.samples = 0
+        self.cpu_seconds = 0.0
+        self.stacks: Dict[str, list] = {}
+
+    def _find_frame(self, frames: dict, claimed: set):
+        if self.endpoint_code is None:
+            route = self.scope.get("route")
+            endpoint = getattr(route, "endpoint", None)
+            if endpoint is None:
+                return None, None
+            self.endpoint_code = getattr(inspect.unwrap(endpoint), "__code__", None)
+        candidates = frames.items()
+        if self.thread_id in frames:
+            candidates = [(self.thread_id, frames[self.thread_id])] + [item for item in frames.items() if item[0] != self.thread_id]
+        for thread_id, frame in candidates:
+            chain = []
+            while frame is not None:
+                chain.append(frame)
+                if frame is self.frame or (self.frame is None and frame.f_code is self.endpoint_code and id(frame) not in claimed):
+                    return thread_id, chain
+                frame = frame.f_back
+        return None, None
+
+    def sample(self, frames: dict, claimed: set):
+        self.samples += 1
+        thread_id, chain = self._find_frame(frames, claimed)
+        if chain is None:
+            self._add(WAITING, 0.0)
+            return
+        if self.frame is None:
+            self.frame = chain[-1]
+            claimed.add(id(self.frame))
+        cpu = _thread_cpu_seconds(thread_id)
+        cpu_delta = 0.0
+        if cpu is not None and thread_id == self.thread_id and self.last_cpu is not None:
+            cpu_delta = max(cpu - self.last_cpu, 0.0)
+        self.thread_id, self.last_cpu = thread_id, cpu
+        self.cpu_seconds += cpu_delta
+        self._add(";".join(_frame_name(frame) for frame in reversed(chain)), cpu_delta)
+
+    def _add(self, stack: str, cpu_seconds: float):
+        if stack not in self.stacks and len(self.stacks) >= PROFILE_MAX_STACKS:
+            stack = OTHER
+        counts = self.stacks.setdefault(stack, [0, 0.0])
+        counts[0] += 1
+        counts[1] += cpu_seconds
+
+    def summary(self) -> dict:
+        route = self.scope.get("route")
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": getattr(route, "path", None),
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "samples": self.samples,
+            "cpu_ms": round(self.cpu_seconds * 1000, 2),
+        }
+
+
+class Sampler:
+    """Runs a sampling thread only while there are active profiles"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active: List[Profile] = []
+        self.claimed = set()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, profile: Profile) -> bool:
+        with self.lock:
+            if len(self.active) >= PROFILE_MAX_ACTIVE:
+                return False
+            self.active.append(profile)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="leafty-profiler", daemon=True)
+                self.thread.start()
+        return True
+
+    def stop(self, profile: Profile):
+        with self.lock:
+            if profile in self.active:
+                self.active.remove(profile)
+            if profile.frame is not None:
+                self.claimed.discard(id(profile.frame))
+                profile.frame = None
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while True:
+            time.sleep(PROFILE_INTERVAL_MS / 1000)
+            with self.lock:
+                if not self.active:
+                    self.thread = None
+                    return
+                frames = sys._current_frames()
+                frames.pop(own_thread, None)
+                now = time.perf_counter()
+                for profile in self.active:
+                    if now - profile.started <= PROFILE_MAX_SECONDS:
+                        profile.sample(frames, self.claimed)
+            del frames
+
+
+sampler = Sampler()
+profiles = deque(maxlen=PROFILE_STORE_SIZE)
+
+
+def _trigger(request: Request) -> Optional[str]:
+    if PROFILE_TOKEN:
+        token = request.headers.get(PROFILE_HEADER)
+        if token is not None and hmac.compare_digest(token, PROFILE_TOKEN):
+            return "header"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        if not PROFILE_PATHS or request.url.path.startswith(PROFILE_PATHS):
+            return "sampled"
+    return None
+
+
+def start(request: Request) -> Optional[Profile]:
+    """Start profiling this request if it is picked, returns None otherwise"""
+    if not PROFILE_TOKEN and PROFILE_SAMPLE_RATE <= 0:
+        return None
+    trigger = _trigger(request)
+    if trigger is None:
+        return None
+    profile = Profile(request, trigger)
+    return profile if sampler.start(profile) else None
+
+
+def finish(profile: Profile, status_code: int):
+    sampler.stop(profile)
+    result = profile.summary()
+    result["status"] = status_code
+    result["duration_ms"] = round((time.perf_counter() - profile.started) * 1000, 2)
+    result["stacks"] = [
+        {"stack": stack, "samples": samples, "cpu_ms": round(cpu_seconds * 1000, 2)}
+        for stack, (samples, cpu_seconds) in sorted(profile.stacks.items(), key=lambda item: -item[1][0])
+    ]
+    profiles.append(result)
+    logging.info(f"Profiled {result['method']} {result['path']} ({result['trigger']}): "
+                 f"{result['duration_ms']} ms, {result['samples']} samples, profile {result['id']}")
+
+
+def get_profiles() -> List[dict]:
+    return [{key: value for key, value in result.items() if key != "stacks"} for result in reversed(profiles)]
+
+
+def get_profile(profile_id: str) -> Optional[dict]:
+    return next((result for result in profiles if result["id"] == profile_id), None)
+
+
+def folded(result: dict, cpu: bool = False) -> str:
+    """Collapsed stacks for flamegraph.pl or speedscope, weighted by samples or by CPU microseconds"""
+    lines = []
+    for entry in result["stacks"]:
+        weight = int(round(entry["cpu_ms"] * 1000)) if cpu else entry["samples"]
+        if weight:
+            lines.append(f"{entry['stack']} {weight}\n")
+    return "".join(lines)
@@ -0,0 +1,141 @@
+"""Per-request SQL instrumentation.
+
+Cursor execute events on every engine add each statement's count and
+duration to the RequestQueries of the request being served (a contextvar,
+set by metrics_middleware in main.py). The pool records how long a
+checkout waited for a connection. When the request finishes its numbers are
+logged as one JSON line, optionally returned as X-DB-* response headers and
+added to the per-route counters in metrics.REGISTRY that /metrics exposes.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+import metrics
+
+# QUERY_DEBUG_HEADERS=true adds the X-DB-* headers to every response
+QUERY_DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))
+MAX_LOGGED_STATEMENT = 500
+
+logger = logging.getLogger("leafty.queries")
+
+
+class RequestQueries:
+    """SQL work done while serving one request"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.pool_wait_seconds = 0.0
+
+    def add_statement(self, statement: str, seconds: float):
+        with self.lock:
+            self.count += 1
+            self.db_seconds += seconds
+            if seconds > self.slowest_seconds:
+                self.slowest_seconds = seconds
+                self.slowest_statement = statement
+
+    def add_pool_wait(self, seconds: float):
+        with self.lock:
+            self.pool_wait_seconds += seconds
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-DB-Query-Count": str(self.count),
+            "X-DB-Time-Ms": f"{self.db_seconds * 1000:.2f}",
+            "X-DB-Slowest-Ms": f"{self.slowest_seconds * 1000:.2f}",
+            "X-DB-Pool-Wait-Ms": f"{self.pool_wait_seconds * 1000:.2f}",
+        }
+
+
+current_request: ContextVar[Optional[RequestQueries]] = ContextVar("current_request_queries", default=None)
+
+
+DB_STATEMENT_DURATION = metrics.REGISTRY.histogram(
+    "leafty_db_statement_duration_seconds", "SQL statement execution time.", buckets=metrics.DB_BUCKETS)
+DB_SLOW_STATEMENTS = metrics.REGISTRY.counter(
+    "leafty_db_slow_statements_total", f"SQL statements slower than {SLOW_QUERY_MS:g} ms.")
+DB_POOL_WAIT = metrics.REGISTRY.histogram(
+    "leafty_db_pool_wait_seconds", "Time a checkout waited for a pool connection.", buckets=metrics.DB_BUCKETS)
+REQUEST_STATEMENTS = metrics.REGISTRY.counter(
+    "leafty_http_request_db_statements_total", "SQL statements executed while serving requests.", ("tag", "method", "route"))
+REQUEST_DB_SECONDS = metrics.REGISTRY.counter(
+    "leafty_http_request_db_seconds_total", "Time spent in SQL while serving requests.", ("tag", "method", "route"))
+REQUEST_POOL_WAIT_SECONDS = metrics.REGISTRY.counter(
+    "leafty_http_request_pool_wait_seconds_total", "Time spent waiting for a pool connection while serving requests.",
+    ("tag", "method", "route"))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    DB_STATEMENT_DURATION.observe(seconds)
+    queries = current_request.get()
+    if queries is not None:
+        queries.add_statement(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        DB_SLOW_STATEMENTS.inc()
+        logger.warning(json.dumps({
+            "event": "slow_query",
+            "duration_ms": round(seconds * 1000, 2),
+            "statement": statement[:MAX_LOGGED_STATEMENT],
+        }))
+
+
+def _handle_error(exception_context):
+    # a failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def instrument_engine(engine):
+    """Time every statement run on this (sync) engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def record_pool_wait(seconds: float):
+    DB_POOL_WAIT.observe(seconds)
+    queries = current_request.get()
+    if queries is not None:
+        queries.add_pool_wait(seconds)
+
+
+def finish_request(tag: str, method: str, route: str, status_code: int, duration_seconds: float, queries: RequestQueries):
+    REQUEST_STATEMENTS.inc(tag, method, route, amount=queries.count)
+    REQUEST_DB_SECONDS.inc(tag, method, route, amount=queries.db_seconds)
+    REQUEST_POOL_WAIT_SECONDS.inc(tag, method, route, amount=queries.pool_wait_seconds)
+    record = {
+        "event": "request",
+        "tag": tag,
+        "method": method,
+        "route": route,
+        "status": status_code,
+        "duration_ms": round(duration_seconds * 1000, 2),
+        "db_queries": queries.count,
+        "db_time_ms": round(queries.db_seconds * 1000, 2),
+        "db_slowest_ms": round(queries.slowest_seconds * 1000, 2),
+        "db_pool_wait_ms": round(queries.pool_wait_seconds * 1000, 2),
+    }
+    if queries.count >= SLOW_REQUEST_QUERIES:
+        record["db_slowest_statement"] = (queries.slowest_statement or "")[:MAX_LOGGED_STATEMENT]
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
@@ -0,0 +1,218 @@
+"""Release products left 'Reserved' by marketplace transactions that expired unpaid.
+
+Expired pending transactions are processed in keyset chunks. For each chunk
+one UPDATE marks the transactions 'Transaction Expired' and one UPDATE per
+product table releases their reserved products back to 'Awaiting', all in
+the run's single database transaction. A product that is also held by a
+live transaction is left alone. Every run, dry or applied, is recorded in
+reconciliation_runs.
+
+Run `python find_orphaned_products.py [--apply]` from the command line.
+"""
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, literal, select, union_all, update
+from sqlalchemy.orm import Session, aliased
+
+import models
+
+PENDING_STATUSES = ("Transaction Pending", "Payment Pending")
+EXPIRED_STATUS = "Transaction Expired"
+RESERVED_STATUS = "Reserved"
+RELEASED_STATUS = "Awaiting"
+
+ORPHANED_RESERVATIONS = "orphaned_reservations"
+MAX_CHUNK_SIZE = 5000
+PREVIEW_ROWS = 100
+
+# market ProductTypeID -> (product type, model, id column, weight column)
+PRODUCT_TYPES = {
+    1: ("wet_leaves", models.WetLeaves, models.WetLeaves.WetLeavesID, models.WetLeaves.Weight),
+    2: ("dry_leaves", models.DryLeaves, models.DryLeaves.DryLeavesID, models.DryLeaves.Processed_Weight),
+    3: ("flour", models.Flour, models.Flour.FlourID, models.Flour.Flour_Weight),
+}
+
+
+def _expired(now: datetime):
+    transaction = models.Transaction
+    return and_(transaction.ExpirationAt < now, transaction.TransactionStatus.in_(PENDING_STATUSES))
+
+
+def _reserved_by_live_transactions(product_type_id: int, now: datetime):
+    """Product ids still held by a pending transaction that has not expired"""
+    market, sub, transaction = models.MarketShipment, models.SubTransaction, models.Transaction
+    return (
+        select(market.ProductID)
+        .join(sub, sub.SubTransactionID == market.SubTransactionID)
+        .join(transaction, transaction.TransactionID == sub.TransactionID)
+        .where(market.ProductTypeID == product_type_id,
+               transaction.TransactionStatus.in_(PENDING_STATUSES), transaction.ExpirationAt >= now)
+    )
+
+
+def _product_ids(product_type_id: int, transaction_ids):
+    market, sub = models.MarketShipment, models.SubTransaction
+    return (
+        select(market.ProductID)
+        .join(sub, sub.SubTransactionID == market.SubTransactionID)
+        .where(market.ProductTypeID == product_type_id, sub.TransactionID.in_(transaction_ids))
+    )
+
+
+def orphaned_products_query(transaction_ids, now: datetime):
+    """Reserved products of the given expired transactions, one row per product"""
+    market, sub, transaction = models.MarketShipment, models.SubTransaction, models.Transaction
+    centra, customer = aliased(models.User), aliased(models.User)
+    selects = []
+    for product_type_id, (product_type, model, id_column, weight_column) in PRODUCT_TYPES.items():
+        selects.append(
+            select(
+                literal(product_type).label("product_type"),
+                id_column.label("product_id"),
+                model.Status.label("current_status"),
+                centra.Username.label("centra_name"),
+                customer.Username.label("customer_name"),
+                market.Price.label("price"),
+                weight_column.label("weight"),
+                transaction.TransactionID.label("transaction_id"),
+                transaction.ExpirationAt.label("expiration_at"),
+                transaction.TransactionStatus.label("transaction_status"),
+            )
+            .select_from(transaction)
+            .join(sub, sub.TransactionID == transaction.TransactionID)
+            .join(market, market.SubTransactionID == sub.SubTransactionID)
+            .join(model, id_column == market.ProductID)
+            .outerjoin(centra, centra.UserID == model.UserID)
+            .outerjoin(customer, customer.UserID == transaction.CustomerID)
+            .where(
+                transaction.TransactionID.in_(transaction_ids),
+                market.ProductTypeID == product_type_id,
+                model.Status == RESERVED_STATUS,
+                id_column.not_in(_reserved_by_live_transactions(product_type_id, now)),
+            )
+        )
+    return union_all(*selects)
+
+
+def _report_row(row, now: datetime) -> dict:
+    expiration_at = row.expiration_at
+    if expiration_at is not None and expiration_at.tzinfo:
+        # now is naive UTC
+        expiration_at = expiration_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return {
+        "product_type": row.product_type,
+        "product_id": row.product_id,
+        "centra_name": row.centra_name,
+        "customer_name": row.customer_name,
+        "price": row.price,
+        "weight": row.weight,
+        "transaction_id": row.transaction_id,
+        "expiration_at": expiration_at.isoformat() if expiration_at else None,
+        "hours_since_expired": round((now - expiration_at).total_seconds() / 3600, 2) if expiration_at else None,
+    }
+
+
+def reconcile_orphaned_reservations(db: Session, apply: bool = False, chunk_size: int = 500, triggered_by: str = "cli",
+                                    progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """Find (and with apply=True release) orphaned reservations, returns the audit summary"""
+    if not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail=f"chunk_size must be between 1 and {MAX_CHUNK_SIZE}")
+    # the ExpirationAt default is UTC
+    now = datetime.utcnow()
+    started_at = datetime.now()
+    transaction = models.Transaction
+
+    released: Dict[str, int] = defaultdict(int)
+    summary = {"transactions": 0, "products": 0, "total_price": 0.0, "total_weight": 0.0, "chunks": 0}
+    preview: List[dict] = []
+    after_id = None
+    try:
+        while True:
+            chunk_query = select(transaction.TransactionID).where(_expired(now)).order_by(transaction.TransactionID).limit(chunk_size)
+            if after_id is not None:
+                chunk_query = chunk_query.where(transaction.TransactionID > after_id)
+            transaction_ids = db.execute(chunk_query).scalars().all()
+            if not transaction_ids:
+                break
+            after_id = transaction_ids[-1]
+
+            rows = db.execute(orphaned_products_query(transaction_ids, now)).all()
+            if apply:
+                # only transactions that are still pending, a payment may have landed meanwhile
+                transaction_ids = db.execute(
+                    update(transaction)
+                    .where(transaction.TransactionID.in_(transaction_ids), _expired(now))
+                    .values(TransactionStatus=EXPIRED_STATUS)
+                    .returning(transaction.TransactionID)
+                ).scalars().all()
+                for product_type_id, (product_type, model, id_column, _) in PRODUCT_TYPES.items():
+                    if transaction_ids:
+                        released[product_type] += db.execute(
+                            update(model)
+                            .where(
+                                model.Status == RESERVED_STATUS,
+                                id_column.in_(_product_ids(product_type_id, transaction_ids)),
+                                id_column.not_in(_reserved_by_live_transactions(product_type_id, now)),
+                            )
+                            .values(Status=RELEASED_STATUS)
+                            .execution_options(synchronize_session=False)
+                        ).rowcount
+            else:
+                for row in rows:
+                    released[row.product_type] += 1
+
+            summary["chunks"] += 1
+            summary["transactions"] += len(transaction_ids)
+            summary["total_price"] += sum(row.price or 0 for row in rows)
+            summary["total_weight"] += sum(row.weight or 0 for row in rows)
+            report = [_report_row(row, now) for row in rows]
+            preview.extend(report[:PREVIEW_ROWS - len(preview)])
+            logging.info(f"Reconciliation chunk {summary['chunks']}: {summary['transactions']} transactions, "
+                         f"{sum(released.values())} products so far")
+            if progress is not None:
+                progress({"chunk": summary["chunks"], "transactions": summary["transactions"],
+                          "products": sum(released.values()), "rows": report})
+
+        summary["products"] = sum(released.values())
+        summary["by_product_type"] = dict(released)
+        run = models.ReconciliationRun(
+            Kind=ORPHANED_RESERVATIONS,
+            Mode="apply" if apply else "dry_run",
+            TriggeredBy=triggered_by,
+            StartedAt=started_at,
+            FinishedAt=datetime.now(),
+            TransactionCount=summary["transactions"],
+            ProductCount=summary["products"],
+            Details=json.dumps(summary, separators=(",", ":")),
+        )
+        db.add(run)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    logging.info(f"Reconciliation {run.Mode}: {summary['transactions']} transactions, {summary['products']} products")
+    return {"run_id": run.RunID, "mode": run.Mode, **summary, "preview": preview}
+
+
+def get_reconciliation_runs(db: Session, limit: int = 20) -> List[dict]:
+    runs = db.query(models.ReconciliationRun).order_by(models.ReconciliationRun.RunID.desc()).limit(limit).all()
+    return [
+        {
+            "run_id": run.RunID,
+            "kind": run.Kind,
+            "mode": run.Mode,
+            "triggered_by": run.TriggeredBy,
+            "started_at": run.StartedAt.isoformat(),
+            "finished_at": run.FinishedAt.isoformat() if run.FinishedAt else None,
+            "transactions": run.TransactionCount,
+            "products": run.ProductCount,
+            "details": json.loads(run.Details) if run.Details else None,
+        }
+        for run in runs
+    ]
@@ -0,0 +1,289 @@
+"""HTTP response cache for the public marketplace reads.
+
+Responses are cached as encoded JSON under a key built from the endpoint
+and its normalized parameters, with a strong ETag. A request whose
+If-None-Match matches gets a bodiless 304. Entries live in an in-process
+LRU, or in Redis when RESPONSE_CACHE_REDIS_URL is set so that every worker
+shares them.
+
+Invalidation is by tag. Every entry remembers the version of each of its
+tags when it was filled and is stale once any of them has been bumped.
+Session hooks collect tags from flushed rows and bump them after commit:
+- a product row (wet leaves, dry leaves, flour): its product tag and "listings"
+- centra pricing, discounts or a username: "centras" and "listings"
+- bulk ORM insert/update/delete on those models: "catalogue", which every entry carries
+Writes that bypass the Session (raw connections, e.g. the synthetic seeder)
+are only covered by RESPONSE_CACHE_TTL_SECONDS, which also keeps the
+expiry-based discounts current. Without Redis each worker invalidates only
+its own LRU, other workers catch up within the TTL.
+
+main.py imports this module so the hooks are registered at startup.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes
+
+import metrics
+import models
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+# 0 makes browsers revalidate every time, which the ETag turns into a cheap 304
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "0"))
+RESPONSE_CACHE_REDIS_URL = os.getenv("RESPONSE_CACHE_REDIS_URL", "")
+
+CATALOGUE = "catalogue"
+LISTINGS = "listings"
+CENTRAS = "centras"
+LISTING_TAGS = (CATALOGUE, LISTINGS)
+
+PENDING_TAGS = "response_cache_tags"
+
+# model -> (marketplace product name, id attribute), names as in crud.MARKETPLACE_PRODUCT_SOURCES
+PRODUCT_MODELS = {
+    models.WetLeaves: ("Wet Leaves", "WetLeavesID"),
+    models.DryLeaves: ("Dry Leaves", "DryLeavesID"),
+    models.Flour: ("Powder", "FlourID"),
+}
+PRICING_MODELS = (models.CentraBaseSettings, models.CentraSettingDetail)
+
+CACHE_REQUESTS = metrics.REGISTRY.counter(
+    "leafty_response_cache_requests_total", "Cached endpoint requests by result.", ("endpoint", "result"))
+
+
+def product_tag(product_name: str, product_id) -> str:
+    return f"product:{product_name}:{product_id}"
+
+
+def product_tags(product_name: str, product_id) -> Tuple[str, ...]:
+    """Tags of a product details response"""
+    return (CATALOGUE, CENTRAS, product_tag(product_name, product_id))
+
+
+class Entry:
+    def __init__(self, tags: Sequence[str], versions: Sequence[int], etag: str, body: bytes):
+        self.tags = list(tags)
+        self.versions = list(versions)
+        self.etag = etag
+        self.body = body
+
+
+class MemoryBackend:
+    def __init__(self, max_entries: int):
+        self.lock = threading.Lock()
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[float, Entry]]" = OrderedDict()
+        self.tag_versions = {}
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self.lock:
+            stored = self.entries.get(key)
+            if stored is None:
+                return None
+            if stored[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return stored[1]
+
+    def set(self, key: str, entry: Entry, ttl: int):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def versions(self, tags: Sequence[str]) -> List[int]:
+        with self.lock:
+            return [self.tag_versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags: Iterable[str]):
+        with self.lock:
+            for tag in tags:
+                self.tag_versions[tag] = self.tag_versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    """Entries and tag versions in Redis, shared by every worker"""
+
+    PREFIX = "leafty:response_cache:"
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def get(self, key: str) -> Optional[Entry]:
+        value = self.client.get(self.PREFIX + "entry:" + key)
+        if value is None:
+            return None
+        header, body = value.split(b"\n", 1)
+        header = json.loads(header)
+        return Entry(header["tags"], header["versions"], header["etag"], body)
+
+    def set(self, key: str, entry: Entry, ttl: int):
+        header = json.dumps({"tags": entry.tags, "versions": entry.versions, "etag": entry.etag}, separators=(",", ":"))
+        self.client.set(self.PREFIX + "entry:" + key, header.encode() + b"\n" + entry.body, ex=ttl)
+
+    def versions(self, tags: Sequence[str]) -> List[int]:
+        values = self.client.mget([self.PREFIX + "tag:" + tag for tag in tags])
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tags: Iterable[str]):
+        pipeline = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(self.PREFIX + "tag:" + tag)
+        pipeline.execute()
+
+
+def _create_backend():
+    if RESPONSE_CACHE_REDIS_URL:
+        try:
+            return RedisBackend(RESPONSE_CACHE_REDIS_URL)
+        except ImportError:
+            logging.warning("RESPONSE_CACHE_REDIS_URL is set but the redis package is not installed, "
+                            "using the in-process response cache")
+    return MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES)
+
+
+backend = _create_backend()
+
+
+def invalidate(tags: Iterable[str]):
+    tags = sorted(set(tags))
+    if not tags:
+        return
+    try:
+        backend.bump(tags)
+    except Exception as e:
+        logging.warning(f"Response cache invalidation of {tags} failed: {e}")
+
+
+def cache_key(endpoint: str, params: dict) -> str:
+    query = urlencode(sorted((name, str(value)) for name, value in params.items()))
+    return hashlib.blake2b(f"{endpoint}?{query}".encode(), digest_size=20).hexdigest()
+
+
+def _cache_control() -> str:
+    return f"public, max-age={RESPONSE_CACHE_MAX_AGE}" if RESPONSE_CACHE_MAX_AGE > 0 else "public, no-cache"
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def _response(request: Request, endpoint: str, entry: Entry, result: str) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": _cache_control(), "X-Cache": result.upper()}
+    if _etag_matches(request, entry.etag):
+        CACHE_REQUESTS.inc(endpoint, "not_modified")
+        return Response(status_code=304, headers=headers)
+    CACHE_REQUESTS.inc(endpoint, result)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def _lookup(key: str, tags: Sequence[str]):
+    """(fresh entry or None, current versions of tags)"""
+    try:
+        entry = backend.get(key)
+        if entry is not None and backend.versions(entry.tags) == entry.versions:
+            return entry, None
+        # read before loading, so an invalidation racing the load leaves the new entry stale
+        return None, backend.versions(tags)
+    except Exception as e:
+        logging.warning(f"Response cache lookup failed: {e}")
+        return None, None
+
+
+def _store(key: str, tags: Sequence[str], versions: Optional[List[int]], content) -> Entry:
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    entry = Entry(tags, versions or [], f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"', body)
+    if versions is not None:
+        try:
+            backend.set(key, entry, RESPONSE_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logging.warning(f"Response cache store failed: {e}")
+    return entry
+
+
+def cached(request: Request, endpoint: str, params: dict, tags: Sequence[str], load: Callable[[], object]):
+    """Serve load()'s JSON content from the cache, errors raised by load are not cached"""
+    if not RESPONSE_CACHE_ENABLED:
+        return load()
+    key = cache_key(endpoint, params)
+    entry, versions = _lookup(key, tags)
+    if entry is not None:
+        return _response(request, endpoint, entry, "hit")
+    return _response(request, endpoint, _store(key, tags, versions, load()), "miss")
+
+
+async def cached_async(request: Request, endpoint: str, params: dict, tags: Sequence[str], load):
+    """cached() for the async routes, load is a coroutine function"""
+    if not RESPONSE_CACHE_ENABLED:
+        return await load()
+    key = cache_key(endpoint, params)
+    entry, versions = _lookup(key, tags)
+    if entry is not None:
+        return _response(request, endpoint, entry, "hit")
+    return _response(request, endpoint, _store(key, tags, versions, await load()), "miss")
+
+
+def _pending(session: Session) -> set:
+    return session.info.setdefault(PENDING_TAGS, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session: Session, flush_context):
+    # new, dirty and deleted still hold the pre-flush state here
+    tags = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        product = PRODUCT_MODELS.get(type(obj))
+        if product is not None:
+            if obj in session.dirty and not session.is_modified(obj):
+                continue
+            tags.update((product_tag(product[0], getattr(obj, product[1])), LISTINGS))
+        elif isinstance(obj, PRICING_MODELS):
+            tags.update((CENTRAS, LISTINGS))
+        elif isinstance(obj, models.User) and obj not in session.new:
+            if obj in session.deleted or attributes.instance_state(obj).attrs.Username.history.has_changes():
+                tags.update((CENTRAS, LISTINGS))
+    if tags:
+        _pending(session).update(tags)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and (mapper.class_ in PRODUCT_MODELS or issubclass(mapper.class_, PRICING_MODELS)):
+        # the affected rows are unknown, drop everything
+        _pending(orm_execute_state.session).add(CATALOGUE)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    tags = session.info.pop(PENDING_TAGS, None)
+    if tags:
+        invalidate(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session):
+    session.info.pop(PENDING_TAGS, None)
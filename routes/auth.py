@@ -10,7 +10,6 @@ import bcrypt
 from database import get_db
 from fastapi_sessions.frontends.implementations import SessionCookie, CookieParameters
 import bcrypt
-import pyotp
 from datetime import datetime, timedelta    
 from email_service import send_otp_email
 
@@ -40,6 +39,12 @@ cookie = SessionCookie(
     cookie_params=cookie_params,
 )
 
+ADMIN_ROLE_ID = 4
+
+def require_admin(session_data: SessionData):
+    if session_data.RoleID != ADMIN_ROLE_ID:
+        raise HTTPException(status_code=403, detail="Access denied. Admin privileges required")
+
 def hash_password(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
@@ -127,23 +132,14 @@ async def del_session(response: Response, session_id: UUID = Depends(cookie), db
 
 
 # OTP
-from schemas.otp_schemas import GenerateOTPRequest, OTPCreate, VerifyOTPRequest
+from schemas.otp_schemas import GenerateOTPRequest, VerifyOTPRequest
+import otp_service
+
 @router.post("/generate_otp")
 def generate_otp(request: GenerateOTPRequest, db: Session = Depends(get_db)):
     email = request.email
-    
-    secret = pyotp.random_base32()
-    otp = pyotp.TOTP(secret)
-    otp_code = otp.now()
 
-    db_otp = crud.get_otp_by_email(db, email)    
-    if db_otp:
-        crud.delete_otp(db, email)
-
-    hashed_otp_code = bcrypt.hashpw(otp_code.encode('utf-8'), bcrypt.gensalt())
-
-    otp_create = OTPCreate(email=email, otp_code=hashed_otp_code, expires_at=datetime.now() + timedelta(minutes=2))
-    crud.create_otp(db, otp_create)
+    otp_code = otp_service.issue_otp(db, email)
 
     # Send OTP email using new visual design
     success = send_otp_email(email, otp_code, expiry_minutes=10)
@@ -156,16 +152,13 @@ def generate_otp(request: GenerateOTPRequest, db: Session = Depends(get_db)):
 # Endpoint to verify OTP
 @router.post("/verify_otp")
 def verify_otp(request: VerifyOTPRequest, db: Session = Depends(get_db)):
-    email = request.email
-    otp_code = request.otp_code
+    result = otp_service.verify_otp(db, request.email, request.otp_code)
 
-    db_otp = crud.get_otp_by_email(db, email)
-    if not db_otp or not bcrypt.checkpw(otp_code.encode('utf-8'), db_otp.otp_code.encode('utf-8')) or db_otp.expires_at < datetime.now():
+    if result == otp_service.OTP_LOCKED:
+        raise HTTPException(status_code=429, detail="Too many failed attempts. Please request a new OTP")
+    if result != otp_service.OTP_VALID:
         raise HTTPException(status_code=400, detail="Invalid or expired OTP")
     
-    # OTP is valid, delete it from the database
-    crud.delete_otp(db, email)
-    
     return {"message": "OTP verified successfully"}
 
 @router.post("/test-otp-email/{email}")
@@ -3,6 +3,7 @@ import httpx
 from schemas.biteship_schemas import ShipmentData
 from dotenv import load_dotenv
 import os
+import metrics
 
 router = APIRouter()
 
@@ -18,11 +19,13 @@ HEADERS = {
 async def create_shipment(shipment: ShipmentData):
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.biteship.com/v1/orders",
-                headers=HEADERS,
-                json=shipment.dict()
-            )
+            with metrics.track_outbound("biteship", "create_order") as call:
+                response = await client.post(
+                    "https://api.biteship.com/v1/orders",
+                    headers=HEADERS,
+                    json=shipment.dict()
+                )
+                call.status = response.status_code
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail=response.text)
         return response.json()
@@ -33,10 +36,12 @@ async def create_shipment(shipment: ShipmentData):
 async def get_shipment(tracking_id: str):
     try:
         async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.biteship.com/v1/orders/{tracking_id}",
-                headers=HEADERS
-            )
+            with metrics.track_outbound("biteship", "get_order") as call:
+                response = await client.get(
+                    f"https://api.biteship.com/v1/orders/{tracking_id}",
+                    headers=HEADERS
+                )
+                call.status = response.status_code
         if response.status_code != 200:
             raise HTTPException(status_code=response.status_code, detail=response.text)
         return response.json()
@@ -1,12 +1,16 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Request
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import crud
+import exports
+import models
+import pagination
 from database import get_db
 from schemas import blockchain_schemas
 from schemas.user_schemas import SessionData
-from routes.auth import backend, verifier, cookie
+from routes.auth import backend, verifier, cookie, require_admin, ADMIN_ROLE_ID
 from uuid import UUID
 
 router = APIRouter()
@@ -73,6 +77,36 @@ def create_blockchain_transaction(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.post("/blockchain/create_batch", tags=["Blockchain"], dependencies=[Depends(cookie)])
+def create_blockchain_transactions_batch(
+    trx_data: blockchain_schemas.BlockchainTrxBatchCreate,
+    db: Session = Depends(get_db),
+    session_data: SessionData = Depends(verifier)
+):
+    """
+    Register many blockchain hashes at once, hashes already on record are returned as duplicates
+    """
+    try:
+        user_id = session_data.UserID
+
+        user = crud.get_user_by_id(db, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        result = crud.create_blockchain_trx_batch(db, user.UserID, trx_data.trx_ids)
+
+        return JSONResponse(
+            status_code=201 if result["created"] else 200,
+            content={
+                "message": f"{len(result['created'])} blockchain transactions created, {len(result['duplicates'])} already existed",
+                "data": result
+            }
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 @router.get("/blockchain/my-transactions", tags=["Blockchain"], dependencies=[Depends(cookie)])
 def get_my_blockchain_transactions(
     db: Session = Depends(get_db),
@@ -178,7 +212,7 @@ def get_blockchain_transaction_by_id(
         if not transaction:
             raise HTTPException(status_code=404, detail="Blockchain transaction not found")
         
-        if transaction.UserID != session_data.UserID and session_data.RoleID != 1:
+        if transaction.UserID != session_data.UserID and session_data.RoleID != ADMIN_ROLE_ID:
             raise HTTPException(status_code=403, detail="Access denied. You can only access your own transactions")
         
         user = crud.get_user_by_id(db, transaction.UserID)
@@ -207,46 +241,50 @@ def get_blockchain_transaction_by_id(
 
 @router.get("/blockchain/admin/all", tags=["Blockchain"], dependencies=[Depends(cookie)])
 def get_all_blockchain_transactions_admin(
+    user_id: Optional[str] = None,
+    role_id: Optional[int] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    format: str = Query("json"),
     db: Session = Depends(get_db),
     session_data: SessionData = Depends(verifier)
 ):
     """
-    Get all blockchain transactions (Admin only)
+    Blockchain transactions newest first, one page at a time (Admin only).
+    format=csv or ndjson streams every matching transaction instead.
     """
     try:
-        if session_data.RoleID != 1:
-            raise HTTPException(status_code=403, detail="Access denied. Admin privileges required")
-        
-        transactions = crud.get_all_blockchain_trx(db)
-        
-        if not transactions:
-            return JSONResponse(
-                status_code=200,
-                content={
-                    "message": "No blockchain transactions found",
-                    "data": []
-                }
+        require_admin(session_data)
+
+        filters = {
+            "user_id": user_id,
+            "role_id": role_id,
+            "date_from": datetime.combine(date_from, time.min) if date_from else None,
+            # "to" is inclusive
+            "date_to": datetime.combine(date_to, time.min) + timedelta(days=1) if date_to else None,
+        }
+
+        if format != "json":
+            media_type = exports.media_type(format)
+            query = crud.blockchain_ledger_query(db, **filters).order_by(models.BlockchainTrx.CreatedAt.desc(), models.BlockchainTrx.TrxId.desc())
+            return StreamingResponse(
+                exports.stream_export(query.statement, format),
+                media_type=media_type,
+                headers={"Content-Disposition": f'attachment; filename="blockchain_ledger.{format}"'},
             )
-        
-        transaction_data = []
-        for trx in transactions:
-            user = crud.get_user_by_id(db, trx.UserID)
-            transaction_data.append({
-                "user_id": trx.UserID,
-                "trx_id": trx.TrxId,
-                "created_at": trx.CreatedAt.isoformat() if trx.CreatedAt else None,
-                "username": user.Username if user else None,
-                "user_email": user.Email if user else None,
-                "user_role_id": user.RoleID if user else None
-            })
-        
-        return JSONResponse(
+
+        transaction_data = crud.get_blockchain_ledger(db, limit, cursor, **filters)
+        response = JSONResponse(
             status_code=200,
             content={
-                "message": "All blockchain transactions retrieved successfully",
+                "message": "All blockchain transactions retrieved successfully" if transaction_data else "No blockchain transactions found",
                 "data": transaction_data
             }
         )
+        pagination.set_next_cursor(response, transaction_data)
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -262,8 +300,7 @@ def get_blockchain_transactions_by_user_admin(
     Get all blockchain transactions for a specific user (Admin only)
     """
     try:
-        if session_data.RoleID != 1:
-            raise HTTPException(status_code=403, detail="Access denied. Admin privileges required")
+        require_admin(session_data)
         
         user = crud.get_user_by_id(db, user_id)
         if not user:
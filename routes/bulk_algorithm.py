@@ -1,17 +1,17 @@
 from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
 from database import get_db
-from schemas.misc_schemas import BulkItemSelectionRequest
+from schemas.misc_schemas import BulkItemSelectionRequest, MAX_BULK_TARGET_WEIGHT
 from schemas.flour_schemas import SimpleFlour
 from schemas.leaves_schemas import SimpleDryLeaves
 
 router = APIRouter()
 
 
-@router.post("/algorithm/bulkSelectedCentra", response_model=Dict[str, Union[int, Dict[str, List[Union[SimpleFlour, SimpleDryLeaves]]]]])
+@router.post("/algorithm/bulkSelectedCentra", response_model=Dict[str, Union[int, float, Dict[str, List[Union[SimpleFlour, SimpleDryLeaves]]]]])
 def bulk_item_selection_by_selected_centras(request: BulkItemSelectionRequest, db: Session = Depends(get_db)):
     try:
         max_value, choices = crud.bulk_algorithm_by_selected_centra(
@@ -26,8 +26,8 @@ def bulk_item_selection_by_selected_centras(request: BulkItemSelectionRequest, d
     return {"max_value": max_value, "choices": choices}
 
 
-@router.get("/algorithm/bulkItem", response_model=Dict[str, Union[int, Dict[str, List[Union[SimpleFlour, SimpleDryLeaves]]]]])
-def bulk_item_selection_by_items(item_type: str, target_weight: int, db: Session = Depends(get_db)):
+@router.get("/algorithm/bulkItem", response_model=Dict[str, Union[int, float, Dict[str, List[Union[SimpleFlour, SimpleDryLeaves]]]]])
+def bulk_item_selection_by_items(item_type: str, target_weight: int = Query(..., gt=0, le=MAX_BULK_TARGET_WEIGHT), db: Session = Depends(get_db)):
     try:
         max_value, choices = crud.bulk_algorithm_by_random_items(db, item_type=item_type, target_weight=target_weight)
     except ValueError as e:
@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.finance_schemas import CentraFinance, CentraFinanceCreate, CentraFinanceBase
 
@@ -13,8 +14,10 @@ def create_centra_finance(centra_finance: CentraFinanceCreate, db: Session = Dep
     return crud.create_centra_finance(db=db, centra_finance=centra_finance)
 
 @router.get("/centra_finances/get", response_model=List[CentraFinance], tags=["Centra Finance"])
-def get_centra_finances(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_centra_finances(db=db, skip=skip, limit=limit)
+def get_centra_finances(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_centra_finances(db=db, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/centra_finance/get/{finance_id}", response_model=CentraFinance, tags=["Centra Finance"])
 def get_centra_finance(finance_id: int, db: Session = Depends(get_db)):
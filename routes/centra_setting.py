@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.marketplace_schemas import CentraSettingDetail, CentraSettingDetailCreate, CentraSettingDetailBase, CentraSettingDetailUpdate
 import models
@@ -40,8 +41,10 @@ def create_centra_setting_detail(centra_setting_detail: CentraSettingDetailCreat
     return crud.create_centra_setting_detail(db=db, centra_setting_detail=centra_setting_detail)
 
 @router.get("/centra_setting_details/get", response_model=List[CentraSettingDetail])
-def get_centra_setting_details(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_centra_setting_details(db=db, skip=skip, limit=limit)
+def get_centra_setting_details(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_centra_setting_details(db=db, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/centra_setting_detail/get/{setting_detail_id}", response_model=CentraSettingDetail)
 def get_centra_setting_detail(setting_detail_id: int, db: Session = Depends(get_db)):
@@ -107,8 +110,10 @@ def create_centra_base_settings(centra_base_settings: CentraBaseSettingsCreate,
     return crud.create_centra_base_settings(db=db, centra_base_settings=centra_base_settings)
 
 @router.get("/centra_base_settings/get", response_model=List[CentraBaseSettings])
-def get_centra_base_settings(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_centra_base_settings(db=db, skip=skip, limit=limit)
+def get_centra_base_settings(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_centra_base_settings(db=db, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.put("/centra_base_settings/put/{settings_id}", response_model=CentraBaseSettings)
 def update_centra_base_settings(settings_id: int, centra_base_settings_update: CentraBaseSettingsBase, db: Session = Depends(get_db)):
@@ -1,10 +1,13 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Response, Query
 from requests import Session
 from fastapi.responses import JSONResponse
+import bulk_intake
 import crud
+import pagination
 from database import get_db
 from schemas.leaves_schemas import DryLeaves, DryLeavesCreate, DryLeavesUpdate, DryLeavesStatusUpdate
+from schemas.misc_schemas import BulkCreateResult
 
 router = APIRouter()
 
@@ -12,9 +15,20 @@ router = APIRouter()
 def create_dry_leaves(dry_leaves: DryLeavesCreate, db: Session = Depends(get_db)):
     return crud.create_dry_leaves(db=db, dry_leaves=dry_leaves)
 
+@router.post("/dryleaves/bulk", response_model=BulkCreateResult)
+def create_dry_leaves_bulk(dry_leaves: List[DryLeavesCreate], db: Session = Depends(get_db)):
+    return bulk_intake.create_dry_leaves_bulk(db, dry_leaves)
+
+@router.post("/dryleaves/bulk_csv", response_model=BulkCreateResult)
+def create_dry_leaves_bulk_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    items = bulk_intake.parse_csv(file.file.read(), DryLeavesCreate)
+    return bulk_intake.create_dry_leaves_bulk(db, items)
+
 @router.get("/dryleaves/get/")
-def get_dry_leaves_for_admin(db: Session = Depends(get_db)):
-    return crud.get_dry_leaves(db=db)
+def get_dry_leaves_for_admin(response: Response, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_dry_leaves(db=db, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/dryleaves/get/{dry_leaves_id}", response_model=DryLeaves)
 def get_dry_leaves_id(dry_leaves_id: int, db: Session = Depends(get_db)):
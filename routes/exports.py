@@ -0,0 +1,29 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+import exports
+from schemas.user_schemas import SessionData
+from routes.auth import verifier, cookie, require_admin
+
+router = APIRouter()
+
+@router.get("/export/{dataset}", dependencies=[Depends(cookie)])
+def export_dataset(
+    dataset: str,
+    format: str = Query("csv"),
+    centra: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    session_data: SessionData = Depends(verifier)
+):
+    """Stream a dataset as CSV or NDJSON (Admin only)"""
+    require_admin(session_data)
+    media_type = exports.media_type(format)
+    stmt = exports.export_query(dataset, centra, status, date_from, date_to)
+    return StreamingResponse(
+        exports.stream_export(stmt, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{format}"'},
+    )
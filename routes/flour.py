@@ -1,10 +1,13 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Response, Query
 from requests import Session
 from fastapi.responses import JSONResponse
+import bulk_intake
 import crud
+import pagination
 from database import get_db
 from schemas.flour_schemas import Flour, FlourCreate, FlourUpdate, FlourStatusUpdate
+from schemas.misc_schemas import BulkCreateResult
 
 router = APIRouter()
 
@@ -12,9 +15,20 @@ router = APIRouter()
 def create_flour(flour: FlourCreate, db: Session = Depends(get_db)):
     return crud.create_flour(db=db, flour=flour)
 
+@router.post("/flour/bulk", response_model=BulkCreateResult, tags=["Flour"])
+def create_flour_bulk(flour: List[FlourCreate], db: Session = Depends(get_db)):
+    return bulk_intake.create_flour_bulk(db, flour)
+
+@router.post("/flour/bulk_csv", response_model=BulkCreateResult, tags=["Flour"])
+def create_flour_bulk_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    items = bulk_intake.parse_csv(file.file.read(), FlourCreate)
+    return bulk_intake.create_flour_bulk(db, items)
+
 @router.get("/flour/get", tags=["Flour"])
-def get_flour_for_admin(db: Session = Depends(get_db)):
-    return crud.get_flour(db=db)
+def get_flour_for_admin(response: Response, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_flour(db=db, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/flour/get/{flour_id}", response_model=Flour, tags=["Flour"])
 def get_flour_by_id(flour_id: int, db: Session = Depends(get_db)):
@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.location_schemas import Location, LocationCreate, LocationPatch
 
@@ -14,8 +15,10 @@ def create_location(location: LocationCreate, db: Session = Depends(get_db)):
     return {"code":"200"}
 
 @router.get('/location/get', response_model=List[Location], tags=["Location"])
-def get_location(limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_location(db=db, limit=limit)
+def get_location(response: Response, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_location(db=db, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get('/location/getuserid/{user_id}', response_model=Location, tags=["Location"])
 def get_location_by_user_id(user_id: str, db: Session = Depends(get_db)):
@@ -1,8 +1,9 @@
 from typing import Dict, List, Union, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.transaction_schemas import MarketShipment, MarketShipmentCreate, MarketShipmentUpdate, MarketShipmentWithCentra
 from schemas.user_schemas import SessionData
@@ -15,13 +16,17 @@ def create_market_shipment(market_shipment: MarketShipmentCreate, db: Session =
     return crud.create_market_shipment(db=db, market_shipment=market_shipment)
 
 @router.get("/market_shipments/get", response_model=List[MarketShipmentWithCentra], tags=["MarketShipment"])
-def get_market_shipments(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_market_shipments_with_centra(db=db, skip=skip, limit=limit)
+def get_market_shipments(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_market_shipments_with_centra(db=db, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/market_shipments/centra/{centra_id}", response_model=List[MarketShipmentWithCentra], tags=["MarketShipment"])
-def get_market_shipments_by_centra(centra_id: str, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
+def get_market_shipments_by_centra(centra_id: str, response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """Get market shipments for a specific centra"""
-    return crud.get_market_shipments_by_centra_id(db=db, centra_id=centra_id, skip=skip, limit=limit)
+    page = crud.get_market_shipments_by_centra_id(db=db, centra_id=centra_id, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/market_shipments/debug/session", dependencies=[Depends(cookie)], tags=["MarketShipment"])
 def debug_user_session(session_data: SessionData = Depends(verifier)):
@@ -35,7 +40,7 @@ def debug_user_session(session_data: SessionData = Depends(verifier)):
     }
 
 @router.get("/market_shipments/user", response_model=List[MarketShipmentWithCentra], dependencies=[Depends(cookie)], tags=["MarketShipment"])
-def get_market_shipments_by_user_centra(skip: int = 0, limit: int = 10, status: Optional[str] = None, db: Session = Depends(get_db), session_data: SessionData = Depends(verifier)):
+def get_market_shipments_by_user_centra(response: Response, skip: int = 0, limit: int = 10, status: Optional[str] = None, cursor: Optional[str] = None, db: Session = Depends(get_db), session_data: SessionData = Depends(verifier)):
     """Get market shipments for current user's centra from session with optional status filter - CENTRA USERS ONLY"""
     # Debug: Log session data
     print(f"Session Debug - UserID: {session_data.UserID}, RoleID: {session_data.RoleID}, Username: {session_data.Username}")
@@ -48,7 +53,9 @@ def get_market_shipments_by_user_centra(skip: int = 0, limit: int = 10, status:
     # For centra users, UserID is the CentraID
     user_centra_id = session_data.UserID
     print(f"Fetching market shipments for centra: {user_centra_id} with status filter: {status}")
-    return crud.get_market_shipments_by_centra_id(db=db, centra_id=user_centra_id, skip=skip, limit=limit, status=status)
+    page = crud.get_market_shipments_by_centra_id(db=db, centra_id=user_centra_id, skip=skip, limit=limit, status=status, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/market_shipment/get/{market_shipment_id}", response_model=MarketShipment, tags=["MarketShipment"])
 def get_market_shipment(market_shipment_id: int, db: Session = Depends(get_db)):
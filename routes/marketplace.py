@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.transaction_schemas import MarketShipmentCreate, BulkTransactionCreate, BulkTransactionResponse
 from schemas.transaction_schemas import TransactionDisplayBase
@@ -22,11 +23,14 @@ def create_bulk_transaction(bulk_transaction: BulkTransactionCreate, db: Session
 
 @router.get("/marketplace/get_transactions_by_customer", response_model=List[TransactionDisplayBase])
 def get_marketplace_transaction_details(
+    response: Response,
+    limit: int = 10,
+    cursor: Optional[str] = None,
     session_data: SessionData = Depends(verifier),
     db: Session = Depends(get_db)
 ):
-    transaction = crud.get_transactions_by_customer(db=db, session_data=session_data)
-    
+    transaction = crud.get_transactions_by_customer(db=db, limit=limit, session_data=session_data, cursor=cursor)
+    pagination.set_next_cursor(response, transaction)
     return transaction
 
 @router.get("/marketplace/get_transaction_details/{transaction_id}", response_model=TransactionDisplayBase)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from database import get_pool_status
+import metrics
+
+router = APIRouter()
+
+@router.get("/monitoring/db_pool")
+def get_db_pool_status():
+    return get_pool_status()
+
+# async so the threadpool gauges are read on the event loop
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus text exposition of every registered metric"""
+    return PlainTextResponse(metrics.REGISTRY.exposition(), media_type="text/plain; version=0.0.4")
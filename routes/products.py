@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.marketplace_schemas import Products, ProductsCreate, ProductsBase
 
@@ -13,8 +14,10 @@ def create_product(product: ProductsCreate, db: Session = Depends(get_db)):
     return crud.create_product(db=db, product=product)
 
 @router.get("/products/get", response_model=List[Products], tags=["Products"])
-def get_products(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_products(db=db, skip=skip, limit=limit)
+def get_products(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_products(db=db, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/product/get/{product_id}", response_model=Products, tags=["Products"])
 def get_product(product_id: int, db: Session = Depends(get_db)):
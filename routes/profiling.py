@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+import profiling
+from schemas.user_schemas import SessionData
+from routes.auth import verifier, cookie, require_admin
+
+router = APIRouter()
+
+
+def _get_profile(profile_id: str) -> dict:
+    result = profiling.get_profile(profile_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return result
+
+
+@router.get("/admin/profiles", dependencies=[Depends(cookie)])
+def get_profiles(session_data: SessionData = Depends(verifier)):
+    """Most recent request profiles first, without their stacks (Admin only)"""
+    require_admin(session_data)
+    return profiling.get_profiles()
+
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(cookie)])
+def get_profile(profile_id: str, session_data: SessionData = Depends(verifier)):
+    require_admin(session_data)
+    return _get_profile(profile_id)
+
+
+@router.get("/admin/profiles/{profile_id}/folded", response_class=PlainTextResponse, dependencies=[Depends(cookie)])
+def get_profile_folded(profile_id: str, cpu: bool = False, session_data: SessionData = Depends(verifier)):
+    """Collapsed stacks for flamegraph.pl or speedscope, cpu=true weights them by CPU microseconds"""
+    require_admin(session_data)
+    return PlainTextResponse(profiling.folded(_get_profile(profile_id), cpu=cpu))
@@ -1,8 +1,9 @@
 from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import response_cache
 from database import get_db
 from fastapi_sessions.frontends.implementations import SessionCookie, CookieParameters
 
@@ -14,51 +15,63 @@ def get_marketplace_items(skip: int = 0, limit: int = 10, db: Session = Depends(
 
 @router.get("/marketplace/get_by_centra/{centra_name}", response_model=List)
 def get_marketplace_items_by_centra(
+    request: Request,
     centra_name: str, 
     skip: int = 0, 
     limit: int = 10, 
     db: Session = Depends(get_db)
 ):
     """Get marketplace items from a specific centra"""
-    items = crud.get_marketplace_items_by_centra(db=db, centra_name=centra_name, skip=skip, limit=limit)
-    
-    if not items:
-        raise HTTPException(status_code=404, detail=f"No products found for centra '{centra_name}'")
-    
-    return items
+    def load():
+        items = crud.get_marketplace_items_by_centra(db=db, centra_name=centra_name, skip=skip, limit=limit)
+        if not items:
+            raise HTTPException(status_code=404, detail=f"No products found for centra '{centra_name}'")
+        return items
+
+    params = {"centra_name": centra_name, "skip": skip, "limit": limit}
+    return response_cache.cached(request, "get_by_centra", params, response_cache.LISTING_TAGS, load)
 
 @router.get("/marketplace/get_product_details")
 def get_marketplace_item(
+    request: Request,
     product_id: int = Query(...),
     product_name: str = Query(...),
     username: str = Query(...),
     db: Session = Depends(get_db)
 ):
-    # print(product_id, product_name, username)
-    
-    item = crud.get_product_details_by_product_id_and_product_name_and_username(
-        db=db,
-        product_id=product_id,
-        product_name=product_name,
-        username=username
-    )
-    
-    if not item:
-        raise HTTPException(status_code=404, detail="Item not found")
-    return item
+    def load():
+        item = crud.get_product_details_by_product_id_and_product_name_and_username(
+            db=db,
+            product_id=product_id,
+            product_name=product_name,
+            username=username
+        )
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
+
+    params = {"product_id": product_id, "product_name": product_name, "username": username}
+    return response_cache.cached(request, "get_product_details", params,
+                                 response_cache.product_tags(product_name, product_id), load)
 
 @router.get("/marketplace/search_products")
 def search_marketplace_products(
+    request: Request,
     query: str = Query(..., min_length=1),
     skip: int = 0,
     limit: int = 10,
     show_all: bool = False,
     db: Session = Depends(get_db)
 ):
-    results = crud.search_products_by_query(db=db, query=query, skip=skip, limit=limit, show_all=show_all)
-    if not results:
-        raise HTTPException(status_code=404, detail="No matching products or users found")
-    return results
+    def load():
+        results = crud.search_products_by_query(db=db, query=query, skip=skip, limit=limit, show_all=show_all)
+        if not results:
+            raise HTTPException(status_code=404, detail="No matching products or users found")
+        return results
+
+    # the search is case-insensitive (ILIKE), so is the key
+    params = {"query": query.lower(), "skip": skip, "limit": limit, "show_all": show_all}
+    return response_cache.cached(request, "search_products", params, response_cache.LISTING_TAGS, load)
     # return [
     #     {
     #         "id": r.id, 
@@ -0,0 +1,75 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+import async_crud
+import response_cache
+from database import get_async_db
+
+# Same endpoints as pub_marketplace, served from the async engine so reads
+# don't occupy the threadpool. Enabled with PUBLIC_MARKETPLACE_ASYNC_DB=true.
+
+router = APIRouter()
+
+@router.get("/marketplace/get", response_model=List)
+async def get_marketplace_items(skip: int = 0, limit: int = 10, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.get_marketplace_items(db=db, skip=skip, limit=limit)
+
+@router.get("/marketplace/get_by_centra/{centra_name}", response_model=List)
+async def get_marketplace_items_by_centra(
+    request: Request,
+    centra_name: str, 
+    skip: int = 0, 
+    limit: int = 10, 
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get marketplace items from a specific centra"""
+    async def load():
+        items = await async_crud.get_marketplace_items_by_centra(db=db, centra_name=centra_name, skip=skip, limit=limit)
+        if not items:
+            raise HTTPException(status_code=404, detail=f"No products found for centra '{centra_name}'")
+        return items
+
+    params = {"centra_name": centra_name, "skip": skip, "limit": limit}
+    return await response_cache.cached_async(request, "get_by_centra", params, response_cache.LISTING_TAGS, load)
+
+@router.get("/marketplace/get_product_details")
+async def get_marketplace_item(
+    request: Request,
+    product_id: int = Query(...),
+    product_name: str = Query(...),
+    username: str = Query(...),
+    db: AsyncSession = Depends(get_async_db)
+):
+    async def load():
+        item = await async_crud.get_product_details_by_product_id_and_product_name_and_username(
+            db=db,
+            product_id=product_id,
+            product_name=product_name,
+            username=username
+        )
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
+
+    params = {"product_id": product_id, "product_name": product_name, "username": username}
+    return await response_cache.cached_async(request, "get_product_details", params,
+                                             response_cache.product_tags(product_name, product_id), load)
+
+@router.get("/marketplace/search_products")
+async def search_marketplace_products(
+    request: Request,
+    query: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = 10,
+    show_all: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    async def load():
+        results = await async_crud.search_products_by_query(db=db, query=query, skip=skip, limit=limit, show_all=show_all)
+        if not results:
+            raise HTTPException(status_code=404, detail="No matching products or users found")
+        return results
+
+    # the search is case-insensitive (ILIKE), so is the key
+    params = {"query": query.lower(), "skip": skip, "limit": limit, "show_all": show_all}
+    return await response_cache.cached_async(request, "search_products", params, response_cache.LISTING_TAGS, load)
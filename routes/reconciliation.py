@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+import reconciliation
+from database import get_db
+from schemas.user_schemas import SessionData
+from routes.auth import verifier, cookie, require_admin
+
+router = APIRouter()
+
+
+@router.post("/admin/reconciliation/orphaned_reservations", dependencies=[Depends(cookie)])
+def reconcile_orphaned_reservations(
+    apply: bool = False,
+    chunk_size: int = Query(500, ge=1, le=reconciliation.MAX_CHUNK_SIZE),
+    db: Session = Depends(get_db),
+    session_data: SessionData = Depends(verifier)
+):
+    """Report (apply=false) or release products still reserved by expired transactions (Admin only)"""
+    require_admin(session_data)
+    return reconciliation.reconcile_orphaned_reservations(
+        db, apply=apply, chunk_size=chunk_size, triggered_by=session_data.Username)
+
+
+@router.get("/admin/reconciliation/runs", dependencies=[Depends(cookie)])
+def get_reconciliation_runs(
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    session_data: SessionData = Depends(verifier)
+):
+    require_admin(session_data)
+    return reconciliation.get_reconciliation_runs(db, limit)
@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.shipment_schemas import Shipment, ShipmentCreate, ShipmentUpdate, ShipmentDateUpdate, ShipmentCheckInUpdate, ShipmentRescalledWeightUpdate, ShipmentHarborReceptionUpdate, ShipmentCentraReceptionUpdate, ShipmentFlourAssociation
 import bcrypt
@@ -14,8 +15,10 @@ def create_shipment(shipment: ShipmentCreate, db: Session = Depends(get_db)):
     return crud.create_shipment(db=db, shipment=shipment)
 
 @router.get('/shipment/get', response_model=List[Shipment], tags=["Shipment"])
-def get_shipment(limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_shipment(db=db, limit=limit)
+def get_shipment(response: Response, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_shipment(db=db, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get('/shipment/getid/{shipment_id}', response_model=Shipment, tags=["Shipment"])
 def get_shipment_by_id(shipment_id: int, db: Session = Depends(get_db)):
@@ -25,10 +28,11 @@ def get_shipment_by_id(shipment_id: int, db: Session = Depends(get_db)):
     return shipment
 
 @router.get("/shipment/get_by_user/{user_id}", response_model=List[Shipment], tags=["Shipment"])
-def get_shipment_by_user(user_id: str, db: Session = Depends(get_db)):
-    shipment_data = crud.get_shipment_by_user_id(db, user_id)
+def get_shipment_by_user(user_id: str, response: Response, limit: Optional[int] = None, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    shipment_data = crud.get_shipment_by_user_id(db, user_id, limit=limit, cursor=cursor)
     if not shipment_data:
         raise HTTPException(status_code=404, detail="shipments not found")
+    pagination.set_next_cursor(response, shipment_data)
     return shipment_data
 
 @router.get("/shipments/ids", response_model=List[int], tags=["Shipment"])
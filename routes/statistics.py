@@ -1,50 +1,66 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Dict, List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
 from requests import Session
 from fastapi.responses import JSONResponse
-import crud
+import statistics_rollup
+import statistics_service
+import yield_analytics
 from database import get_db
+from schemas.user_schemas import SessionData
+from routes.auth import verifier, cookie, require_admin
 
 router = APIRouter()
 
 @router.get('/statistics/all', tags=["Statistics"])
 def retrieve_all_stats(db: Session = Depends(get_db)):
-    sum_wet_leaves = crud.sum_total_wet_leaves(db)
-    sum_dry_leaves = crud.sum_total_dry_leaves(db)
-    sum_flour = crud.sum_total_flour(db)
-    sum_shipment_quantity = crud.sum_total_shipment_quantity(db)
-    
-    return {
-        "sum_wet_leaves": sum_wet_leaves,
-        "sum_dry_leaves": sum_dry_leaves,
-        "sum_flour": sum_flour,
-        "sum_shipment_quantity": sum_shipment_quantity
-    }
+    return statistics_service.get_totals(db)
 
 @router.get('/statistics/all_no_format', tags=["Statistics"])
 def retrieve_all_stats_no_format(db: Session = Depends(get_db)):
-    sum_wet_leaves = crud.sum_total_wet_leaves(db)
-    sum_dry_leaves = crud.sum_total_dry_leaves(db)
-    sum_flour = crud.sum_total_flour(db)
-    sum_shipment_quantity = crud.sum_total_shipment_quantity(db)
-    
-    return {
-        "sum_wet_leaves": sum_wet_leaves,
-        "sum_dry_leaves": sum_dry_leaves,
-        "sum_flour": sum_flour,
-        "sum_shipment_quantity": sum_shipment_quantity
-    }
+    return statistics_service.get_totals(db)
+
+@router.get('/statistics/timeseries', tags=["Statistics"])
+def retrieve_timeseries(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    bucket: str = Query("day"),
+    centra: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
+    return statistics_service.get_timeseries(db, date_from, date_to, bucket, centra)
+
+@router.get('/statistics/by_centra', tags=["Statistics"])
+def retrieve_stats_by_centra(db: Session = Depends(get_db)):
+    return statistics_service.get_totals_by_centra(db)
     
 @router.get('/centra/statistics/{user_id}', tags = ["Statistics"])
 def retrieve_centra_stats(user_id: str, db: Session = Depends(get_db)):
-    sum_wet_leaves = crud.sum_get_wet_leaves_by_user_id(db, user_id)
-    sum_dry_leaves = crud.sum_get_dry_leaves_by_user_id(db, user_id)
-    sum_flour = crud.sum_get_flour_by_user_id(db, user_id)
-    sum_shipment_quantity = crud.sum_get_shipment_quantity_by_user_id(db, user_id)
-    return {
-        "sum_wet_leaves": sum_wet_leaves,
-        "sum_dry_leaves": sum_dry_leaves,
-        "sum_flour": sum_flour,
-        "sum_shipment_quantity": sum_shipment_quantity
-    }
+    return statistics_service.get_totals(db, user_id)
+
+@router.get('/statistics/rollups/drift', tags=["Statistics"])
+def retrieve_rollup_drift(db: Session = Depends(get_db)):
+    return statistics_service.find_rollup_drift(db)
+
+@router.post('/statistics/rollups/rebuild', tags=["Statistics"], dependencies=[Depends(cookie)])
+def rebuild_rollups(db: Session = Depends(get_db), session_data: SessionData = Depends(verifier)):
+    require_admin(session_data)
+    row_count = statistics_rollup.rebuild_rollups(db)
+    return {"rows": row_count}
+
+@router.get('/statistics/yield', tags=["Statistics"])
+def retrieve_yield_analytics(
+    period: str = Query("month"),
+    centra: Optional[str] = Query(None),
+    stage: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: Session = Depends(get_db),
+):
+    return yield_analytics.get_yield_analytics(db, period, centra, stage, date_from, date_to)
 
+@router.post('/statistics/yield/refresh', tags=["Statistics"], dependencies=[Depends(cookie)])
+def refresh_yield_analytics(period: str = Query("month"), db: Session = Depends(get_db), session_data: SessionData = Depends(verifier)):
+    require_admin(session_data)
+    row_count = yield_analytics.refresh_yield_analytics(db, period)
+    return {"rows": row_count}
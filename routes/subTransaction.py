@@ -1,8 +1,9 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.transaction_schemas import SubTransaction, SubTransactionCreate, SubTransactionUpdate
 
@@ -13,8 +14,10 @@ def create_subtransaction(subtransaction: SubTransactionCreate, db: Session = De
     return crud.create_subtransaction(db=db, subtransaction=subtransaction)
 
 @router.get("/subtransactions/get", response_model=List[SubTransaction], tags=["SubTransaction"])
-def get_subtransactions(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_subtransactions(db=db, skip=skip, limit=limit)
+def get_subtransactions(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_subtransactions(db=db, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/subtransaction/get/{subtransaction_id}", response_model=SubTransaction, tags=["SubTransaction"])
 def get_subtransaction(subtransaction_id: int, db: Session = Depends(get_db)):
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+import traceability
+from database import get_db
+from schemas.user_schemas import SessionData
+from routes.auth import verifier, cookie, require_admin
+
+router = APIRouter()
+
+@router.post("/traceability/anchor", dependencies=[Depends(cookie)])
+def anchor_lineage_events(db: Session = Depends(get_db), session_data: SessionData = Depends(verifier)):
+    """Collect new lineage events and anchor every closed window (Admin only)"""
+    require_admin(session_data)
+    return traceability.run_anchoring(db)
+
+@router.get("/traceability/event/{event_type}/{entity_id}")
+def get_lineage_event_proof(event_type: str, entity_id: int, db: Session = Depends(get_db)):
+    return traceability.get_event_proof(db, event_type, entity_id)
+
+@router.get("/traceability/flour/{flour_id}")
+def get_flour_provenance(flour_id: int, db: Session = Depends(get_db)):
+    return traceability.get_flour_provenance(db, flour_id)
@@ -1,9 +1,10 @@
-from typing import Dict, List, Union
+from typing import Dict, List, Union, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.transaction_schemas import Transaction, TransactionCreate, TransactionUpdate
 
@@ -14,8 +15,10 @@ def create_transaction(transaction: TransactionCreate, db: Session = Depends(get
     return crud.create_transaction(db=db, transaction=transaction)
 
 @router.get("/transactions/get", response_model=List[Transaction], tags=["Transaction"])
-def get_transactions(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_transactions(db=db, skip=skip, limit=limit)
+def get_transactions(response: Response, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_transactions(db=db, skip=skip, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/transaction/get/{transaction_id}", response_model=Transaction, tags=["Transaction"])
 def get_transaction(transaction_id: str, db: Session = Depends(get_db)):
@@ -1,18 +1,18 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, Query
 from requests import Session
 from fastapi.responses import JSONResponse
 import crud
+import pagination
 from database import get_db
 from schemas.user_schemas import User, UserUpdate, UserPhoneUpdate, AdminUserUpdate, UserRoleUpdate
 
 router = APIRouter()
 
 @router.get("/user/get", response_model=List[User], tags=["Users"])
-def get_users(db: Session = Depends(get_db)):
-    # print(f"Fetching users with skip={skip}, limit={limit}")
-    users = crud.get_users(db)
-    # print(f"Fetched {len(users)} users")
+def get_users(response: Response, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    users = crud.get_users(db, limit, cursor)
+    pagination.set_next_cursor(response, users)
     return users
 
 @router.get("/user/count", response_model=int, tags=["Users"])
@@ -22,13 +22,12 @@ def get_user_count(db: Session = Depends(get_db)):
     return count
 
 @router.get("/user/get_role/{role_id}", response_model=List[User], tags=["Users"])
-def get_user(role_id: int, db: Session = Depends(get_db)):
-    role = crud.get_user_by_role(db, role_id)
-    if not role:
+def get_user(role_id: int, response: Response, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    users = crud.get_user_by_role(db, role_id, limit, cursor)
+    if not users and cursor is None:
         raise HTTPException(status_code=400, detail="Role does not exist")
-    else:
-        users = crud.get_user_by_role(db, role_id)
-        return users
+    pagination.set_next_cursor(response, users)
+    return users
 
 @router.get("/user/get_user/{user_id}", response_model=User, tags=["Users"])
 def get_user(user_id: str, db: Session = Depends(get_db)):
@@ -1,10 +1,13 @@
-from typing import Dict, List, Union
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, List, Union, Optional
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, Response, Query
 from requests import Session
 from fastapi.responses import JSONResponse
+import bulk_intake
 import crud
+import pagination
 from database import get_db
 from schemas.leaves_schemas import WetLeaves, WetLeavesCreate, WetLeavesUpdate, WetLeavesStatusUpdate
+from schemas.misc_schemas import BulkCreateResult
 
 router = APIRouter()
 
@@ -12,9 +15,20 @@ router = APIRouter()
 def create_wet_leaves(wet_leaves: WetLeavesCreate, db: Session = Depends(get_db)):
     return crud.create_wet_leaves(db=db, wet_leaves=wet_leaves)
 
+@router.post("/wetLeaves/bulk", response_model=BulkCreateResult)
+def create_wet_leaves_bulk(wet_leaves: List[WetLeavesCreate], db: Session = Depends(get_db)):
+    return bulk_intake.create_wet_leaves_bulk(db, wet_leaves)
+
+@router.post("/wetLeaves/bulk_csv", response_model=BulkCreateResult)
+def create_wet_leaves_bulk_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    items = bulk_intake.parse_csv(file.file.read(), WetLeavesCreate)
+    return bulk_intake.create_wet_leaves_bulk(db, items)
+
 @router.get("/wetleaves/get")
-def get_wet_leaves_for_admin(db: Session = Depends(get_db)):
-    return crud.get_wet_leaves(db=db)
+def get_wet_leaves_for_admin(response: Response, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    page = crud.get_wet_leaves(db=db, limit=limit, cursor=cursor)
+    pagination.set_next_cursor(response, page)
+    return page
 
 @router.get("/wetleaves/get/{wet_leaves_id}", response_model=WetLeaves)
 def get_wet_leaves_id(wet_leaves_id: int, db: Session = Depends(get_db)):
@@ -3,9 +3,9 @@ from typing import Dict, List, Optional
 from fastapi import APIRouter, Depends, Form, HTTPException, Request, Response, Body
 import requests
 import httpx
-import pandas as pd
 from sqlalchemy.orm import Session
 from datetime import datetime
+from functools import lru_cache
 import crud
 from database import get_db
 from schemas.xendit_schemas import InvoiceRequest, XenditInvoiceRequestBody, InvoicePaidWebhook
@@ -15,15 +15,23 @@ from models import Flour,WetLeaves,DryLeaves
 from dotenv import load_dotenv
 import os
 import logging
+import metrics
 from email_service import EmailService, create_receipt_email_body
 
 router = APIRouter()
 
 load_dotenv()
 
-# Load and encode logo
-with open("./LeaftyLogo.svg", "rb") as logo_file:
-    encoded_logo = base64.b64encode(logo_file.read()).decode('utf-8')
+@lru_cache(maxsize=1)
+def get_encoded_logo() -> str:
+    # Read on first invoice instead of at import time
+    with open("./LeaftyLogo.svg", "rb") as logo_file:
+        return base64.b64encode(logo_file.read()).decode('utf-8')
+
+def format_invoice_date(value) -> str:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return value.strftime('%d/%m/%Y - %H:%M:%S')
 
 # Xendit credentials
 XENDIT_API_KEY = os.getenv("XENDIT_API_KEY")
@@ -42,7 +50,9 @@ async def create_invoice(invoice_request: InvoiceRequest):
     data = invoice_request.dict()
 
     try:
-        response = requests.post(xendit_invoice_url, json=data, headers=headers)
+        with metrics.track_outbound("xendit", "create_invoice") as call:
+            response = requests.post(xendit_invoice_url, json=data, headers=headers)
+            call.status = response.status_code
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -61,7 +71,9 @@ async def get_invoices(limit: Optional[int] = None):
             params['limit'] = limit
 
         async with httpx.AsyncClient() as client:
-            response = await client.get(xendit_invoice_url, headers=headers, params=params)
+            with metrics.track_outbound("xendit", "get_invoices") as call:
+                response = await client.get(xendit_invoice_url, headers=headers, params=params)
+                call.status = response.status_code
             response.raise_for_status()
             return response.json()
     except httpx.HTTPStatusError as e:
@@ -128,7 +140,9 @@ async def generate_invoice(
     try:
         # Send POST request to Invoice Generator API
         async with httpx.AsyncClient() as client:
-            response = await client.post(INVOICE_API_URL, json=payload, headers=headers)
+            with metrics.track_outbound("invoice_generator", "generate_invoice") as call:
+                response = await client.post(INVOICE_API_URL, json=payload, headers=headers)
+                call.status = response.status_code
 
             if response.status_code == 200:
                 return Response(
@@ -163,13 +177,13 @@ async def generate_invoice_from_webhook(payload: XenditInvoiceRequestBody):
         item_unit_costs = [payload.amount or 0]
 
         invoice_payload = {
-            "logo": encoded_logo,
+            "logo": get_encoded_logo(),
             "from": from_info,
             "to": to_info,
             "number": number,
             "currency": currency,
-            "date": pd.to_datetime(date).strftime('%d/%m/%Y - %H:%M:%S') if date else "",
-            "due_date": pd.to_datetime(due_date).strftime('%d/%m/%Y - %H:%M:%S') if due_date else "",
+            "date": format_invoice_date(date) if date else "",
+            "due_date": format_invoice_date(due_date) if due_date else "",
             "items": [{"name": item_names[0], "quantity": item_quantities[0], "unit_cost": item_unit_costs[0]}],
             "tax": 0,
             "discounts": 0,
@@ -186,7 +200,9 @@ async def generate_invoice_from_webhook(payload: XenditInvoiceRequestBody):
 
         # Send POST request to Invoice Generator API
         async with httpx.AsyncClient() as client:
-            response = await client.post(INVOICE_API_URL, json=invoice_payload, headers=headers)
+            with metrics.track_outbound("invoice_generator", "generate_invoice") as call:
+                response = await client.post(INVOICE_API_URL, json=invoice_payload, headers=headers)
+                call.status = response.status_code
 
             if response.status_code == 200:
                 return Response(
@@ -208,7 +224,9 @@ async def get_payout_channels():
     }
 
     params = {"currency": "IDR", "channel_category": "BANK"}
-    response = requests.get("https://api.xendit.co/payouts_channels", headers=headers, params=params)
+    with metrics.track_outbound("xendit", "payout_channels") as call:
+        response = requests.get("https://api.xendit.co/payouts_channels", headers=headers, params=params)
+        call.status = response.status_code
 
     if response.status_code == 200:
         return response.json()
@@ -438,11 +456,13 @@ async def invoice_paid_webhook(payload: InvoicePaidWebhook, db: Session = Depend
                     "Content-Type": "application/json"
                 }
                 async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        "https://api.biteship.com/v1/orders",
-                        headers=biteship_headers,
-                        json=shipment_data.dict()
-                    )
+                    with metrics.track_outbound("biteship", "create_order") as call:
+                        response = await client.post(
+                            "https://api.biteship.com/v1/orders",
+                            headers=biteship_headers,
+                            json=shipment_data.dict()
+                        )
+                        call.status = response.status_code
                     if response.status_code == 200:
                         biteship_order = response.json()
                         logging.info(f"Successfully created Biteship order. Order ID: {biteship_order.get('id')}")
@@ -517,7 +537,7 @@ async def generate_receipt_pdf(transaction_details: dict, customer: models.User,
     
     if hasattr(payment_payload, 'paid_at') and payment_payload.paid_at:
         try:
-            paid_date = pd.to_datetime(payment_payload.paid_at).strftime('%d/%m/%Y - %H:%M:%S')
+            paid_date = format_invoice_date(payment_payload.paid_at)
         except Exception as e:
             logging.warning(f"Failed to parse paid_at date: {e}")
             paid_date = "Unknown"
@@ -526,12 +546,12 @@ async def generate_receipt_pdf(transaction_details: dict, customer: models.User,
         payment_method = str(payment_payload.payment_method)
     
     receipt_payload = {
-        "logo": encoded_logo,
+        "logo": get_encoded_logo(),
         "from": "Leafty Marketplace\nJl. Kebon Jeruk No. 123\nJakarta, Indonesia\nPhone: +62-21-1234-5678\nEmail: support@leafty.com",
         "to": f"{customer.Username or 'N/A'}\n{customer.Email or 'N/A'}\nCustomer ID: {customer.UserID}",
         "number": f"RCP-{transaction_details['TransactionID'][:8]}",
         "currency": "IDR",
-        "date": pd.to_datetime(transaction_details['CreatedAt']).strftime('%d/%m/%Y - %H:%M:%S'),
+        "date": format_invoice_date(transaction_details['CreatedAt']),
         "due_date": paid_date,
         "payment_terms": "Paid via Xendit",
         "items": items_list,
@@ -552,7 +572,9 @@ async def generate_receipt_pdf(transaction_details: dict, customer: models.User,
     try:
         # Send POST request to Invoice Generator API
         async with httpx.AsyncClient() as client:
-            response = await client.post(INVOICE_API_URL, json=receipt_payload, headers=headers)
+            with metrics.track_outbound("invoice_generator", "generate_receipt") as call:
+                response = await client.post(INVOICE_API_URL, json=receipt_payload, headers=headers)
+                call.status = response.status_code
             
             if response.status_code == 200:
                 return response.content
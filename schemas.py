@@ -25,9 +25,6 @@ class OTPBase(BaseModel):
     otp_code: str
     expires_at: datetime
 
-class OTPCreate(OTPBase):
-    pass
-
 class OTP(OTPBase):
     class Config:
         orm_mode = True
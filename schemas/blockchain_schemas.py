@@ -1,5 +1,5 @@
-from pydantic import BaseModel, UUID4
-from typing import Optional
+from pydantic import BaseModel, Field, UUID4
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -10,6 +10,9 @@ class trx_form(BaseModel):
 class BlockchainTrxCreate(BaseModel):
     trx_id: str
 
+class BlockchainTrxBatchCreate(BaseModel):
+    trx_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
 class BlockchainTrxBase(BaseModel):
     UserID: str
     TrxId: str
@@ -1,10 +1,13 @@
 # Miscellaneous schemas
-from pydantic import BaseModel, UUID4, EmailStr
+from pydantic import BaseModel, Field, UUID4, EmailStr
 from typing import List
 
+# kg, the knapsack's memory and time grow with the target
+MAX_BULK_TARGET_WEIGHT = 10000
+
 class BulkItemSelectionRequest(BaseModel):
     item_type: str
-    target_weight: int
+    target_weight: int = Field(..., gt=0, le=MAX_BULK_TARGET_WEIGHT)
     users: List[UUID4]
 
 class LoginRequest(BaseModel):
@@ -15,3 +18,7 @@ class MarketPlaceFindItem(BaseModel):
     product_id: int
     product_name: str
     username: str
+
+class BulkCreateResult(BaseModel):
+    created: int
+    ids: List[int]
@@ -41,6 +41,9 @@ class ShipmentUpdate(BaseModel):
 
 class Shipment(ShipmentBase):
     ShipmentID: int
+    FlourWeightSum: Optional[float] = None
+    CourierName: Optional[str] = None
+    UserName: Optional[str] = None
 
 class ShipmentDateUpdate(BaseModel):
     ShipmentDate: Optional[datetime] = None
@@ -1,56 +1,74 @@
 import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
+
 import models
-from datetime import datetime, timedelta
-from database import get_db
+import statistics_rollup
+from database import SessionLocal
+
+def _insert(db: Session, model, id_column, rows):
+    """One multi-row INSERT, ids come back in row order once sorted"""
+    ids = sorted(db.execute(insert(model).values(rows).returning(id_column)).scalars())
+    statistics_rollup.apply_deltas(db.connection(), statistics_rollup.row_deltas(model, rows))
+    return ids
 
-def seed_leaves_and_powder(db: Session, num_centras: int = 5, num_each: int = 10):
+def seed_leaves_and_powder(db: Session, num_centras: int = 5, num_each: int = 10, seed: int = 42):
+    """Wet leaves -> dry leaves -> flour lineage for existing centras, three INSERTs and one commit.
+
+    For whole-schema data at scale use seeding/synthetic.py instead.
+    """
+    rng = random.Random(seed)
     # Get random centras (users with RoleID == 1)
-    centras = db.query(models.User).filter(models.User.RoleID == 1).all()
+    centras = db.query(models.User.UserID).filter(models.User.RoleID == 1).order_by(models.User.UserID).all()
     if not centras:
         print("No centras found!")
         return
-    centras = random.sample(centras, min(num_centras, len(centras)))
-
-    for centra in centras:
-        for _ in range(num_each):
-            # Wet Leaves
-            wet = models.WetLeaves(
-                UserID=centra.UserID,
-                Weight=random.uniform(10, 100),
-                Expiration=datetime.now() + timedelta(days=random.randint(1, 10)),
-                Status="awaiting",
-                ReceivedTime=datetime.now()
-            )
-            db.add(wet)
-            db.commit()
-            db.refresh(wet)
-
-            # Dry Leaves
-            dry = models.DryLeaves(
-                UserID=centra.UserID,
-                WetLeavesID=wet.WetLeavesID,
-                Processed_Weight=wet.Weight * random.uniform(0.5, 0.9),
-                Expiration=wet.Expiration + timedelta(days=random.randint(1, 5)),
-                Status="awaiting"
-            )
-            db.add(dry)
-            db.commit()
-            db.refresh(dry)
-
-            # Flour (Powder)
-            flour = models.Flour(
-                UserID=centra.UserID,
-                DryLeavesID=dry.DryLeavesID,
-                Flour_Weight=dry.Processed_Weight * random.uniform(0.5, 0.9),
-                Expiration=dry.Expiration + timedelta(days=random.randint(1, 5)),
-                Status="awaiting"
-            )
-            db.add(flour)
-            db.commit()
+    centras = [centra.UserID for centra in rng.sample(centras, min(num_centras, len(centras)))]
+
+    now = datetime.now()
+    wet_rows = [
+        {
+            "UserID": centra_id,
+            "Weight": round(rng.uniform(10, 100), 2),
+            "Expiration": now + timedelta(days=rng.randint(1, 10)),
+            "Status": "Awaiting",
+            "ReceivedTime": now,
+        }
+        for centra_id in centras for _ in range(num_each)
+    ]
+    wet_ids = _insert(db, models.WetLeaves, models.WetLeaves.WetLeavesID, wet_rows)
+
+    dry_rows = [
+        {
+            "UserID": wet["UserID"],
+            "WetLeavesID": wet_id,
+            "Processed_Weight": round(wet["Weight"] * rng.uniform(0.5, 0.9), 2),
+            "Expiration": wet["Expiration"] + timedelta(days=rng.randint(1, 5)),
+            "Status": "Awaiting",
+            "CreatedAt": now,
+        }
+        for wet, wet_id in zip(wet_rows, wet_ids)
+    ]
+    dry_ids = _insert(db, models.DryLeaves, models.DryLeaves.DryLeavesID, dry_rows)
+
+    # Flour (Powder)
+    flour_rows = [
+        {
+            "UserID": dry["UserID"],
+            "DryLeavesID": dry_id,
+            "Flour_Weight": round(dry["Processed_Weight"] * rng.uniform(0.5, 0.9), 2),
+            "Expiration": dry["Expiration"] + timedelta(days=rng.randint(1, 5)),
+            "Status": "Awaiting",
+            "CreatedAt": now,
+        }
+        for dry, dry_id in zip(dry_rows, dry_ids)
+    ]
+    _insert(db, models.Flour, models.Flour.FlourID, flour_rows)
+    db.commit()
     print(f"Seeded {num_each} wet, dry, and powder leaves for {len(centras)} centras.")
 
 if __name__ == "__main__":
-    db = get_db()
-    seed_leaves_and_powder(db)
-    db.close()
\ No newline at end of file
+    with SessionLocal() as db:
+        seed_leaves_and_powder(db)
@@ -0,0 +1,407 @@
+"""Deterministic synthetic data for the whole schema, for production-scale local testing.
+
+`--scale` is the number of wet leaves lots. Every lot gets a centra, and
+most are dried, milled into flour, and then sold on the marketplace or
+shipped to a harbor, so the other tables grow with it (about 2.8 rows per
+lot in total). Users, locations, settings, finance, transactions, market
+shipments, harbor shipments and blockchain hashes are all generated from a
+single random.Random(seed). The same seed, scale, days and end date into
+an empty database always produce the same rows, apart from the bcrypt salt
+of the shared SEED_PASSWORD hash.
+
+Rows are streamed in chunks of LOT_CHUNK lots and written with COPY on
+PostgreSQL (executemany elsewhere), with explicit primary keys so lineage
+never needs a round trip. Each chunk is committed. statistics_rollup is
+rebuilt at the end because bulk writes bypass the ORM hooks.
+
+Usage: python -m seeding.synthetic --scale 100000 [--seed 42] [--days 365] [--end-date 2026-10-01]
+"""
+import argparse
+import csv
+import io
+import itertools
+import logging
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+import bcrypt
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, select, text
+
+load_dotenv()
+
+import models
+import statistics_rollup
+from database import engine
+
+SEED_PASSWORD = "leafty-seed"
+# lots generated per chunk, transactions and shipments are grouped within a chunk so this is part of the determinism
+LOT_CHUNK = 10000
+WRITE_BATCH_ROWS = 10000
+
+ROLES = {1: "Centra", 2: "Harbor", 3: "Company", 4: "Admin", 5: "Customer", 6: "Rejected"}
+PRODUCTS = {1: "Wet Leaves", 2: "Dry Leaves", 3: "Powder"}
+COURIERS = ["JNE", "J&T Express", "SiCepat", "AnterAja", "Pos Indonesia"]
+BANK_CODES = ["BCA", "BNI", "BRI", "MANDIRI", "BSI"]
+TOWNS = ["Makassar", "Gowa", "Maros", "Takalar", "Jeneponto", "Bantaeng", "Bulukumba", "Sinjai", "Bone", "Soppeng",
+         "Wajo", "Sidrap", "Pinrang", "Enrekang", "Luwu", "Palopo", "Toraja", "Pangkep", "Barru", "Parepare"]
+# (latitude, longitude) box around South Sulawesi
+REGION = ((-5.8, -2.5), (119.3, 121.0))
+
+# sale outcome of a product that reaches the marketplace: product status, transaction, sub transaction, market shipment
+SALE_STATES = {
+    "Processed": ("Completed", "Completed", "processed"),
+    "On Delivery": ("On Delivery", "On Delivery", "On Delivery"),
+    "Reserved": ("Transaction Pending", "pending", "awaiting"),
+}
+SALE_WEIGHTS = {"Processed": 0.8, "On Delivery": 0.15, "Reserved": 0.05}
+
+
+def plan(scale: int) -> Dict[str, int]:
+    """Number of users of each kind for `scale` wet leaves lots"""
+    centras = max(3, scale // 5000)
+    return {
+        "lots": scale,
+        "centras": centras,
+        "harbors": max(1, centras // 10),
+        "customers": max(5, scale // 200),
+    }
+
+
+class TableWriter:
+    """Buffers rows for one table and writes them with COPY (PostgreSQL) or executemany.
+
+    Nothing is written before flush(), so the caller decides the order
+    tables are written in and foreign keys always find their parent rows.
+    """
+
+    def __init__(self, connection, table, columns: Sequence[str], batch_rows: int = WRITE_BATCH_ROWS):
+        self.connection = connection
+        self.table = table
+        self.columns = list(columns)
+        self.batch_rows = batch_rows
+        self.rows: List[tuple] = []
+        self.written = 0
+
+    def add(self, *row):
+        self.rows.append(row)
+
+    def flush(self):
+        for start in range(0, len(self.rows), self.batch_rows):
+            batch = self.rows[start:start + self.batch_rows]
+            if self.connection.dialect.name == "postgresql":
+                self._copy(batch)
+            else:
+                self.connection.execute(insert(self.table), [dict(zip(self.columns, row)) for row in batch])
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _copy(self, rows):
+        quote = self.connection.dialect.identifier_preparer.quote
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        # raw DBAPI work does not autobegin, without this commit() would be a no-op
+        if not self.connection.in_transaction():
+            self.connection.begin()
+        # the DBAPI connection of this Connection, so COPY runs in the same transaction
+        with self.connection.connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {quote(self.table.name)} ({', '.join(quote(c) for c in self.columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+
+class SyntheticData:
+    def __init__(self, connection, seed: int = 42, scale: int = 10000, days: int = 365, end: Optional[datetime] = None):
+        self.connection = connection
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.counts = plan(scale)
+        self.days = days
+        self.end = end or datetime.combine(date.today(), datetime.min.time())
+        self.next_ids: Dict[str, int] = {}
+        self.writers: Dict[str, TableWriter] = {}
+        self.prices: Dict[str, Dict[int, int]] = {}
+        self.sales: list = []
+        self.shipped: list = []
+
+    # --- helpers ---
+
+    def _uuid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def _hash(self) -> str:
+        return "0x%064x" % self.rng.getrandbits(256)
+
+    def _moment(self) -> datetime:
+        return (self.end - timedelta(seconds=self.rng.random() * self.days * 86400)).replace(microsecond=0)
+
+    def _after(self, moment: datetime, min_days: float, max_days: float) -> datetime:
+        return (moment + timedelta(days=self.rng.uniform(min_days, max_days))).replace(microsecond=0)
+
+    def _point(self):
+        (lat_min, lat_max), (lng_min, lng_max) = REGION
+        return round(self.rng.uniform(lat_min, lat_max), 6), round(self.rng.uniform(lng_min, lng_max), 6)
+
+    def _next_id(self, table, column: str) -> int:
+        if table.name not in self.next_ids:
+            current = self.connection.execute(select(func.max(table.c[column]))).scalar()
+            self.next_ids[table.name] = (current or 0) + 1
+        value = self.next_ids[table.name]
+        self.next_ids[table.name] += 1
+        return value
+
+    def _writer(self, model_or_table, *columns) -> TableWriter:
+        table = getattr(model_or_table, "__table__", model_or_table)
+        if table.name not in self.writers:
+            self.writers[table.name] = TableWriter(self.connection, table, columns)
+        return self.writers[table.name]
+
+    def _flush(self):
+        # parents before children, the writers were created in dependency order
+        for writer in self.writers.values():
+            writer.flush()
+
+    # --- reference data ---
+
+    def _ensure(self, model, key: str, rows: dict):
+        table = model.__table__
+        existing = set(self.connection.execute(select(table.c[key])).scalars())
+        missing = [dict(values, **{key: k}) for k, values in rows.items() if k not in existing]
+        if missing:
+            self.connection.execute(insert(table), missing)
+
+    def seed_reference_data(self):
+        self._ensure(models.RoleModel, "RoleID", {k: {"RoleName": v} for k, v in ROLES.items()})
+        self._ensure(models.Products, "ProductID", {k: {"ProductName": v} for k, v in PRODUCTS.items()})
+        if not self.connection.execute(select(func.count()).select_from(models.Courier.__table__)).scalar():
+            self.connection.execute(insert(models.Courier.__table__), [{"CourierName": name} for name in COURIERS])
+        if not self.connection.execute(select(func.count()).select_from(models.AdminSettings.__table__)).scalar():
+            self.connection.execute(insert(models.AdminSettings.__table__), [{"AdminFeeValue": 5}])
+        self.courier_ids = self.connection.execute(select(models.Courier.CourierID).order_by(models.Courier.CourierID)).scalars().all()
+
+    # --- users ---
+
+    def _user(self, role_id: int, username: str, email: str) -> str:
+        user_id = self._uuid()
+        phone = 628100000000 + self.rng.randrange(100000000)
+        self._writer(models.User, "UserID", "Username", "Email", "PhoneNumber", "Password", "RoleID").add(
+            user_id, username, email, phone, self.password_hash, role_id)
+        latitude, longitude = self._point()
+        self._writer(models.Location, "user_id", "location_address", "latitude", "longitude").add(
+            user_id, f"Jl. {self.rng.choice(TOWNS)} No. {self.rng.randint(1, 300)}", latitude, longitude)
+        return user_id
+
+    def seed_users(self):
+        # one hash for every seeded account, bcrypt is deliberately slow
+        self.password_hash = bcrypt.hashpw(SEED_PASSWORD.encode(), bcrypt.gensalt(rounds=10)).decode()
+        suffix = f"s{self.seed}"
+        self._user(4, f"Admin {suffix}", f"admin.{suffix}@seed.leafty.id")
+        self.centras = []
+        for n in range(self.counts["centras"]):
+            town = TOWNS[n % len(TOWNS)]
+            centra_id = self._user(1, f"Centra {town} {suffix}-{n}", f"centra{n}.{suffix}@seed.leafty.id")
+            self.centras.append(centra_id)
+            self._centra_settings(centra_id, town)
+        self.harbors = [self._user(2, f"Harbor {n} {suffix}", f"harbor{n}.{suffix}@seed.leafty.id")
+                        for n in range(self.counts["harbors"])]
+        self.customers = [self._user(5, f"Customer {n} {suffix}", f"customer{n}.{suffix}@seed.leafty.id")
+                          for n in range(self.counts["customers"])]
+        # a few large centras and a long tail, like production
+        self.centra_weights = list(itertools.accumulate(self.rng.paretovariate(1.5) for _ in self.centras))
+
+    def _centra_settings(self, centra_id: str, town: str):
+        base_prices = {1: self.rng.randint(8, 15) * 1000, 2: self.rng.randint(40, 70) * 1000, 3: self.rng.randint(90, 150) * 1000}
+        self.prices[centra_id] = base_prices
+        for product_id, price in base_prices.items():
+            self._writer(models.CentraBaseSettings, "SettingsID", "UserID", "ProductID", "InitialPrice", "Sellable").add(
+                self._next_id(models.CentraBaseSettings.__table__, "SettingsID"), centra_id, product_id, price, True)
+            for exp_day_left, discount in ((3, self.rng.randint(20, 40)), (7, self.rng.randint(5, 15))):
+                self._writer(models.CentraSettingDetail, "SettingDetailID", "UserID", "ProductID", "DiscountRate", "ExpDayLeft").add(
+                    self._next_id(models.CentraSettingDetail.__table__, "SettingDetailID"), centra_id, product_id, discount, exp_day_left)
+        self._writer(models.CentraFinance, "FinanceID", "UserID", "AccountHolderName", "BankCode", "BankAccountNumber").add(
+            self._next_id(models.CentraFinance.__table__, "FinanceID"), centra_id, f"Centra {town}",
+            self.rng.choice(BANK_CODES), str(self.rng.randrange(10 ** 9, 10 ** 10)))
+
+    # --- inventory lineage ---
+
+    def _to_market(self, centra_id: str, product_type_id: int, product_id: int, weight: float, ready_at: datetime) -> str:
+        """Status of a product put up for sale, sold ones are queued for transactions"""
+        if ready_at >= self.end or self.rng.random() < 0.4:
+            return "Awaiting"
+        status = self.rng.choices(list(SALE_WEIGHTS), weights=list(SALE_WEIGHTS.values()))[0]
+        sold_at = min(self._after(ready_at, 0, 14), self.end)
+        self.sales.append((status, centra_id, product_type_id, product_id, weight, sold_at))
+        return status
+
+    def seed_lot(self):
+        rng = self.rng
+        centra_id = rng.choices(self.centras, cum_weights=self.centra_weights)[0]
+        received = self._moment()
+        wet_id = self._next_id(models.WetLeaves.__table__, "WetLeavesID")
+        wet_weight = round(rng.uniform(20, 120), 2)
+        wet_expiration = self._after(received, 2, 5)
+        dry_at = self._after(received, 0.5, 2)
+        wet_dried = dry_at < self.end and rng.random() < 0.85
+        wet_status = "Processed" if wet_dried else self._to_market(centra_id, 1, wet_id, wet_weight, received)
+        self._writer(models.WetLeaves, "WetLeavesID", "UserID", "Weight", "ReceivedTime", "Expiration", "Status").add(
+            wet_id, centra_id, wet_weight, received, wet_expiration, wet_status)
+        if not wet_dried:
+            return
+
+        dry_id = self._next_id(models.DryLeaves.__table__, "DryLeavesID")
+        # dried moringa keeps roughly a fifth of the wet weight
+        dry_weight = round(wet_weight * rng.uniform(0.18, 0.25), 2)
+        flour_at = self._after(dry_at, 1, 4)
+        milled = flour_at < self.end and rng.random() < 0.8
+        dry_status = "Processed" if milled else self._to_market(centra_id, 2, dry_id, dry_weight, dry_at)
+        self._writer(models.DryLeaves, "DryLeavesID", "UserID", "WetLeavesID", "Processed_Weight", "Expiration", "Status", "CreatedAt").add(
+            dry_id, centra_id, wet_id, dry_weight, self._after(dry_at, 90, 180), dry_status, dry_at)
+        if not milled:
+            return
+
+        flour_id = self._next_id(models.Flour.__table__, "FlourID")
+        flour_weight = round(dry_weight * rng.uniform(0.85, 0.95), 2)
+        if rng.random() < 0.4:
+            flour_status = "Shipped"
+            self.shipped.append((centra_id, flour_id, flour_weight, flour_at))
+        else:
+            flour_status = self._to_market(centra_id, 3, flour_id, flour_weight, flour_at)
+        self._writer(models.Flour, "FlourID", "DryLeavesID", "UserID", "Flour_Weight", "Expiration", "Status", "CreatedAt").add(
+            flour_id, dry_id, centra_id, flour_weight, self._after(flour_at, 180, 365), flour_status, flour_at)
+
+    # --- sales and shipments, grouped per chunk ---
+
+    def _groups(self, items, key, max_size: int):
+        """Consecutive runs of items sharing `key`, each cut into groups of 1..max_size"""
+        group: list = []
+        size = self.rng.randint(1, max_size)
+        for item in items:
+            if group and (key(group[0]) != key(item) or len(group) >= size):
+                yield group
+                group, size = [], self.rng.randint(1, max_size)
+            group.append(item)
+        if group:
+            yield group
+
+    def seed_sales(self):
+        # status first so a transaction's products share one outcome, then centra for sub transactions
+        self.sales.sort(key=lambda sale: (sale[0], sale[1]))
+        subs = list(self._groups(self.sales, key=lambda sale: (sale[0], sale[1]), max_size=4))
+        for transaction_subs in self._groups(subs, key=lambda sub: sub[0][0], max_size=2):
+            status = transaction_subs[0][0][0]
+            transaction_status, sub_status, shipment_status = SALE_STATES[status]
+            created = max(sale[5] for sub in transaction_subs for sale in sub)
+            transaction_id = self._uuid()
+            customer_id = self.rng.choice(self.customers)
+            self._writer(models.Transaction, "TransactionID", "CustomerID", "TransactionStatus", "CreatedAt", "UpdatedAt", "ExpirationAt").add(
+                transaction_id, customer_id, transaction_status, created, created, created + timedelta(hours=3))
+            for sub in transaction_subs:
+                sub_id = self._next_id(models.SubTransaction.__table__, "SubTransactionID")
+                centra_id = sub[0][1]
+                self._writer(models.SubTransaction, "SubTransactionID", "TransactionID", "SubTransactionStatus", "CreatedAt", "UpdatedAt", "CentraID").add(
+                    sub_id, transaction_id, sub_status, created, created, centra_id)
+                for _, _, product_type_id, product_id, weight, _ in sub:
+                    initial_price = round(self.prices[centra_id][product_type_id] * weight)
+                    price = round(initial_price * (1 - self.rng.choice((0, 0, 0, 0.1, 0.25))))
+                    self._writer(models.MarketShipment, "MarketShipmentID", "SubTransactionID", "ProductTypeID", "ProductID", "Price",
+                                 "InitialPrice", "ShipmentStatus", "CreatedAt", "UpdatedAt").add(
+                        self._next_id(models.MarketShipment.__table__, "MarketShipmentID"), sub_id, product_type_id, product_id,
+                        price, initial_price, shipment_status, created, created)
+            if status == "Processed":
+                self._trx(customer_id, created)
+        self.sales = []
+
+    def seed_shipments(self):
+        self.shipped.sort(key=lambda flour: flour[0])
+        for group in self._groups(self.shipped, key=lambda flour: flour[0], max_size=8):
+            centra_id = group[0][0]
+            shipment_id = self._next_id(models.Shipment.__table__, "ShipmentID")
+            shipped_at = min(self._after(max(flour[3] for flour in group), 0, 3), self.end)
+            weight = sum(flour[2] for flour in group)
+            checked_in = self._after(shipped_at, 1, 5)
+            arrived = checked_in < self.end
+            rescaled = arrived and self.rng.random() < 0.7
+            self._writer(models.Shipment, "ShipmentID", "CourierID", "UserID", "ShipmentQuantity", "ShipmentDate", "Check_in_Date",
+                         "Check_in_Quantity", "Harbor_Reception_File", "Rescalled_Weight", "Rescalled_Date", "Centra_Reception_File",
+                         "CreatedAt").add(
+                shipment_id, self.rng.choice(self.courier_ids), centra_id, len(group), shipped_at,
+                checked_in if arrived else None, len(group) if arrived else None, True if arrived else None,
+                round(weight * self.rng.uniform(0.97, 1.0), 2) if rescaled else None,
+                self._after(checked_in, 0, 1) if rescaled else None, True if rescaled else None, shipped_at)
+            association = self._writer(models.shipment_flour_association, "shipment_id", "flour_id")
+            for flour in group:
+                association.add(shipment_id, flour[1])
+            self._trx(centra_id, shipped_at)
+        self.shipped = []
+
+    def _trx(self, user_id: str, created: datetime):
+        self._writer(models.BlockchainTrx, "TrxId", "UserID", "BlockchainHash", "CreatedAt").add(
+            self._next_id(models.BlockchainTrx.__table__, "TrxId"), user_id, self._hash(), created)
+
+    def _commit(self):
+        self._flush()
+        self.connection.commit()
+
+    def run(self, progress=None) -> Dict[str, int]:
+        self.seed_reference_data()
+        self.seed_users()
+        self._commit()
+        for lot in range(1, self.counts["lots"] + 1):
+            self.seed_lot()
+            if lot % LOT_CHUNK == 0 or lot == self.counts["lots"]:
+                self.seed_sales()
+                self.seed_shipments()
+                self._commit()
+                if progress is not None:
+                    progress(lot)
+        self._reset_sequences()
+        rollup_rows = statistics_rollup.rebuild_rollups_on(self.connection)
+        self.connection.commit()
+        written = {name: writer.written for name, writer in self.writers.items()}
+        written["statistics_rollup"] = rollup_rows
+        return written
+
+    def _reset_sequences(self):
+        """Move serial sequences past the explicit ids written above"""
+        if self.connection.dialect.name != "postgresql":
+            return
+        quote = self.connection.dialect.identifier_preparer.quote
+        for model in (models.RoleModel, models.Products, models.CentraBaseSettings, models.CentraSettingDetail, models.CentraFinance,
+                      models.WetLeaves, models.DryLeaves, models.Flour, models.SubTransaction, models.MarketShipment,
+                      models.Shipment, models.BlockchainTrx):
+            table = model.__table__
+            column = next(iter(table.primary_key.columns)).name
+            self.connection.execute(
+                text(f"SELECT setval(pg_get_serial_sequence(:table, :column), COALESCE(MAX({quote(column)}), 1)) "
+                     f"FROM {quote(table.name)}"),
+                {"table": table.name, "column": column},
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate deterministic synthetic data for the whole schema")
+    parser.add_argument("--scale", type=int, default=10000, help="wet leaves lots to generate (10k to 10M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="history spread over this many days")
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None, help="newest generated date, default today")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    end = datetime.combine(args.end_date, datetime.min.time()) if args.end_date else None
+    started = time.perf_counter()
+    with engine.connect() as connection:
+        generator = SyntheticData(connection, seed=args.seed, scale=args.scale, days=args.days, end=end)
+        written = generator.run(progress=lambda lots: logging.info(
+            f"{lots}/{args.scale} lots, {time.perf_counter() - started:.1f} s"))
+    for table, rows in written.items():
+        logging.info(f"{table}: {rows} rows")
+    logging.info(f"Seeded {sum(written.values())} rows in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Incrementally maintained statistics rollups.
+
+Every ORM flush that creates, changes or deletes wet leaves, dry leaves,
+flour, shipments or market shipments adds the resulting delta to
+statistics_rollup (one row per centra, metric, product type and day).
+Bulk `query.update()`/`delete()` and Core inserts bypass the hook, so
+callers either apply the deltas with `apply_deltas` or rely on
+`rebuild_rollups`, which recomputes the table from the source rows.
+
+Run `python statistics_rollup.py` to rebuild from the command line.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Tuple
+
+from sqlalchemy import String, cast, delete, event, func, insert, literal, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, attributes
+
+import models
+
+# Rows without a timestamp still count towards all-time totals
+UNDATED_DAY = date(1970, 1, 1)
+
+MARKET_SALES_METRIC = "sum_market_sales"
+
+# model -> (metric, owner attribute, summed attribute, day attribute)
+ROLLUP_SOURCES = {
+    models.WetLeaves: ("sum_wet_leaves", "UserID", "Weight", "ReceivedTime"),
+    models.DryLeaves: ("sum_dry_leaves", "UserID", "Processed_Weight", "CreatedAt"),
+    models.Flour: ("sum_flour", "UserID", "Flour_Weight", "CreatedAt"),
+    models.Shipment: ("sum_shipment_quantity", "UserID", "ShipmentQuantity", "CreatedAt"),
+}
+
+MARKET_SHIPMENT_ATTRIBUTES = ("SubTransactionID", "ProductTypeID", "Price", "ShipmentStatus", "CreatedAt")
+
+# (UserID, Metric, ProductTypeID, Day) -> [Total, ItemCount]
+RollupKey = Tuple[str, str, int, date]
+
+
+def to_day(value) -> date:
+    if value is None:
+        return UNDATED_DAY
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _is_cancelled(status) -> bool:
+    return status is not None and status.lower() == "cancelled"
+
+
+def _values(obj, keys, old: bool, pending: bool = False) -> dict:
+    """Current or pre-flush values of the given attributes"""
+    state = attributes.instance_state(obj)
+    values = {}
+    for key in keys:
+        if pending:
+            # server defaults of freshly inserted rows are not loaded yet
+            values[key] = state.dict.get(key)
+            continue
+        if not old:
+            values[key] = getattr(obj, key)
+            continue
+        history = state.attrs[key].load_history()
+        if history.deleted:
+            values[key] = history.deleted[0]
+        elif history.unchanged:
+            values[key] = history.unchanged[0]
+        else:
+            values[key] = None
+    return values
+
+
+def _has_changes(obj, keys) -> bool:
+    state = attributes.instance_state(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+def collect_deltas(session: Session) -> Dict[RollupKey, list]:
+    """Rollup deltas for the objects in the pending flush"""
+    deltas = defaultdict(lambda: [0.0, 0])
+    market_rows = []
+
+    def add(obj, sign: int, old: bool, pending: bool = False):
+        source = ROLLUP_SOURCES.get(type(obj))
+        if source is not None:
+            metric, user_key, value_key, day_key = source
+            values = _values(obj, (user_key, value_key, day_key), old, pending)
+            if values[user_key] is None:
+                return
+            delta = deltas[(values[user_key], metric, 0, to_day(values[day_key]))]
+            delta[0] += sign * (values[value_key] or 0)
+            delta[1] += sign
+        elif isinstance(obj, models.MarketShipment):
+            values = _values(obj, MARKET_SHIPMENT_ATTRIBUTES, old, pending)
+            if not _is_cancelled(values["ShipmentStatus"]):
+                if values["CreatedAt"] is None and pending:
+                    values["CreatedAt"] = datetime.now()
+                market_rows.append((sign, values))
+
+    for obj in session.new:
+        add(obj, 1, old=False, pending=True)
+    for obj in session.deleted:
+        add(obj, -1, old=True)
+    for obj in session.dirty:
+        keys = ROLLUP_SOURCES[type(obj)][1:] if type(obj) in ROLLUP_SOURCES else (
+            MARKET_SHIPMENT_ATTRIBUTES if isinstance(obj, models.MarketShipment) else ())
+        if keys and _has_changes(obj, keys):
+            add(obj, -1, old=True)
+            add(obj, 1, old=False)
+
+    if market_rows:
+        # market shipments belong to the centra of their sub transaction
+        # (sub transactions deleted in this flush are only left in the session)
+        sub_ids = {values["SubTransactionID"] for _, values in market_rows if values["SubTransactionID"] is not None}
+        centras = {}
+        for obj in list(session.identity_map.values()) + list(session.deleted):
+            if isinstance(obj, models.SubTransaction):
+                loaded = attributes.instance_state(obj).dict
+                if loaded.get("SubTransactionID") in sub_ids and loaded.get("CentraID") is not None:
+                    centras[loaded["SubTransactionID"]] = loaded["CentraID"]
+        missing = sub_ids - centras.keys()
+        if missing:
+            centras.update(session.connection().execute(
+                select(models.SubTransaction.SubTransactionID, models.SubTransaction.CentraID)
+                .where(models.SubTransaction.SubTransactionID.in_(missing))
+            ).all())
+        for sign, values in market_rows:
+            centra_id = centras.get(values["SubTransactionID"])
+            if centra_id is None:
+                continue
+            delta = deltas[(centra_id, MARKET_SALES_METRIC, values["ProductTypeID"] or 0, to_day(values["CreatedAt"]))]
+            delta[0] += sign * (values["Price"] or 0)
+            delta[1] += sign
+
+    return {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def row_deltas(model, rows) -> Dict[RollupKey, list]:
+    """Rollup deltas for rows of a tracked model inserted outside the ORM"""
+    metric, user_key, value_key, day_key = ROLLUP_SOURCES[model]
+    deltas = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        if row.get(user_key) is None:
+            continue
+        delta = deltas[(row[user_key], metric, 0, to_day(row.get(day_key)))]
+        delta[0] += row.get(value_key) or 0
+        delta[1] += 1
+    return dict(deltas)
+
+
+def market_row_deltas(rows, centras: Dict[int, str]) -> Dict[RollupKey, list]:
+    """Market sales deltas for market shipment rows inserted outside the ORM,
+    centras maps SubTransactionID -> CentraID"""
+    deltas = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        centra_id = centras.get(row.get("SubTransactionID"))
+        if centra_id is None or _is_cancelled(row.get("ShipmentStatus")):
+            continue
+        # CreatedAt is left to the server default, as in collect_deltas
+        delta = deltas[(centra_id, MARKET_SALES_METRIC, row.get("ProductTypeID") or 0, to_day(row.get("CreatedAt") or datetime.now()))]
+        delta[0] += row.get("Price") or 0
+        delta[1] += 1
+    return dict(deltas)
+
+
+def apply_deltas(connection, deltas: Dict[RollupKey, list]):
+    """Add deltas to statistics_rollup with a single upsert"""
+    if not deltas:
+        return
+    table = models.StatisticsRollup.__table__
+    insert_fn = sqlite_insert if connection.dialect.name == "sqlite" else pg_insert
+    stmt = insert_fn(table).values([
+        {"UserID": user_id, "Metric": metric, "ProductTypeID": product_type_id, "Day": day,
+         "Total": total, "ItemCount": item_count}
+        for (user_id, metric, product_type_id, day), (total, item_count) in deltas.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.UserID, table.c.Metric, table.c.ProductTypeID, table.c.Day],
+        set_={
+            "Total": table.c.Total + stmt.excluded.Total,
+            "ItemCount": table.c.ItemCount + stmt.excluded.ItemCount,
+        },
+    )
+    connection.execute(stmt)
+
+
+def _track_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Load the previous value when a tracked attribute is assigned on an expired
+# instance, otherwise history cannot tell what to subtract
+for _model, (_metric, *_keys) in ROLLUP_SOURCES.items():
+    for _key in _keys:
+        event.listen(getattr(_model, _key), "set", _track_previous_value, active_history=True, retval=True)
+for _key in MARKET_SHIPMENT_ATTRIBUTES:
+    event.listen(getattr(models.MarketShipment, _key), "set", _track_previous_value, active_history=True, retval=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _update_rollups(session: Session, flush_context):
+    # history is still pre-flush here and the new rows already have their keys
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _day_expression(column, dialect_name: str):
+    day = func.date(column) if dialect_name == "sqlite" else cast(column, models.StatisticsRollup.Day.type)
+    return func.coalesce(day, literal(UNDATED_DAY, models.StatisticsRollup.Day.type))
+
+
+def _source_selects(dialect_name: str):
+    for model, (metric, user_key, value_key, day_key) in ROLLUP_SOURCES.items():
+        user_column, day = getattr(model, user_key), _day_expression(getattr(model, day_key), dialect_name)
+        yield (
+            select(user_column, literal(metric, String), literal(0), day,
+                   func.coalesce(func.sum(getattr(model, value_key)), 0), func.count())
+            .where(user_column.isnot(None))
+            .group_by(user_column, day)
+        )
+
+    market = models.MarketShipment
+    centra_id, day = models.SubTransaction.CentraID, _day_expression(market.CreatedAt, dialect_name)
+    product_type = func.coalesce(market.ProductTypeID, 0)
+    yield (
+        select(centra_id, literal(MARKET_SALES_METRIC, String), product_type, day,
+               func.coalesce(func.sum(market.Price), 0), func.count())
+        .join(models.SubTransaction, models.SubTransaction.SubTransactionID == market.SubTransactionID)
+        .where(centra_id.isnot(None))
+        .where(or_(market.ShipmentStatus.is_(None), func.lower(market.ShipmentStatus) != "cancelled"))
+        .group_by(centra_id, product_type, day)
+    )
+
+
+def rebuild_rollups_on(connection) -> int:
+    """Replace statistics_rollup with totals recomputed from the source tables"""
+    table = models.StatisticsRollup.__table__
+    columns = [table.c.UserID, table.c.Metric, table.c.ProductTypeID, table.c.Day, table.c.Total, table.c.ItemCount]
+    connection.execute(delete(table))
+    for source in _source_selects(connection.dialect.name):
+        connection.execute(insert(table).from_select(columns, source))
+    return connection.execute(select(func.count()).select_from(table)).scalar()
+
+
+def rebuild_rollups(db: Session) -> int:
+    row_count = rebuild_rollups_on(db.connection())
+    db.commit()
+    logging.info(f"Rebuilt statistics_rollup with {row_count} rows")
+    return row_count
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        rebuild_rollups(db)
@@ -0,0 +1,285 @@
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import String, case, func, literal, literal_column, select, union_all
+from sqlalchemy.orm import Session
+
+import models
+
+# metric name -> (owner column, summed column)
+STATISTICS_SOURCES = {
+    "sum_wet_leaves": (models.WetLeaves.UserID, models.WetLeaves.Weight),
+    "sum_dry_leaves": (models.DryLeaves.UserID, models.DryLeaves.Processed_Weight),
+    "sum_flour": (models.Flour.UserID, models.Flour.Flour_Weight),
+    "sum_shipment_quantity": (models.Shipment.UserID, models.Shipment.ShipmentQuantity),
+}
+
+
+def totals_cte(user_id: Optional[str] = None):
+    """Per-centra totals of every metric as (user_id, metric, total) rows"""
+    branches = []
+    for metric, (user_column, value_column) in STATISTICS_SOURCES.items():
+        branch = (
+            select(
+                user_column.label("user_id"),
+                literal(metric).label("metric"),
+                func.sum(value_column).label("total"),
+            )
+            .group_by(user_column)
+        )
+        if user_id is not None:
+            branch = branch.where(user_column == user_id)
+        branches.append(branch)
+    return union_all(*branches).cte("centra_totals")
+
+
+def _metric_columns(cte):
+    return [
+        func.coalesce(func.sum(cte.c.total).filter(cte.c.metric == metric), 0).label(metric)
+        for metric in STATISTICS_SOURCES
+    ]
+
+
+def _format_totals(row) -> Dict[str, int]:
+    # rounding first keeps float noise from incremental updates out of the integer totals
+    return {metric: int(round(row._mapping[metric] or 0, 6)) for metric in STATISTICS_SOURCES}
+
+
+def get_live_totals(db: Session, user_id: Optional[str] = None) -> Dict[str, int]:
+    """All dashboard totals in one query over the source tables"""
+    cte = totals_cte(user_id)
+    row = db.execute(select(*_metric_columns(cte))).one()
+    return _format_totals(row)
+
+
+def get_live_totals_by_centra(db: Session) -> Dict[str, Dict[str, int]]:
+    cte = totals_cte()
+    rows = db.execute(
+        select(cte.c.user_id, *_metric_columns(cte))
+        .where(cte.c.user_id.isnot(None))
+        .group_by(cte.c.user_id)
+    ).all()
+    return {row.user_id: _format_totals(row) for row in rows}
+
+
+def _rollup_metric_columns():
+    rollup = models.StatisticsRollup
+    return [
+        func.coalesce(func.sum(rollup.Total).filter(rollup.Metric == metric), 0).label(metric)
+        for metric in STATISTICS_SOURCES
+    ]
+
+
+def get_totals(db: Session, user_id: Optional[str] = None) -> Dict[str, int]:
+    """All dashboard totals from the maintained rollup, optionally for one centra"""
+    stmt = select(*_rollup_metric_columns())
+    if user_id is not None:
+        stmt = stmt.where(models.StatisticsRollup.UserID == user_id)
+    return _format_totals(db.execute(stmt).one())
+
+
+def get_totals_by_centra(db: Session) -> Dict[str, Dict[str, int]]:
+    rollup = models.StatisticsRollup
+    rows = db.execute(
+        select(rollup.UserID.label("user_id"), *_rollup_metric_columns()).group_by(rollup.UserID)
+    ).all()
+    return {row.user_id: _format_totals(row) for row in rows}
+
+
+def find_rollup_drift(db: Session) -> Dict[str, Dict[str, list]]:
+    """Centras whose rollup totals differ from the source tables, as metric -> [rollup, live]"""
+    live, rolled = get_live_totals_by_centra(db), get_totals_by_centra(db)
+    drift = {}
+    for user_id in live.keys() | rolled.keys():
+        empty = dict.fromkeys(STATISTICS_SOURCES, 0)
+        expected, actual = live.get(user_id, empty), rolled.get(user_id, empty)
+        differences = {metric: [actual[metric], expected[metric]] for metric in STATISTICS_SOURCES if actual[metric] != expected[metric]}
+        if differences:
+            drift[user_id] = differences
+    return drift
+
+
+TIMESERIES_BUCKETS = ("day", "week", "month")
+TIMESERIES_MAX_BUCKETS = int(os.getenv("STATISTICS_TIMESERIES_MAX_BUCKETS", "400"))
+TIMESERIES_CACHE_SECONDS = int(os.getenv("STATISTICS_TIMESERIES_CACHE_SECONDS", "60"))
+TIMESERIES_CACHE_SIZE = 256
+
+# series name -> (owner column, summed column, timestamp column)
+TIMESERIES_SOURCES = {
+    "wet_leaves": (models.WetLeaves.UserID, models.WetLeaves.Weight, models.WetLeaves.ReceivedTime),
+    "dry_leaves": (models.DryLeaves.UserID, models.DryLeaves.Processed_Weight, models.DryLeaves.CreatedAt),
+    "flour": (models.Flour.UserID, models.Flour.Flour_Weight, models.Flour.CreatedAt),
+    "shipment_quantity": (models.Shipment.UserID, models.Shipment.ShipmentQuantity, models.Shipment.CreatedAt),
+}
+
+_timeseries_cache: Dict[tuple, tuple] = {}
+_timeseries_cache_lock = threading.Lock()
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day + timedelta(days=7)
+    if bucket == "month":
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+def bucket_expression(column, bucket: str, dialect_name: str):
+    """date_trunc on PostgreSQL; the sqlite branch only serves local runs"""
+    if dialect_name == "sqlite":
+        if bucket == "week":
+            return func.date(column, "-6 days", "weekday 1")
+        if bucket == "month":
+            return func.strftime("%Y-%m-01", column)
+        return func.date(column)
+    # bucket is validated against TIMESERIES_BUCKETS, inlining it keeps SELECT and GROUP BY identical
+    return func.date_trunc(literal_column(f"'{bucket}'"), column)
+
+
+def as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _series_query(start: datetime, end: datetime, bucket: str, centra: Optional[str], dialect_name: str):
+    branches = []
+    for name, (user_column, value_column, time_column) in TIMESERIES_SOURCES.items():
+        bucket_column = bucket_expression(time_column, bucket, dialect_name)
+        branch = (
+            select(
+                literal(name, String).label("series"),
+                bucket_column.label("bucket"),
+                func.sum(value_column).label("total"),
+                func.count().label("item_count"),
+            )
+            .where(time_column >= start, time_column < end)
+            .group_by(bucket_column)
+        )
+        if centra is not None:
+            branch = branch.where(user_column == centra)
+        branches.append(branch)
+    return union_all(*branches)
+
+
+def _yield_query(start: datetime, end: datetime, bucket: str, centra: Optional[str], dialect_name: str):
+    """Wet, dried and milled weights of the wet leaves received in each bucket"""
+    wet = models.WetLeaves
+    wet_in_range = select(wet.WetLeavesID).where(wet.ReceivedTime >= start, wet.ReceivedTime < end)
+    if centra is not None:
+        wet_in_range = wet_in_range.where(wet.UserID == centra)
+    dry_in_range = select(models.DryLeaves.DryLeavesID).where(models.DryLeaves.WetLeavesID.in_(wet_in_range))
+    flour_per_dry = (
+        select(models.Flour.DryLeavesID, func.sum(models.Flour.Flour_Weight).label("flour_weight"))
+        .where(models.Flour.DryLeavesID.in_(dry_in_range))
+        .group_by(models.Flour.DryLeavesID)
+        .subquery()
+    )
+    dry_per_wet = (
+        select(
+            models.DryLeaves.WetLeavesID,
+            func.sum(models.DryLeaves.Processed_Weight).label("dry_weight"),
+            func.sum(case((flour_per_dry.c.flour_weight.isnot(None), models.DryLeaves.Processed_Weight), else_=0)).label("milled_dry_weight"),
+            func.sum(func.coalesce(flour_per_dry.c.flour_weight, 0)).label("flour_weight"),
+        )
+        .outerjoin(flour_per_dry, flour_per_dry.c.DryLeavesID == models.DryLeaves.DryLeavesID)
+        .where(models.DryLeaves.WetLeavesID.in_(wet_in_range))
+        .group_by(models.DryLeaves.WetLeavesID)
+        .subquery()
+    )
+    bucket_column = bucket_expression(wet.ReceivedTime, bucket, dialect_name)
+    stmt = (
+        select(
+            bucket_column.label("bucket"),
+            func.sum(wet.Weight).label("dried_wet_weight"),
+            func.sum(dry_per_wet.c.dry_weight).label("dry_weight"),
+            func.sum(dry_per_wet.c.milled_dry_weight).label("milled_dry_weight"),
+            func.sum(dry_per_wet.c.flour_weight).label("flour_weight"),
+        )
+        .join(dry_per_wet, dry_per_wet.c.WetLeavesID == wet.WetLeavesID)
+        .where(wet.ReceivedTime >= start, wet.ReceivedTime < end)
+        .group_by(bucket_column)
+    )
+    if centra is not None:
+        stmt = stmt.where(wet.UserID == centra)
+    return stmt
+
+
+def _ratio(numerator, denominator) -> Optional[float]:
+    if not numerator or not denominator:
+        return None
+    return round(numerator / denominator, 4)
+
+
+def _compute_timeseries(db: Session, date_from: date, date_to: date, bucket: str, centra: Optional[str]) -> dict:
+    dialect_name = db.get_bind().dialect.name
+    start = datetime.combine(bucket_start(date_from, bucket), datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+
+    buckets: List[date] = []
+    current = start.date()
+    while current < end.date():
+        buckets.append(current)
+        current = _next_bucket(current, bucket)
+    positions = {day: index for index, day in enumerate(buckets)}
+
+    result = {"bucket": bucket, "from": date_from.isoformat(), "to": date_to.isoformat(), "centra": centra,
+              "buckets": [day.isoformat() for day in buckets]}
+    for name in TIMESERIES_SOURCES:
+        result[name] = [0.0] * len(buckets)
+        result[f"{name}_count"] = [0] * len(buckets)
+    for row in db.execute(_series_query(start, end, bucket, centra, dialect_name)):
+        index = positions.get(as_date(row.bucket))
+        if index is not None:
+            result[row.series][index] = round(float(row.total or 0), 3)
+            result[f"{row.series}_count"][index] = row.item_count
+
+    result["yield_wet_to_dry"] = [None] * len(buckets)
+    result["yield_dry_to_flour"] = [None] * len(buckets)
+    for row in db.execute(_yield_query(start, end, bucket, centra, dialect_name)):
+        index = positions.get(as_date(row.bucket))
+        if index is not None:
+            result["yield_wet_to_dry"][index] = _ratio(row.dry_weight, row.dried_wet_weight)
+            result["yield_dry_to_flour"][index] = _ratio(row.flour_weight, row.milled_dry_weight)
+    return result
+
+
+def get_timeseries(db: Session, date_from: Optional[date], date_to: Optional[date], bucket: str, centra: Optional[str] = None) -> dict:
+    """Columnar intake, production, shipment and yield series, cached per range and bucket"""
+    if bucket not in TIMESERIES_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(TIMESERIES_BUCKETS)}")
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=30)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (date_to - date_from).days // {"day": 1, "week": 7, "month": 28}[bucket] > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too large for {bucket} buckets")
+
+    key = (date_from, date_to, bucket, centra)
+    now = time.monotonic()
+    with _timeseries_cache_lock:
+        cached = _timeseries_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    result = _compute_timeseries(db, date_from, date_to, bucket, centra)
+    with _timeseries_cache_lock:
+        if len(_timeseries_cache) >= TIMESERIES_CACHE_SIZE:
+            for stale_key in [k for k, (expires, _) in _timeseries_cache.items() if expires <= now] or list(_timeseries_cache)[:1]:
+                del _timeseries_cache[stale_key]
+        _timeseries_cache[key] = (now + TIMESERIES_CACHE_SECONDS, result)
+    return result
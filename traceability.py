@@ -0,0 +1,310 @@
+"""Merkle-batched anchoring of inventory lineage events.
+
+`collect_lineage_events` turns new wet leaves intake, drying, flour
+production, shipment and sale rows into lineage_events, each with the
+SHA-256 leaf hash of a canonical JSON payload. `anchor_pending_events`
+groups the events of every closed time window per centra, builds a Merkle
+tree in process (events arriving after their window was anchored form the
+window's next batch), stores the tree and each event's inclusion proof, and
+records only the root in trx_history. Proving that an event belongs to an
+anchored batch then takes log2(batch size) hashes.
+
+Run `python traceability.py` from a scheduler to collect and anchor.
+"""
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import and_, func, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import merkle
+import models
+
+load_dotenv()
+
+ANCHOR_WINDOW_MINUTES = int(os.getenv("ANCHOR_WINDOW_MINUTES", "60"))
+LINEAGE_INSERT_CHUNK_ROWS = 1000
+
+FLOUR_PRODUCT_TYPE_ID = 3
+
+
+# event type -> (model, entity id, owning centra, timestamp, payload columns)
+def _sources():
+    wet, dry, flour, shipment, sale = models.WetLeaves, models.DryLeaves, models.Flour, models.Shipment, models.MarketShipment
+    return {
+        "wet_leaves_intake": (wet, wet.WetLeavesID, wet.UserID, wet.ReceivedTime, (wet.Weight,)),
+        "drying": (dry, dry.DryLeavesID, dry.UserID, dry.CreatedAt, (dry.WetLeavesID, dry.Processed_Weight)),
+        "flour_production": (flour, flour.FlourID, flour.UserID, flour.CreatedAt, (flour.DryLeavesID, flour.Flour_Weight)),
+        "shipment": (shipment, shipment.ShipmentID, shipment.UserID, shipment.CreatedAt, (shipment.CourierID, shipment.ShipmentQuantity)),
+        "sale": (sale, sale.MarketShipmentID, models.SubTransaction.CentraID, sale.CreatedAt,
+                 (sale.SubTransactionID, sale.ProductTypeID, sale.ProductID, sale.Price)),
+    }
+
+
+EVENT_TYPES = tuple(_sources())
+
+
+def _source_query(event_type: str):
+    model, id_column, user_column, time_column, payload_columns = _sources()[event_type]
+    query = select(
+        id_column.label("entity_id"), user_column.label("user_id"), time_column.label("occurred_at"), *payload_columns
+    )
+    if model is models.MarketShipment:
+        query = query.join(models.SubTransaction, models.SubTransaction.SubTransactionID == model.SubTransactionID)
+    return query.where(user_column.isnot(None), time_column.isnot(None))
+
+
+def _naive(value: datetime) -> datetime:
+    # market tables store timezone-aware timestamps, inventory tables local naive ones
+    return value.astimezone().replace(tzinfo=None) if value.tzinfo else value
+
+
+def _shipment_flour_ids(connection, shipment_ids) -> Dict[int, List[int]]:
+    association = models.shipment_flour_association
+    flour_ids = defaultdict(list)
+    if shipment_ids:
+        rows = connection.execute(
+            select(association.c.shipment_id, association.c.flour_id).where(association.c.shipment_id.in_(shipment_ids))
+        )
+        for shipment_id, flour_id in rows:
+            flour_ids[shipment_id].append(flour_id)
+    return flour_ids
+
+
+def _events_from_rows(connection, event_type: str, rows) -> List[dict]:
+    """Canonical payload and leaf hash for every source row"""
+    flour_ids = _shipment_flour_ids(connection, [row.entity_id for row in rows]) if event_type == "shipment" else {}
+    events = []
+    for row in rows:
+        occurred_at = _naive(row.occurred_at)
+        payload = {"type": event_type, "id": row.entity_id, "user": row.user_id, "at": occurred_at.isoformat()}
+        for key, value in row._mapping.items():
+            if key not in ("entity_id", "user_id", "occurred_at"):
+                payload[key] = value
+        if event_type == "shipment":
+            payload["FlourIDs"] = sorted(flour_ids.get(row.entity_id, []))
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        events.append({
+            "EventType": event_type, "EntityID": row.entity_id, "UserID": row.user_id, "OccurredAt": occurred_at,
+            "Payload": canonical, "LeafHash": merkle.hash_leaf(canonical.encode("utf-8")),
+        })
+    return events
+
+
+def collect_lineage_events(db: Session) -> int:
+    """Record every source row that has no lineage event yet"""
+    connection = db.connection()
+    events_table = models.LineageEvent.__table__
+    insert_fn = sqlite_insert if connection.dialect.name == "sqlite" else pg_insert
+    collected = 0
+    for event_type, source in _sources().items():
+        id_column = source[1]
+        recorded = and_(events_table.c.EventType == event_type, events_table.c.EntityID == id_column)
+        query = (
+            _source_query(event_type)
+            .outerjoin(events_table, recorded)
+            .where(events_table.c.EventID.is_(None))
+            .order_by(id_column)
+        )
+        events = _events_from_rows(connection, event_type, connection.execute(query).all())
+        for start in range(0, len(events), LINEAGE_INSERT_CHUNK_ROWS):
+            # a concurrent run may have recorded some of them already
+            connection.execute(insert_fn(events_table).values(events[start:start + LINEAGE_INSERT_CHUNK_ROWS])
+                               .on_conflict_do_nothing(index_elements=[events_table.c.EventType, events_table.c.EntityID]))
+        collected += len(events)
+    db.commit()
+    return collected
+
+
+def window_start(value: datetime) -> datetime:
+    minutes = (value.hour * 60 + value.minute) // ANCHOR_WINDOW_MINUTES * ANCHOR_WINDOW_MINUTES
+    return value.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(minutes=minutes)
+
+
+def anchor_pending_events(db: Session, now: Optional[datetime] = None) -> List[dict]:
+    """Build and anchor one Merkle batch per centra and closed window"""
+    cutoff = window_start(now or datetime.now())
+    event = models.LineageEvent
+    pending = (
+        db.query(event.EventID, event.UserID, event.OccurredAt, event.LeafHash)
+        .filter(event.BatchID.is_(None), event.OccurredAt < cutoff)
+        .order_by(event.UserID, event.OccurredAt, event.EventID)
+        .all()
+    )
+    groups: Dict[Tuple[str, datetime], list] = defaultdict(list)
+    for row in pending:
+        groups[(row.UserID, window_start(row.OccurredAt))].append(row)
+
+    last_sequences = _last_sequences(db, groups)
+    batches = []
+    for (user_id, start), rows in groups.items():
+        # late events (a backdated intake, a client clock) go into the window's next batch
+        sequence = last_sequences.get((user_id, start), -1) + 1
+        try:
+            # a failing group is left pending without holding back the others
+            with db.begin_nested():
+                batches.append(_anchor_group(db, user_id, start, sequence, rows))
+        except SQLAlchemyError as e:
+            logging.error(f"Anchoring {len(rows)} events of {user_id} at {start.isoformat()} failed: {e}")
+    db.commit()
+    return batches
+
+
+def _last_sequences(db: Session, groups) -> Dict[Tuple[str, datetime], int]:
+    """Highest batch sequence already anchored for each (centra, window) of groups"""
+    if not groups:
+        return {}
+    batch = models.AnchorBatch
+    starts = [start for _, start in groups]
+    rows = (
+        db.query(batch.UserID, batch.WindowStart, func.max(batch.Sequence).label("last"))
+        .filter(batch.UserID.in_({user_id for user_id, _ in groups}),
+                batch.WindowStart >= min(starts), batch.WindowStart <= max(starts))
+        .group_by(batch.UserID, batch.WindowStart)
+        .all()
+    )
+    return {(row.UserID, row.WindowStart): row.last for row in rows}
+
+
+def _anchor_group(db: Session, user_id: str, start: datetime, sequence: int, rows) -> dict:
+    levels = merkle.build_tree([row.LeafHash for row in rows])
+    root = merkle.root_of(levels)
+    trx = models.BlockchainTrx(UserID=user_id, BlockchainHash=f"0x{root}")
+    batch = models.AnchorBatch(
+        UserID=user_id, WindowStart=start, WindowEnd=start + timedelta(minutes=ANCHOR_WINDOW_MINUTES),
+        Sequence=sequence, EventCount=len(rows), MerkleRoot=root, Tree=json.dumps(levels, separators=(",", ":")),
+    )
+    db.add_all([trx, batch])
+    db.flush()
+    batch.TrxId = trx.TrxId
+    db.execute(update(models.LineageEvent), [
+        {"EventID": row.EventID, "BatchID": batch.BatchID, "LeafIndex": index,
+         "Proof": json.dumps(merkle.proof_for(levels, index), separators=(",", ":"))}
+        for index, row in enumerate(rows)
+    ])
+    return {"batch_id": batch.BatchID, "user_id": user_id, "window_start": start.isoformat(), "sequence": sequence,
+            "events": len(rows), "merkle_root": root, "trx_id": trx.TrxId}
+
+
+def run_anchoring(db: Session, now: Optional[datetime] = None) -> dict:
+    collected = collect_lineage_events(db)
+    batches = anchor_pending_events(db, now)
+    logging.info(f"Collected {collected} lineage events, anchored {len(batches)} batches")
+    return {"events_collected": collected, "batches": batches}
+
+
+def _current_payloads(db: Session, keys) -> Dict[Tuple[str, int], str]:
+    """Payloads recomputed from the source rows as they are now"""
+    by_type = defaultdict(list)
+    for event_type, entity_id in keys:
+        by_type[event_type].append(entity_id)
+    connection = db.connection()
+    payloads = {}
+    for event_type, entity_ids in by_type.items():
+        id_column = _sources()[event_type][1]
+        rows = connection.execute(_source_query(event_type).where(id_column.in_(entity_ids))).all()
+        for event in _events_from_rows(connection, event_type, rows):
+            payloads[(event_type, event["EntityID"])] = event["Payload"]
+    return payloads
+
+
+def get_event_proofs(db: Session, keys: List[Tuple[str, int]]) -> List[dict]:
+    """Inclusion proofs of the given (event type, entity id) pairs, checked against the stored roots"""
+    if not keys:
+        return []
+    event, batch, trx = models.LineageEvent, models.AnchorBatch, models.BlockchainTrx
+    rows = (
+        db.query(event, batch.MerkleRoot, batch.WindowStart, trx.BlockchainHash)
+        .outerjoin(batch, batch.BatchID == event.BatchID)
+        .outerjoin(trx, trx.TrxId == batch.TrxId)
+        .filter(tuple_(event.EventType, event.EntityID).in_(keys))
+        .order_by(event.OccurredAt, event.EventID)
+        .all()
+    )
+    current = _current_payloads(db, [(row[0].EventType, row[0].EntityID) for row in rows])
+    proofs = []
+    for lineage_event, root, batch_start, anchored_hash in rows:
+        proof = json.loads(lineage_event.Proof) if lineage_event.Proof else None
+        proofs.append({
+            "event_type": lineage_event.EventType,
+            "entity_id": lineage_event.EntityID,
+            "user_id": lineage_event.UserID,
+            "occurred_at": lineage_event.OccurredAt.isoformat(),
+            "payload": json.loads(lineage_event.Payload),
+            "leaf_hash": lineage_event.LeafHash,
+            "batch_id": lineage_event.BatchID,
+            "window_start": batch_start.isoformat() if batch_start else None,
+            "leaf_index": lineage_event.LeafIndex,
+            "proof": proof,
+            "merkle_root": root,
+            "anchored_hash": anchored_hash,
+            "anchored": proof is not None,
+            "verified": proof is not None
+                        and merkle.hash_leaf(lineage_event.Payload.encode("utf-8")) == lineage_event.LeafHash
+                        and merkle.verify_proof(lineage_event.LeafHash, proof, root)
+                        and anchored_hash == f"0x{root}",
+            # False when the source row changed (or disappeared) after it was recorded
+            "matches_source": current.get((lineage_event.EventType, lineage_event.EntityID)) == lineage_event.Payload,
+        })
+    return proofs
+
+
+def get_event_proof(db: Session, event_type: str, entity_id: int) -> dict:
+    if event_type not in EVENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"event_type must be one of {', '.join(EVENT_TYPES)}")
+    proofs = get_event_proofs(db, [(event_type, entity_id)])
+    if not proofs:
+        raise HTTPException(status_code=404, detail="Lineage event not recorded yet")
+    return proofs[0]
+
+
+def get_flour_provenance(db: Session, flour_id: int) -> dict:
+    """Proofs for every recorded step behind one flour bag, from wet leaves intake to sale"""
+    wet, dry, flour = models.WetLeaves, models.DryLeaves, models.Flour
+    lineage = (
+        db.query(flour.FlourID, dry.DryLeavesID, wet.WetLeavesID)
+        .outerjoin(dry, dry.DryLeavesID == flour.DryLeavesID)
+        .outerjoin(wet, wet.WetLeavesID == dry.WetLeavesID)
+        .filter(flour.FlourID == flour_id)
+        .first()
+    )
+    if lineage is None:
+        raise HTTPException(status_code=404, detail="Flour not found")
+
+    association = models.shipment_flour_association
+    shipment_ids = db.execute(select(association.c.shipment_id).where(association.c.flour_id == flour_id)).scalars().all()
+    sale_ids = db.execute(select(models.MarketShipment.MarketShipmentID).where(
+        models.MarketShipment.ProductTypeID == FLOUR_PRODUCT_TYPE_ID, models.MarketShipment.ProductID == flour_id)).scalars().all()
+
+    keys = [("flour_production", flour_id)]
+    if lineage.DryLeavesID is not None:
+        keys.append(("drying", lineage.DryLeavesID))
+    if lineage.WetLeavesID is not None:
+        keys.append(("wet_leaves_intake", lineage.WetLeavesID))
+    keys += [("shipment", shipment_id) for shipment_id in shipment_ids]
+    keys += [("sale", sale_id) for sale_id in sale_ids]
+
+    events = get_event_proofs(db, keys)
+    return {
+        "flour_id": flour_id,
+        "events": events,
+        "complete": len(events) == len(keys),
+        "verified": len(events) == len(keys) and all(e["verified"] and e["matches_source"] for e in events),
+    }
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        run_anchoring(db)
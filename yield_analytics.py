@@ -0,0 +1,199 @@
+"""Conversion yield analytics over the wet leaves -> dry leaves -> flour lineage.
+
+`refresh_yield_analytics` joins the three tables once, turns every lot into
+an (input weight, output weight) pair per processing stage and stores
+weighted yields, losses and p10/p50/p90 lot yields per centra and period
+in yield_analytics. Periods are cohorts by wet leaves ReceivedTime, so a
+flour batch counts towards the month its leaves were received in.
+
+Run `python yield_analytics.py [week|month]` from a scheduler to refresh.
+"""
+import logging
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Float, String, cast, delete, func, insert, literal, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+import models
+from statistics_service import as_date, bucket_expression
+
+YIELD_PERIODS = ("week", "month")
+YIELD_STAGES = ("wet_to_dry", "dry_to_flour", "wet_to_flour")
+
+
+def stage_lots_query(period_type: str, dialect_name: str):
+    """One row per lot and stage: (stage, user_id, period, input_weight, output_weight)"""
+    wet, dry, flour = models.WetLeaves, models.DryLeaves, models.Flour
+    period = bucket_expression(wet.ReceivedTime, period_type, dialect_name)
+
+    # wet ⋈ dry ⟕ flour, folded to one row per dry leaves lot
+    dry_lots = (
+        select(
+            wet.WetLeavesID.label("wet_id"),
+            wet.UserID.label("user_id"),
+            period.label("period"),
+            wet.Weight.label("wet_weight"),
+            dry.Processed_Weight.label("dry_weight"),
+            func.sum(flour.Flour_Weight).label("flour_weight"),
+            func.count(flour.FlourID).label("flour_count"),
+        )
+        .join(dry, dry.WetLeavesID == wet.WetLeavesID)
+        .outerjoin(flour, flour.DryLeavesID == dry.DryLeavesID)
+        .where(wet.ReceivedTime.isnot(None), wet.UserID.isnot(None))
+        .group_by(wet.WetLeavesID, wet.UserID, period, wet.Weight, dry.DryLeavesID, dry.Processed_Weight)
+        .cte("dry_lots")
+    )
+    wet_lots = (
+        select(
+            dry_lots.c.user_id,
+            dry_lots.c.period,
+            func.max(dry_lots.c.wet_weight).label("wet_weight"),
+            func.sum(dry_lots.c.dry_weight).label("dry_weight"),
+            func.sum(dry_lots.c.flour_weight).label("flour_weight"),
+            func.sum(dry_lots.c.flour_count).label("flour_count"),
+        )
+        .group_by(dry_lots.c.wet_id, dry_lots.c.user_id, dry_lots.c.period)
+        .cte("wet_lots")
+    )
+
+    def stage(name, source, input_column, output_column, *conditions):
+        return select(
+            literal(name, String).label("stage"),
+            source.c.user_id,
+            source.c.period,
+            cast(input_column, Float).label("input_weight"),
+            cast(func.coalesce(output_column, 0), Float).label("output_weight"),
+        ).where(input_column > 0, *conditions)
+
+    return union_all(
+        stage("wet_to_dry", wet_lots, wet_lots.c.wet_weight, wet_lots.c.dry_weight),
+        stage("dry_to_flour", dry_lots, dry_lots.c.dry_weight, dry_lots.c.flour_weight, dry_lots.c.flour_count > 0),
+        stage("wet_to_flour", wet_lots, wet_lots.c.wet_weight, wet_lots.c.flour_weight, wet_lots.c.flour_count > 0),
+    ).cte("stage_lots")
+
+
+def _postgres_refresh(db: Session, period_type: str, computed_at: datetime) -> int:
+    lots = stage_lots_query(period_type, "postgresql")
+    lot_yield = lots.c.output_weight / lots.c.input_weight
+    summary = (
+        select(
+            literal(period_type, String),
+            cast(lots.c.period, models.YieldAnalytics.Period.type),
+            lots.c.user_id,
+            lots.c.stage,
+            func.count(),
+            func.sum(lots.c.input_weight),
+            func.sum(lots.c.output_weight),
+            func.sum(lots.c.input_weight) - func.sum(lots.c.output_weight),
+            func.sum(lots.c.output_weight) / func.sum(lots.c.input_weight),
+            func.percentile_cont(0.1).within_group(lot_yield),
+            func.percentile_cont(0.5).within_group(lot_yield),
+            func.percentile_cont(0.9).within_group(lot_yield),
+            literal(computed_at),
+        )
+        # per centra plus one all-centra row (UserID NULL) per stage and period
+        .group_by(func.grouping_sets(
+            tuple_(lots.c.stage, lots.c.period, lots.c.user_id),
+            tuple_(lots.c.stage, lots.c.period),
+        ))
+    )
+    table = models.YieldAnalytics.__table__
+    columns = [table.c.PeriodType, table.c.Period, table.c.UserID, table.c.Stage, table.c.LotCount,
+               table.c.InputWeight, table.c.OutputWeight, table.c.LossWeight, table.c.Yield,
+               table.c.YieldP10, table.c.YieldP50, table.c.YieldP90, table.c.ComputedAt]
+    return db.execute(insert(table).from_select(columns, summary)).rowcount
+
+
+def percentile_cont(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Same interpolation as PostgreSQL percentile_cont"""
+    if not sorted_values:
+        return None
+    position = fraction * (len(sorted_values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _generic_refresh(db: Session, period_type: str, computed_at: datetime) -> int:
+    """Fallback for databases without ordered-set aggregates (local sqlite runs)"""
+    lots = stage_lots_query(period_type, db.get_bind().dialect.name)
+    groups = defaultdict(list)
+    for row in db.execute(select(lots)):
+        period = as_date(row.period)
+        for user_id in (row.user_id, None):
+            groups[(row.stage, period, user_id)].append((row.input_weight, row.output_weight))
+
+    rows = []
+    for (stage, period, user_id), pairs in groups.items():
+        input_weight = sum(pair[0] for pair in pairs)
+        output_weight = sum(pair[1] for pair in pairs)
+        yields = sorted(output / lot_input for lot_input, output in pairs)
+        rows.append({
+            "PeriodType": period_type, "Period": period, "UserID": user_id, "Stage": stage,
+            "LotCount": len(pairs), "InputWeight": input_weight, "OutputWeight": output_weight,
+            "LossWeight": input_weight - output_weight, "Yield": output_weight / input_weight,
+            "YieldP10": percentile_cont(yields, 0.1), "YieldP50": percentile_cont(yields, 0.5),
+            "YieldP90": percentile_cont(yields, 0.9), "ComputedAt": computed_at,
+        })
+    if rows:
+        db.execute(insert(models.YieldAnalytics.__table__), rows)
+    return len(rows)
+
+
+def refresh_yield_analytics(db: Session, period_type: str = "month") -> int:
+    """Recompute and replace the stored yields for one period type"""
+    if period_type not in YIELD_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(YIELD_PERIODS)}")
+    computed_at = datetime.now()
+    db.execute(delete(models.YieldAnalytics).where(models.YieldAnalytics.PeriodType == period_type))
+    if db.get_bind().dialect.name == "postgresql":
+        row_count = _postgres_refresh(db, period_type, computed_at)
+    else:
+        row_count = _generic_refresh(db, period_type, computed_at)
+    db.commit()
+    logging.info(f"Stored {row_count} {period_type} yield rows")
+    return row_count
+
+
+def get_yield_analytics(db: Session, period_type: str = "month", centra: Optional[str] = None,
+                        stage: Optional[str] = None, date_from=None, date_to=None) -> Dict[str, list]:
+    """Stored yields as columnar arrays; without a centra the all-centra rows are returned"""
+    if period_type not in YIELD_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(YIELD_PERIODS)}")
+    if stage is not None and stage not in YIELD_STAGES:
+        raise HTTPException(status_code=400, detail=f"stage must be one of {', '.join(YIELD_STAGES)}")
+    table = models.YieldAnalytics
+    query = db.query(table).filter(
+        table.PeriodType == period_type,
+        table.UserID == centra if centra is not None else table.UserID.is_(None),
+    )
+    if stage is not None:
+        query = query.filter(table.Stage == stage)
+    if date_from is not None:
+        query = query.filter(table.Period >= date_from)
+    if date_to is not None:
+        query = query.filter(table.Period <= date_to)
+
+    fields = ("Period", "Stage", "LotCount", "InputWeight", "OutputWeight", "LossWeight", "Yield", "YieldP10", "YieldP50", "YieldP90")
+    result = {field: [] for field in fields}
+    computed_at = None
+    for row in query.order_by(table.Period, table.Stage):
+        for field in fields:
+            value = getattr(row, field)
+            result[field].append(value.isoformat() if field == "Period" else value)
+        computed_at = max(computed_at, row.ComputedAt) if computed_at else row.ComputedAt
+    result["ComputedAt"] = computed_at.isoformat() if computed_at else None
+    return result
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        for period_type in sys.argv[1:] or YIELD_PERIODS:
+            refresh_yield_analytics(db, period_type)